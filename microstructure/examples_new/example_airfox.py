@@ -23,7 +23,7 @@ from MPaut import geoval_subprocess, voxsm_subprocess
 
 def generate_volume_fraction(frac, n_obj, geo_comm, rve_dim=32, voxel_size_um=1.0, 
                              randseed=None, method='voronoi', target_porosity=0.0,
-                             use_dilation=True):
+                             porosity_tolerance=0.005, use_dilation=True):
     """This function generates a two-phase voronoi type RVE with a given volume fraction of the two phases.
     
     There are two different options to generate the RVE. The first method 
@@ -36,10 +36,13 @@ def generate_volume_fraction(frac, n_obj, geo_comm, rve_dim=32, voxel_size_um=1.
     distributes them to avoid overlap and then converts them to voronoi 
     objects with the given volume fractions.
     
-    After the base RVE has been generated, pores are added by randomly 
-    introducing voxels at the corners, edges or faces of the grains until the
-    given porosity percentage is achieved. Note that this may not always be
-    possible (no checks are performed!).    
+    After the base RVE has been generated, pores are added by introducing 
+    voxels at the corners, edges or faces of the grains until the given 
+    porosity is achieved (see 
+    :meth:`~MPaut.geoval_subprocess.GeoVal_Communicator.control_volume_fractions`).
+    If no more pores can be introduced at the interfaces, the grains of the 
+    phase furthest above its target volume fraction are dilated to create 
+    new interfaces and the introduction of pores is continued.
     
 
     Parameters
@@ -62,9 +65,11 @@ def generate_volume_fraction(frac, n_obj, geo_comm, rve_dim=32, voxel_size_um=1.
         ``'voronoi'`` and ``'spheres'``. The default is ``'voronoi'``.
     target_porosity : float, optional
         Target porosity of the RVE. The default is ``0.0``.
+    porosity_tolerance : float, optional
+        Absolute tolerance of the porosity. The default is ``0.005``.
     use_dilation : bool, optional
-        This option control whether dilation operations are used when adding
-        porosity to the RVE. The default is ``True``.
+        This option controls whether dilation operations are used when the
+        introduction of pores at the interfaces stalls. The default is ``True``.
 
     Returns
     -------
@@ -104,38 +109,22 @@ def generate_volume_fraction(frac, n_obj, geo_comm, rve_dim=32, voxel_size_um=1.
         geo_comm.split_objects(4, fraction=frac)
         
     # add porosity
-    vol_fracs = geo_comm.get_volume_fractions()
+    vol_fracs = geo_comm.control_volume_fractions({0: target_porosity}, 
+                                                  tolerance=porosity_tolerance)
     porosity = 1.0 - sum(vol_fracs.values())
-        
-    i = 0
-    while porosity < target_porosity:
-        print(f"Volume fractions = {vol_fracs}, porosity = {porosity}")
-        # randomly introduce pores at corners, edges or faces
-        mode = random.choice([('corners', 0.3), ('edges', 0.1), ('faces', 0.01)])
-        #mode = ('corners', target_porosity)
-        geo_comm.intro_at_interfaces(mode=mode[0], phase=0, fraction=mode[1])
-
-        # get new porosity        
-        vol_fracs = geo_comm.get_volume_fractions()
-        porosity = 1.0 - sum(vol_fracs.values())
-
-        if porosity < target_porosity and use_dilation:
-            # randomly dilate existing voxels
-            mode = random.choice([1,2,3,4,5])
-            
-            if vol_fracs[4] > Input_ZrO2:
-                geo_comm.dilation(mode, 4, repetitions=1)
-            elif vol_fracs[10] > Input_Al2O3:
-                geo_comm.dilation(mode, 10, repetitions=1)    
-        
-            # get new porosity
-            vol_fracs = geo_comm.get_volume_fractions()
-            porosity = 1.0 - sum(vol_fracs.values())
-        
-        # make sure we always terminate
-        i += 1
-        if i > 500:
+    
+    # dilate the grains when no more pores can be introduced at the interfaces
+    # (zirconia is phase 4, alumina phase 10)
+    solid_targets = {4: frac * (1.0 - target_porosity), 10: (1.0 - frac) * (1.0 - target_porosity)}
+    rng = random.Random(randseed)
+    for _ in range(10):
+        if not use_dilation or porosity >= target_porosity - porosity_tolerance:
             break
+        phase = max(solid_targets, key=lambda p: vol_fracs.get(p, 0.0) - solid_targets[p])
+        geo_comm.dilation(rng.choice([1, 2, 3, 4, 5]), phase, repetitions=1)
+        vol_fracs = geo_comm.control_volume_fractions({0: target_porosity}, 
+                                                      tolerance=porosity_tolerance)
+        porosity = 1.0 - sum(vol_fracs.values())
         
     print(f"Final volume fractions = {vol_fracs}, porosity = {porosity}")
     
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+This example compares the throughput of the native sphere packings with
+GeoVal's ``distribute()`` for the same target volume fraction.
+
+The native packings run without GeoVal. The GeoVal part is only run if the
+executable exists.
+"""
+import time
+import pathlib
+
+from MPaut import packing, geoval_subprocess, voxel_analysis
+
+RVE_DIMS = 64
+RADIUS_UM = 4.0
+VOLUME_FRACTION = 0.55
+EXECUTABLE = pathlib.Path('..', 'bin', 'geo_val_parallel.exe')
+
+def report(name, duration, voxels):
+    fractions = voxel_analysis.volume_fractions(voxels)
+    print(f"{name:>25}: {duration:7.2f} s, sphere volume fraction {fractions.get(packing.SPHERE_PHASE, 0.0):.3f}")
+
+# random sequential addition jams at about 38 %, so it is only used for the
+# lower volume fraction
+start = time.perf_counter()
+spheres = packing.random_sequential_addition(rve_dims=RVE_DIMS, radius_um=RADIUS_UM,
+                                             volume_fraction=0.35, seed=1)
+report('RSA (35 %)', time.perf_counter() - start, spheres.to_voxel_grid())
+
+start = time.perf_counter()
+spheres = packing.lubachevsky_stillinger(rve_dims=RVE_DIMS, radius_um=RADIUS_UM,
+                                         volume_fraction=VOLUME_FRACTION, seed=1)
+grid = spheres.to_voxel_grid()
+report('Lubachevsky-Stillinger', time.perf_counter() - start, grid)
+grid.to_val_file('voxels_ls.val')
+
+if EXECUTABLE.exists():
+    geo_comm = geoval_subprocess.GeoVal_Communicator(output_folder='output', executable=EXECUTABLE)
+    start = time.perf_counter()
+    geo_comm.initialize_rve(rve_dims=RVE_DIMS, voxel_size_um=1.0)
+    geo_comm.set_randseed(1)
+    geo_comm.introduce_objects(N=len(spheres), object_type='sphere',
+                               shape_description={'radius': RADIUS_UM * 1e-6})
+    geo_comm.distribute()
+    report('GeoVal distribute', time.perf_counter() - start, geo_comm.get_voxels())
+    geo_comm.close()
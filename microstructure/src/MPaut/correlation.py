@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Two-point correlation statistics of voxel RVEs.
+
+The two-point correlation :math:`S_{ij}(\\mathbf{r})` is the probability that
+a voxel at :math:`\\mathbf{x}` belongs to phase :math:`i` and the voxel at
+:math:`\\mathbf{x} + \\mathbf{r}` belongs to phase :math:`j`. For ``i == j``
+it is the auto-correlation of the phase, for ``i != j`` the cross-correlation
+of both phases. The correlations are computed from the phase indicator
+functions with real FFTs, either assuming periodic RVEs or with zero padding
+(non-periodic), where every displacement is normalized by the number of
+voxel pairs it contains.
+
+Correlations are returned as arrays centered at zero displacement (see
+:attr:`CorrelationCalculator.center`) and can be averaged over all
+directions with :func:`radial_average`.
+
+For ensembles of RVEs use a single :class:`CorrelationCalculator`, which
+keeps the padded indicator buffers, normalization and radial binning
+between RVEs and transforms several RVEs per FFT call::
+
+    calculator = CorrelationCalculator((64, 64, 64), phases=[0, 1])
+    radii = calculator.radii
+    s2 = calculator.batch(rve_stack, radial=True)[(1, 1)]
+"""
+import itertools
+import numpy as np
+from MPaut.voxels import as_voxel_grid, decode_voxels
+
+
+class CorrelationCalculator:
+    """Two-point correlations for RVEs of a fixed shape.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape ``(dim_x, dim_y, dim_z)`` of the RVEs.
+    phases : list of int
+        Phases for which the correlations are computed.
+    periodic : bool, optional
+        Treat the RVEs as periodic. Otherwise the RVEs are zero padded and
+        the correlations are computed for all displacements with at least
+        one voxel pair. The default is ``True``.
+    pairs : list of tuple, optional
+        Phase pairs ``(i, j)`` to compute. The default is ``None``, which
+        computes all auto-correlations and cross-correlations with ``i < j``.
+    voxel_size : float, optional
+        Edge length of a voxel in µm, used for :attr:`radii`.
+        The default is ``1.0``.
+
+    Attributes
+    ----------
+    shape : tuple
+        Shape of the correlation arrays.
+    center : tuple
+        Index of zero displacement in the correlation arrays.
+    radii : numpy.ndarray
+        Radii in µm of the radially averaged correlations.
+    """
+
+    def __init__(self, shape, phases, periodic=True, pairs=None, voxel_size=1.0):
+        if len(shape) != 3:
+            raise ValueError(f"RVE shape must be 3-dimensional, got {shape}.")
+        self.rve_shape = tuple(int(n) for n in shape)
+        self.phases = [int(p) for p in phases]
+        if pairs is None:
+            pairs = itertools.combinations_with_replacement(self.phases, 2)
+        self.pairs = [(int(i), int(j)) for i, j in pairs]
+        for pair in self.pairs:
+            if not set(pair) <= set(self.phases):
+                raise ValueError(f"Phase pair {pair} contains phases not in {self.phases}.")
+        self.periodic = periodic
+        self.voxel_size = voxel_size
+
+        if periodic:
+            self._fft_shape = self.rve_shape
+            # reorder to displacements -(n//2) ... (n - 1)//2
+            crop = [np.fft.fftshift(np.arange(n)) for n in self.rve_shape]
+            self.center = tuple(n // 2 for n in self.rve_shape)
+            self._norm = 1.0 / np.prod(self.rve_shape)
+        else:
+            # padding to 2n avoids wrap-around for displacements up to n - 1
+            self._fft_shape = tuple(2 * n for n in self.rve_shape)
+            crop = [np.r_[n + 1:2 * n, 0:n] for n in self.rve_shape]
+            self.center = tuple(n - 1 for n in self.rve_shape)
+            # number of voxel pairs for every displacement
+            counts = [n - np.abs(np.arange(-(n - 1), n)) for n in self.rve_shape]
+            self._norm = 1.0 / np.einsum('i,j,k->ijk', *counts).astype(float)
+        self._crop = np.ix_(*crop)
+        self.shape = tuple(len(c) for c in crop)
+        self._buffer = None
+
+        # radial bins: rounded distance from the center in voxels
+        grids = np.meshgrid(*(np.arange(n) - c for n, c in zip(self.shape, self.center)),
+                            indexing='ij', sparse=True)
+        distance = np.sqrt(sum(g.astype(float)**2 for g in grids))
+        bins = np.rint(distance).astype(np.int64).ravel()
+        # only complete shells are averaged
+        max_radius = min(min(c, n - 1 - c) for n, c in zip(self.shape, self.center))
+        inside = np.flatnonzero(bins <= max_radius)
+        order = np.argsort(bins[inside], kind='stable')
+        self._radial_index = inside[order]
+        # the same entries in the uncropped FFT output and their normalization
+        centered = np.unravel_index(self._radial_index, self.shape)
+        fft_index = tuple(c[i] for c, i in zip(crop, centered))
+        self._radial_fft_index = np.ravel_multi_index(fft_index, self._fft_shape)
+        self._radial_norm = np.broadcast_to(self._norm, self.shape).ravel()[self._radial_index]
+        bin_counts = np.bincount(bins[inside], minlength=max_radius + 1)
+        self._radial_starts = np.r_[0, np.cumsum(bin_counts)[:-1]]
+        self._radial_counts = bin_counts
+        self.radii = np.arange(max_radius + 1) * voxel_size
+
+    def _indicator_buffer(self, batch_size):
+        # zero padded indicator functions, reused for all RVEs
+        shape = (len(self.phases), batch_size) + self._fft_shape
+        if self._buffer is None or self._buffer.shape[1] < batch_size:
+            self._buffer = np.zeros(shape)
+        return self._buffer[:, :batch_size]
+
+    def _compute(self, labels, radial=False):
+        # labels: array of shape (batch, dim_x, dim_y, dim_z)
+        n_batch = labels.shape[0]
+        buffer = self._indicator_buffer(n_batch)
+        region = (slice(None),) + tuple(slice(0, n) for n in self.rve_shape)
+        axes = (1, 2, 3)
+        transforms = {}
+        for k, phase in enumerate(self.phases):
+            if not any(phase in pair for pair in self.pairs):
+                continue
+            indicator = buffer[k]
+            indicator[region] = labels == phase
+            transforms[phase] = np.fft.rfftn(indicator, axes=axes)
+
+        res = {}
+        for i, j in self.pairs:
+            if i == j:
+                product = transforms[i].real**2 + transforms[i].imag**2
+            else:
+                product = np.conj(transforms[i]) * transforms[j]
+            corr = np.fft.irfftn(product, s=self._fft_shape, axes=axes)
+            if radial:
+                # gather the radial bins directly from the FFT output
+                values = corr.reshape(n_batch, -1)[:, self._radial_fft_index]
+                values *= self._radial_norm
+                res[(i, j)] = np.add.reduceat(values, self._radial_starts, axis=1) / self._radial_counts
+            else:
+                res[(i, j)] = corr[(slice(None),) + self._crop] * self._norm
+        return res
+
+    def _check_shape(self, labels, ndim):
+        if labels.ndim != ndim or labels.shape[-3:] != self.rve_shape:
+            raise ValueError(f"Expected {'a stack of RVEs' if ndim == 4 else 'an RVE'} "
+                             f"with shape {self.rve_shape}, got array of shape {labels.shape}.")
+
+    def correlations(self, voxels):
+        """Compute the two-point correlations of a single RVE.
+
+        Parameters
+        ----------
+        voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+            Voxel grid or array of GeoVal voxel codes.
+
+        Returns
+        -------
+        correlations : dict
+            Correlation array for every phase pair ``(i, j)``.
+        """
+        labels = as_voxel_grid(voxels).phases
+        self._check_shape(labels, 3)
+        return {pair: corr[0] for pair, corr in self._compute(labels[np.newaxis]).items()}
+
+    def radial_average(self, correlation):
+        """Average correlations over all directions.
+
+        Parameters
+        ----------
+        correlation : numpy.ndarray
+            Correlation array computed by this calculator, optionally with
+            leading batch dimensions.
+
+        Returns
+        -------
+        radial_correlation : numpy.ndarray
+            Mean correlation for every radius in :attr:`radii`.
+        """
+        flat = correlation.reshape(correlation.shape[:-3] + (-1,))
+        sums = np.add.reduceat(flat[..., self._radial_index], self._radial_starts, axis=-1)
+        return sums / self._radial_counts
+
+    def batch(self, stack, radial=False, batch_size=16):
+        """Compute the two-point correlations of a stack of RVEs.
+
+        Parameters
+        ----------
+        stack : numpy.ndarray or iterable
+            Array of GeoVal voxel codes with shape
+            ``(n_rve, dim_x, dim_y, dim_z)`` or an iterable of voxel grids or
+            voxel code arrays (e.g. a generator loading RVEs one by one).
+        radial : bool, optional
+            Return the radially averaged correlations instead of the full
+            correlation arrays. The default is ``False``.
+        batch_size : int, optional
+            Number of RVEs transformed in a single FFT call.
+            The default is ``16``.
+
+        Returns
+        -------
+        correlations : dict
+            Correlations of all RVEs for every phase pair ``(i, j)``, as
+            array with the RVE index as first dimension.
+        """
+        if isinstance(stack, np.ndarray):
+            self._check_shape(stack, 4)
+            chunks = (decode_voxels(stack[k:k + batch_size])[0] for k in range(0, len(stack), batch_size))
+        else:
+            chunks = self._chunk_iterable(stack, batch_size)
+
+        res = {pair: [] for pair in self.pairs}
+        for chunk in chunks:
+            for pair, corr in self._compute(chunk, radial).items():
+                res[pair].append(corr)
+        for pair, values in res.items():
+            if values:
+                res[pair] = np.concatenate(values)
+            else:
+                res[pair] = np.empty((0,) + ((len(self.radii),) if radial else self.shape))
+        return res
+
+    def _chunk_iterable(self, stack, batch_size):
+        chunk = []
+        for voxels in stack:
+            labels = as_voxel_grid(voxels).phases
+            self._check_shape(labels, 3)
+            chunk.append(labels)
+            if len(chunk) == batch_size:
+                yield np.stack(chunk)
+                chunk = []
+        if chunk:
+            yield np.stack(chunk)
+
+
+def two_point_correlations(voxels, phases=None, periodic=True, pairs=None):
+    """Compute the two-point auto- and cross-correlations of an RVE.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phases : list of int, optional
+        Phases for which the correlations are computed. The default is
+        ``None``, which uses all phases of the RVE (including phase ``0``).
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``True``.
+    pairs : list of tuple, optional
+        Phase pairs ``(i, j)`` to compute. The default is ``None``, which
+        computes all auto-correlations and cross-correlations with ``i < j``.
+
+    Returns
+    -------
+    correlations : dict
+        Correlation array for every phase pair ``(i, j)``. Zero displacement
+        is at index ``n // 2`` (periodic) or ``n - 1`` (non-periodic) along
+        every axis.
+    """
+    grid = as_voxel_grid(voxels)
+    if phases is None:
+        phases = np.unique(grid.phases)
+    calculator = CorrelationCalculator(grid.dims, phases, periodic, pairs, grid.voxel_size)
+    return calculator.correlations(grid)
+
+
+def radial_average(correlation, voxel_size=1.0):
+    """Average a centered correlation array over all directions.
+
+    The correlation is binned by the distance of the displacement rounded to
+    whole voxels. Only radii whose shells lie completely within the array are
+    returned.
+
+    Parameters
+    ----------
+    correlation : numpy.ndarray
+        Correlation array as returned by :func:`two_point_correlations`.
+    voxel_size : float, optional
+        Edge length of a voxel in µm. The default is ``1.0``.
+
+    Returns
+    -------
+    radii : numpy.ndarray
+        Radii in µm.
+    radial_correlation : numpy.ndarray
+        Mean correlation for every radius.
+    """
+    shape = correlation.shape
+    center = np.array(shape) // 2
+    grids = np.meshgrid(*(np.arange(n) - c for n, c in zip(shape, center)),
+                        indexing='ij', sparse=True)
+    bins = np.rint(np.sqrt(sum(g.astype(float)**2 for g in grids))).astype(np.int64)
+    max_radius = int(min(min(c, n - 1 - c) for n, c in zip(shape, center)))
+    inside = bins <= max_radius
+    sums = np.bincount(bins[inside], weights=correlation[inside], minlength=max_radius + 1)
+    counts = np.bincount(bins[inside], minlength=max_radius + 1)
+    return np.arange(max_radius + 1) * voxel_size, sums / counts
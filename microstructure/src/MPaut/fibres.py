@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+"""
+Native generation of cylinders, hollow tubes and coated fibres.
+
+GeoVal's ``tube`` and ``fibre`` objects can only be oriented with the fixed
+multipliers of the x and y orientation. Here every object has its own
+direction, which is drawn from an orientation distribution (see
+:func:`~MPaut.fibres.sample_orientations`), and the objects are voxelized
+directly into GeoVal voxel codes::
+
+    rve = fibres.random_fibres(rve_dims=96, radius_um=3.0, length_um=40.0,
+                               shell_um=1.0, volume_fraction=0.1,
+                               orientation='transversely_isotropic', seed=1)
+    grid = rve.to_voxel_grid()
+    grid.to_val_file('voxels.val')
+
+Every object is evaluated layer by layer along the axis which is closest to
+its direction. In every layer only a small rectangle around the axis of the
+object is checked, so the work grows linearly with the volume of the objects
+and not with the size of their bounding boxes. Lengths are given in µm.
+"""
+import warnings
+import numpy as np
+from MPaut.voxels import VoxelGrid, PHASE_FACTOR
+from MPaut.packing import sample_radii, _box_size
+
+# GeoVal assigns tubes and fibres to phase 2 and 6 (the type ids of the
+# object types)
+TUBE_PHASE = 2
+FIBRE_PHASE = 6
+# the shells of the fibres get the first phase after GeoVal's type ids
+SHELL_PHASE = 7
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=float)
+    norm = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    if np.any(norm == 0):
+        raise ValueError("Directions must not be zero vectors.")
+    return vectors / norm
+
+
+def _tangent_basis(axis):
+    # two unit vectors perpendicular to the axis and to each other
+    helper = np.eye(3)[np.argmin(np.abs(axis))]
+    first = _unit(np.cross(axis, helper))
+    return first, np.cross(axis, first)
+
+
+def orientation_tensor(directions):
+    """Second-order orientation tensor ``<d d^T>`` of a set of directions.
+
+    Parameters
+    ----------
+    directions : array_like
+        Directions, shape ``(n, 3)``. They are normalized.
+
+    Returns
+    -------
+    tensor : numpy.ndarray
+        Symmetric tensor of shape ``(3, 3)`` with trace ``1``. It is
+        ``I / 3`` for uniformly random and ``a a^T`` for directions aligned
+        with the axis ``a``.
+    """
+    directions = _unit(np.asarray(directions, dtype=float).reshape(-1, 3))
+    return directions.T @ directions / len(directions)
+
+
+def _fit_tensor(tensor, number, rng, max_iterations=200):
+    # angular central Gaussian directions (normalized Gaussian vectors), the
+    # covariance is adjusted until the orientation tensor of the sampled
+    # directions matches the given one in its principal axes
+    tensor = np.asarray(tensor, dtype=float)
+    if tensor.shape != (3, 3) or not np.allclose(tensor, tensor.T):
+        raise ValueError("The orientation tensor must be a symmetric 3x3 matrix.")
+    eigenvalues, axes = np.linalg.eigh(tensor)
+    if eigenvalues.min() < -1e-9 or not np.isclose(eigenvalues.sum(), 1.0):
+        raise ValueError("The orientation tensor must be positive semi-definite with a trace of 1.")
+    eigenvalues = np.clip(eigenvalues, 0.0, None)
+
+    normal = rng.standard_normal((number, 3))
+    variances = eigenvalues.copy()
+    for _ in range(max_iterations):
+        directions = _unit(normal * np.sqrt(variances))
+        moments = np.mean(directions**2, axis=0)
+        if np.max(np.abs(moments - eigenvalues)) < 1e-10:
+            break
+        variances = np.where(moments > 0, variances * eigenvalues / np.where(moments > 0, moments, 1.0), 0.0)
+        variances /= variances.sum()
+    return directions @ axes.T
+
+
+def sample_orientations(number, distribution='uniform', axis=(0.0, 0.0, 1.0), spread_deg=0.0,
+                        tensor=None, rng=None):
+    """Sample directions of fibres from an orientation distribution.
+
+    Parameters
+    ----------
+    number : int
+        Number of directions.
+    distribution : str, optional
+        The orientation distribution:
+
+        - ``'uniform'``: uniformly random on the unit sphere (isotropic).
+        - ``'aligned'``: along ``axis``, the misalignment follows a two
+          dimensional normal distribution with the standard deviation
+          ``spread_deg``.
+        - ``'transversely_isotropic'``: uniformly random within the plane
+          perpendicular to ``axis`` (e.g. fibre mats), the angle out of the
+          plane follows a normal distribution with the standard deviation
+          ``spread_deg``.
+        - ``'tensor'``: directions whose orientation tensor (see
+          :func:`~MPaut.fibres.orientation_tensor`) matches ``tensor``
+          along its principal axes.
+
+        The default is ``'uniform'``.
+    axis : array_like, optional
+        Fibre axis for ``'aligned'`` and normal of the fibre plane for
+        ``'transversely_isotropic'``. The default is ``(0, 0, 1)``.
+    spread_deg : float, optional
+        Standard deviation of the misalignment in degrees.
+        The default is ``0.0``.
+    tensor : array_like, optional
+        Second-order orientation tensor for ``'tensor'``, symmetric,
+        positive semi-definite and with a trace of ``1``.
+        The default is ``None``.
+    rng : numpy.random.Generator, optional
+        Random number generator. The default is ``None``, which creates a
+        new generator.
+
+    Returns
+    -------
+    directions : numpy.ndarray
+        Unit vectors of shape ``(number, 3)``.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if spread_deg < 0:
+        raise ValueError("The spread of the orientations must not be negative.")
+    axis = _unit(axis)
+    first, second = _tangent_basis(axis)
+    spread = np.radians(spread_deg)
+
+    if distribution == 'uniform':
+        return _unit(rng.standard_normal((number, 3)))
+    elif distribution == 'aligned':
+        tilt = rng.normal(0.0, spread, (number, 2)) if spread > 0 else np.zeros((number, 2))
+        angle = np.linalg.norm(tilt, axis=1)
+        tangent = tilt[:, :1] * first + tilt[:, 1:] * second
+        tangent /= np.where(angle > 0, angle, 1.0)[:, None]
+        return np.cos(angle)[:, None] * axis + np.sin(angle)[:, None] * tangent
+    elif distribution == 'transversely_isotropic':
+        phi = rng.uniform(0.0, 2.0 * np.pi, number)
+        psi = rng.normal(0.0, spread, number) if spread > 0 else np.zeros(number)
+        in_plane = np.cos(phi)[:, None] * first + np.sin(phi)[:, None] * second
+        return np.cos(psi)[:, None] * in_plane + np.sin(psi)[:, None] * axis
+    elif distribution == 'tensor':
+        if tensor is None:
+            raise ValueError("The orientation tensor must be given for the distribution 'tensor'.")
+        return _fit_tensor(tensor, number, rng)
+    raise ValueError(f"Invalid orientation distribution '{distribution}'. Possible values are "
+                     "'uniform', 'aligned', 'transversely_isotropic' and 'tensor'.")
+
+
+def _cylinder_voxels(center, direction, half_length, radius, inner_radius, shell, spacing):
+    # voxel indices (shape (3, m), not wrapped into the RVE) of the voxels
+    # with centers inside of the cylinder (without the bore of a tube) and
+    # inside of the shell around it. The voxels are evaluated layer by layer
+    # along the axis closest to the direction, in every layer only within the
+    # ellipse of the infinite cylinder.
+    outer_radius = radius + shell
+    outer_half_length = half_length + shell
+    k = int(np.argmax(np.abs(direction)))
+    others = [j for j in range(3) if j != k]
+    dk = direction[k]
+
+    extent = outer_half_length * abs(dk) + outer_radius * np.sqrt(max(1.0 - dk**2, 0.0))
+    layers = np.arange(int(np.ceil((center[k] - extent) / spacing - 0.5)),
+                       int(np.floor((center[k] + extent) / spacing - 0.5)) + 1)
+    # the cross section of the infinite cylinder lies within a distance of
+    # outer_radius / |dk| around the axis
+    half_width = outer_radius / abs(dk)
+    width = int(np.floor(2.0 * half_width / spacing)) + 2
+    z = (layers + 0.5) * spacing - center[k]
+    axis_points = z[:, None] * direction[others] / dk
+    starts = np.ceil((center[others] + axis_points - half_width) / spacing - 0.5).astype(int)
+    steps = np.arange(width)
+    index = np.empty((3, len(layers), width, width), dtype=np.int64)
+    index[k] = layers[:, None, None]
+    index[others[0]] = starts[:, 0, None, None] + steps[None, :, None]
+    index[others[1]] = starts[:, 1, None, None] + steps[None, None, :]
+
+    x = [(i + 0.5) * spacing - c for i, c in zip(index, center)]
+    t = x[0] * direction[0] + x[1] * direction[1] + x[2] * direction[2]
+    radial = np.sqrt(np.maximum(x[0]**2 + x[1]**2 + x[2]**2 - t**2, 0.0))
+    solid = (radial < radius) & (np.abs(t) < half_length)
+    bore = radial < inner_radius
+    core = solid & ~bore
+    if shell > 0:
+        outside = np.maximum(radial - radius, 0.0)**2 + np.maximum(np.abs(t) - half_length, 0.0)**2
+        coating = ~solid & ~bore & (outside < shell**2)
+    else:
+        coating = np.zeros_like(solid)
+    return index[:, core], index[:, coating]
+
+
+def _flat_indices(index, dims, periodic):
+    # flat indices into the RVE of voxel indices of shape (3, ...), voxels
+    # outside of a non-periodic RVE are dropped
+    if periodic:
+        return np.ravel_multi_index(tuple(i % n for i, n in zip(index, dims)), dims)
+    inside = np.all((index >= 0) & (index < np.reshape(dims, (3,) + (1,) * (index.ndim - 1))), axis=0)
+    return np.ravel_multi_index(tuple(i[inside] for i in index), dims)
+
+
+def _fraction_inside(index, dims):
+    # fraction of the voxel indices of shape (3, m) inside of the RVE
+    if index.shape[1] == 0:
+        return 1.0
+    return float(np.mean(np.all((index >= 0) & (index < np.reshape(dims, (3, 1))), axis=0)))
+
+
+def _occupied(occupied, pattern, shifts, periodic):
+    # whether any voxel of the pattern shifted by each of the shifts is
+    # occupied, voxels outside of a non-periodic RVE are free
+    dims = occupied.shape
+    index = pattern[:, None, :] + shifts.T[:, :, None]
+    if periodic:
+        hits = occupied[tuple(i % n for i, n in zip(index, dims))]
+    else:
+        inside = np.all((index >= 0) & (index < np.reshape(dims, (3, 1, 1))), axis=0)
+        hits = occupied[tuple(np.where(inside, i, 0) for i in index)] & inside
+    return np.any(hits, axis=1)
+
+
+class CylinderSet:
+    """Cylinders, hollow tubes and coated fibres in a box-shaped RVE.
+
+    Every object is a cylinder with flat ends. Tubes have a bore of radius
+    ``inner_radii`` and fibres a shell of thickness ``shells`` around the
+    cylinder, which is voxelized as a separate phase.
+
+    Attributes
+    ----------
+    centers : numpy.ndarray
+        Centers of the objects in µm, shape ``(n, 3)``.
+    directions : numpy.ndarray
+        Unit vectors along the axes of the objects, shape ``(n, 3)``.
+    lengths : numpy.ndarray
+        Lengths of the objects in µm.
+    radii : numpy.ndarray
+        Radii of the objects in µm.
+    inner_radii : numpy.ndarray
+        Radii of the bores in µm (``0`` for full cylinders).
+    shells : numpy.ndarray
+        Thickness of the shells in µm (``0`` for objects without shell).
+    phases : numpy.ndarray
+        Phase number of every object.
+    shell_phase : int
+        Phase number of the shells.
+    box_size : numpy.ndarray
+        Edge lengths of the RVE in µm.
+    voxel_size : float
+        Edge length of the voxels used by
+        :func:`~MPaut.fibres.CylinderSet.to_voxel_grid` in µm.
+    periodic : bool
+        Whether the objects continue across opposite faces of the RVE.
+    """
+
+    def __init__(self, centers, directions, lengths, radii, box_size, inner_radii=0.0, shells=0.0,
+                 phases=FIBRE_PHASE, shell_phase=SHELL_PHASE, voxel_size=1.0, periodic=True):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        n = len(self.centers)
+        self.directions = _unit(np.asarray(directions, dtype=float).reshape(-1, 3)) if n else np.empty((0, 3))
+        if len(self.directions) != n:
+            raise ValueError(f"Got {n} centers but {len(self.directions)} directions.")
+        self.lengths = np.broadcast_to(np.asarray(lengths, dtype=float), (n,)).copy()
+        self.radii = np.broadcast_to(np.asarray(radii, dtype=float), (n,)).copy()
+        self.inner_radii = np.broadcast_to(np.asarray(inner_radii, dtype=float), (n,)).copy()
+        self.shells = np.broadcast_to(np.asarray(shells, dtype=float), (n,)).copy()
+        if np.any(self.radii <= 0) or np.any(self.lengths <= 0) or np.any(self.shells < 0):
+            raise ValueError("Radii and lengths must be positive and shells must not be negative.")
+        if np.any((self.inner_radii < 0) | (self.inner_radii >= self.radii)):
+            raise ValueError("Inner radii must lie between 0 and the radius.")
+        self.phases = np.broadcast_to(np.asarray(phases, dtype=int), (n,)).copy()
+        self.shell_phase = int(shell_phase)
+        self.box_size = np.broadcast_to(np.asarray(box_size, dtype=float), (3,)).copy()
+        self.voxel_size = float(voxel_size)
+        self.periodic = periodic
+
+    def __len__(self):
+        return len(self.radii)
+
+    def __repr__(self):
+        return (f"CylinderSet(objects={len(self)}, box_size={tuple(float(b) for b in self.box_size)}, "
+                f"volume_fraction={self.volume_fraction:.4f})")
+
+    @property
+    def volumes(self):
+        """Volume of every object without bore and shell."""
+        return np.pi * (self.radii**2 - self.inner_radii**2) * self.lengths
+
+    @property
+    def volume_fraction(self):
+        """Volume fraction of the (non-overlapping) objects without shells.
+
+        For non-periodic RVEs only the parts of the objects inside of the RVE
+        are counted, which are estimated from the fraction of their voxels 
+        inside of the RVE.
+        """
+        volumes = self.volumes
+        if not self.periodic:
+            dims = tuple(int(round(b / self.voxel_size)) for b in self.box_size)
+            volumes = volumes * [_fraction_inside(self._core_voxels(i), dims) for i in range(len(self))]
+        return float(np.sum(volumes) / np.prod(self.box_size))
+
+    @property
+    def object_numbers(self):
+        """Object number of every object, counted from ``1`` within each phase."""
+        numbers = np.zeros(len(self), dtype=np.int64)
+        for phase in np.unique(self.phases):
+            objects = self.phases == phase
+            numbers[objects] = np.arange(1, np.count_nonzero(objects) + 1)
+        return numbers
+
+    @property
+    def codes(self):
+        """GeoVal voxel code of every object."""
+        return self.phases * PHASE_FACTOR + self.object_numbers
+
+    @property
+    def orientation_tensor(self):
+        """Second-order orientation tensor of the objects (see
+        :func:`~MPaut.fibres.orientation_tensor`)."""
+        return orientation_tensor(self.directions)
+
+    def voxels(self, i, voxel_size=None):
+        """Flat indices of the voxels of one object.
+
+        Parameters
+        ----------
+        i : int
+            Index of the object.
+        voxel_size : float, optional
+            Edge length of the voxels in µm. The default is ``None``, which
+            uses the voxel size of the set.
+
+        Returns
+        -------
+        core : numpy.ndarray
+            Flat indices of the voxels with centers inside of the object.
+        shell : numpy.ndarray
+            Flat indices of the voxels with centers inside of its shell.
+        """
+        voxel_size = self.voxel_size if voxel_size is None else float(voxel_size)
+        dims = tuple(int(round(b / voxel_size)) for b in self.box_size)
+        core, shell = _cylinder_voxels(self.centers[i], self.directions[i], self.lengths[i] / 2.0,
+                                       self.radii[i], self.inner_radii[i], self.shells[i], voxel_size)
+        return _flat_indices(core, dims, self.periodic), _flat_indices(shell, dims, self.periodic)
+
+    def _core_voxels(self, i):
+        # voxel indices of an object (not wrapped into the RVE)
+        return _cylinder_voxels(self.centers[i], self.directions[i], self.lengths[i] / 2.0,
+                                self.radii[i], self.inner_radii[i], 0.0, self.voxel_size)[0]
+
+    def to_voxel_grid(self, voxel_size=None, background=0):
+        """Voxelize the objects into GeoVal voxel codes.
+
+        A voxel belongs to an object if its center lies inside of it. The
+        shells get the code of the shell phase and the object number of their
+        object. Where objects overlap, the later object wins and shells never
+        replace the voxels of an object.
+
+        Parameters
+        ----------
+        voxel_size : float, optional
+            Edge length of the voxels in µm. The default is ``None``, which
+            uses the voxel size of the set.
+        background : int, optional
+            Voxel code of the voxels outside of all objects.
+            The default is ``0`` (pores).
+
+        Returns
+        -------
+        grid : MPaut.voxels.VoxelGrid
+            Voxel grid of the RVE.
+        """
+        voxel_size = self.voxel_size if voxel_size is None else float(voxel_size)
+        dims = tuple(int(round(b / voxel_size)) for b in self.box_size)
+        flat = np.full(int(np.prod(dims)), background, dtype=np.int32)
+        cores = []
+        for i, (number, code) in enumerate(zip(self.object_numbers, self.codes)):
+            core, shell = self.voxels(i, voxel_size)
+            flat[shell] = self.shell_phase * PHASE_FACTOR + number
+            cores.append((core, code))
+        for core, code in cores:
+            flat[core] = code
+        return VoxelGrid(flat.reshape(dims), voxel_size)
+
+
+def random_fibres(rve_dims=64, voxel_size_um=1.0, radius_um=5.0, length_um=20.0, inner_radius_um=0.0,
+                  shell_um=0.0, radius_std_um=0.0, length_std_um=0.0, distribution='gauss',
+                  number_of_fibres=None, volume_fraction=None, orientation='uniform',
+                  axis=(0.0, 0.0, 1.0), spread_deg=0.0, tensor=None, phase=FIBRE_PHASE,
+                  shell_phase=SHELL_PHASE, allow_overlap=False, periodic=True, max_attempts=10000,
+                  seed=None):
+    """Place randomly oriented cylinders, tubes or fibres in an RVE.
+
+    The objects are inserted one after another at random positions. Unless
+    overlaps are allowed, a position is rejected if any voxel of the object
+    or its shell is already occupied. The directions are drawn before the
+    positions, so rejections do not change the orientation distribution.
+    The generation stops when all objects are inserted or when an object
+    does not fit within ``max_attempts`` positions, in which case a 
+    ``RuntimeWarning`` is issued.
+
+    Parameters
+    ----------
+    rve_dims : int or tuple of int, optional
+        Number of voxels of the RVE along x, y and z. The default is ``64``.
+    voxel_size_um : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    radius_um : float, optional
+        Mean radius of the objects in µm. The default is ``5.0``.
+    length_um : float, optional
+        Mean length of the objects in µm. The default is ``20.0``.
+    inner_radius_um : float, optional
+        Radius of the bore of tubes in µm. The default is ``0.0``.
+    shell_um : float, optional
+        Thickness of the shell around the fibres in µm.
+        The default is ``0.0``.
+    radius_std_um, length_std_um : float, optional
+        Standard deviations of the radii and lengths in µm.
+        The defaults are ``0.0``.
+    distribution : str, optional
+        Distribution of radii and lengths, ``'gauss'`` or ``'log_normal'``
+        (see :func:`~MPaut.packing.sample_radii`). The default is ``'gauss'``.
+    number_of_fibres : int, optional
+        Number of objects to insert. The default is ``None``.
+    volume_fraction : float, optional
+        Insert objects until their volume fraction (without shells) reaches
+        this value. Used if ``number_of_fibres`` is not given. For 
+        non-periodic RVEs only the volume inside of the RVE is counted.
+        The default is ``None``.
+    orientation : str, optional
+        Orientation distribution (see
+        :func:`~MPaut.fibres.sample_orientations`). The default is
+        ``'uniform'``.
+    axis : array_like, optional
+        Axis of the orientation distribution. The default is ``(0, 0, 1)``.
+    spread_deg : float, optional
+        Standard deviation of the misalignment in degrees.
+        The default is ``0.0``.
+    tensor : array_like, optional
+        Orientation tensor for ``orientation='tensor'``.
+        The default is ``None``.
+    phase : int, optional
+        Phase number of the objects. The default is ``6`` like GeoVal's
+        fibres, use ``2`` for tubes.
+    shell_phase : int, optional
+        Phase number of the shells. The default is ``7``.
+    allow_overlap : bool, optional
+        Insert the objects without checking for overlaps.
+        The default is ``False``.
+    periodic : bool, optional
+        Generate a periodic RVE. The default is ``True``.
+    max_attempts : int, optional
+        Number of rejected positions after which an object is considered not
+        to fit. The default is ``10000``.
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+
+    Returns
+    -------
+    fibres : MPaut.fibres.CylinderSet
+        The inserted objects. It contains fewer objects than requested if
+        an object did not fit.
+    """
+    rng = np.random.default_rng(seed)
+    box_size = _box_size(rve_dims, voxel_size_um)
+    dims = tuple(int(d) for d in np.broadcast_to(np.asarray(rve_dims, dtype=int), (3,)))
+    if inner_radius_um < 0 or inner_radius_um >= radius_um or shell_um < 0:
+        raise ValueError("The inner radius must lie between 0 and the radius and the shell must not be negative.")
+
+    if number_of_fibres is not None:
+        number = number_of_fibres
+        target = None
+    elif volume_fraction is not None:
+        mean_volume = np.pi * (radius_um**2 + radius_std_um**2 - inner_radius_um**2) * length_um
+        # some spare objects in case the sampled objects are smaller
+        number = int(1.5 * volume_fraction * np.prod(box_size) / mean_volume) + 16
+        target = volume_fraction * np.prod(box_size)
+    else:
+        raise ValueError("Either the number of fibres or the volume fraction must be given.")
+
+    def sample(number):
+        radii = sample_radii(number, radius_um, radius_std_um, distribution, rng)
+        # tubes keep the wall thickness of the mean tube
+        inner_radii = np.clip(radii - (radius_um - inner_radius_um), 0.0, None) if inner_radius_um > 0 else np.zeros(number)
+        lengths = sample_radii(number, length_um, length_std_um, distribution, rng)
+        directions = sample_orientations(number, orientation, axis, spread_deg, tensor, rng)
+        return radii, inner_radii, lengths, directions
+    radii, inner_radii, lengths, directions = sample(number)
+
+    # every object is voxelized once within the first voxel, the candidate
+    # positions are shifted by whole voxels and checked at once
+    occupied = np.zeros(dims, dtype=bool)
+    spacing = float(voxel_size_um)
+    centers = np.zeros((number, 3))
+    placed = 0
+    # volume of the placed objects, for non-periodic RVEs only inside of it
+    volume = 0.0
+    while placed < number if target is None else volume < target:
+        if placed == len(radii):
+            # the spare objects are used up, e.g. because objects were cut 
+            # off at the faces of a non-periodic RVE
+            more = sample(number)
+            radii, inner_radii, lengths, directions = (np.concatenate([old, new]) for old, new in 
+                                                       zip((radii, inner_radii, lengths, directions), more))
+            centers = np.concatenate([centers, np.zeros((number, 3))])
+        offset = rng.random(3) * spacing
+        core, shell = _cylinder_voxels(offset, directions[placed], lengths[placed] / 2.0,
+                                       radii[placed], inner_radii[placed], shell_um, spacing)
+        pattern = np.concatenate([core, shell], axis=1)
+        # most positions are rejected by a few voxels, so a random sample of
+        # the voxels is checked first
+        pattern = pattern[:, rng.permutation(pattern.shape[1])]
+        batch = 8
+        attempts = 0
+        shift = None
+        while attempts < max_attempts:
+            shifts = rng.integers(0, dims, (min(batch, max_attempts - attempts), 3))
+            attempts += len(shifts)
+            if allow_overlap:
+                shift = shifts[0]
+                break
+            for voxels in (pattern[:, :32], pattern):
+                free = ~_occupied(occupied, voxels, shifts, periodic)
+                shifts = shifts[free]
+                if len(shifts) == 0:
+                    break
+            if len(shifts):
+                shift = shifts[0]
+                break
+            # more positions at once when the RVE fills up
+            batch = min(2 * batch, max(8, 2**22 // pattern.shape[1]))
+        if shift is None:
+            break
+        index = pattern + shift[:, None]
+        occupied.flat[_flat_indices(index, dims, periodic)] = True
+        centers[placed] = offset + shift * spacing
+        inside = 1.0 if periodic else _fraction_inside(core + shift[:, None], dims)
+        volume += np.pi * (radii[placed]**2 - inner_radii[placed]**2) * lengths[placed] * inside
+        placed += 1
+
+    if target is None and placed < number:
+        warnings.warn(f"Only {placed} of {number} objects were inserted because the next object did "
+                      f"not fit within {max_attempts} positions.", RuntimeWarning)
+    elif target is not None and volume < target:
+        warnings.warn(f"The volume fraction of the objects {volume / np.prod(box_size):.3f} is below the "
+                      f"target {volume_fraction} because the next object did not fit within "
+                      f"{max_attempts} positions.", RuntimeWarning)
+    return CylinderSet(centers[:placed], directions[:placed], lengths[:placed], radii[:placed],
+                       box_size, inner_radii[:placed], shell_um, phase, shell_phase,
+                       voxel_size_um, periodic)
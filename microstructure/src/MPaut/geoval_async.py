@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous communicator for controlling GeoVal with asyncio.
+
+:class:`~MPaut.geoval_subprocess.GeoVal_Communicator` blocks until GeoVal has
+processed a command, so a python process can only drive a single GeoVal at a
+time. :class:`AsyncGeoValCommunicator` offers the same operations as
+coroutines on asyncio subprocess streams, which allows to overlap the
+expensive commands (e.g. ``distribute`` or the analyses) of many GeoVal
+instances from a single event loop::
+
+    async def generate(seed):
+        async with AsyncGeoValCommunicator(output_folder=f'rve_{seed}') as geo_comm:
+            await geo_comm.initialize_rve(rve_dims=64)
+            await geo_comm.set_randseed(seed)
+            await geo_comm.introduce_objects(N=50)
+            await geo_comm.distribute()
+            await geo_comm.store_voxels('voxels.val')
+
+    async def main():
+        await asyncio.gather(*(generate(seed) for seed in range(10)))
+
+    asyncio.run(main())
+"""
+import asyncio
+import functools
+
+from MPaut.geoval_subprocess import GeoVal_Communicator
+
+def _coroutine(operation):
+    # run the commands of an operation of the blocking communicator on the
+    # asyncio subprocess streams
+    @functools.wraps(operation)
+    async def coroutine(self, *args, **kwargs):
+        return await self._run(operation.steps(self, *args, **kwargs))
+    coroutine.steps = operation.steps
+    return coroutine
+
+class AsyncGeoValCommunicator(GeoVal_Communicator):
+    """Class for communicating with ``GeoVal`` from python using asyncio.
+
+    The communicator is created with the same arguments as
+    :class:`~MPaut.geoval_subprocess.GeoVal_Communicator`, but GeoVal is
+    only started by awaiting :meth:`start` or entering the communicator with
+    ``async with``. All operations of
+    :class:`~MPaut.geoval_subprocess.GeoVal_Communicator` are coroutines,
+    the commands sent to GeoVal and the results are identical.
+
+    Operations of the same communicator must be awaited one after another,
+    operations of different communicators can run concurrently.
+    """
+
+    def _start_process(self):
+        # the process is started in the running event loop by start()
+        self._lock = None
+        return None
+
+    async def start(self):
+        """Start the GeoVal process.
+
+        Returns
+        -------
+        geo_comm : AsyncGeoValCommunicator
+            The started communicator.
+        """
+        self.process = await asyncio.create_subprocess_exec(str(self.executable), '--cmdline',
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE,
+                                                            stdin=asyncio.subprocess.PIPE)
+        self._lock = asyncio.Lock()
+        return self
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _process_cmds(self, cmds):
+        cmds = [cmd.strip() for cmd in cmds]
+        if len(cmds) == 0:
+            print("warning: no commands entered!")
+            return ""
+
+        async with self._lock:
+            # send all commands at once and wait for GeoVal to finish them
+            self.process.stdin.write(b"".join(self._encode_cmd(cmd) for cmd in cmds))
+            await self.process.stdin.drain()
+
+            output = ""
+            while True:
+                line = await self.process.stdout.readline()
+                if not line:
+                    break
+                output += line.decode()
+                if line.strip().decode() == 'done':
+                    break
+        return output
+
+    async def _run(self, steps):
+        # process the commands yielded by an operation and send back the 
+        # output, blocking functions run in the default executor
+        output = None
+        while True:
+            try:
+                step = steps.send(output)
+            except StopIteration as result:
+                return result.value
+            if callable(step):
+                output = await asyncio.get_running_loop().run_in_executor(None, step)
+            else:
+                output = await self._process_cmds(step)
+
+    async def end_communication(self):
+        """Terminate the communication with the GeoVal process.
+
+        This will hand back control of GeoVal back to the GUI.
+        Note that any changes to the RVE made from the GUI will not be
+        reflected in python.
+
+        """
+        self.process.stdin.write(self._encode_cmd("quit\n"))
+        await self.process.stdin.drain()
+
+    async def close(self):
+        """
+        Quits the GeoVal program.
+        """
+        if self.process.returncode is None:
+            self.process.kill()
+        await self.process.wait()
+
+    set_randseed = _coroutine(GeoVal_Communicator.set_randseed)
+    initialize_rve = _coroutine(GeoVal_Communicator.initialize_rve)
+    introduce_objects = _coroutine(GeoVal_Communicator.introduce_objects)
+    split_objects = _coroutine(GeoVal_Communicator.split_objects)
+    transform_objects = _coroutine(GeoVal_Communicator.transform_objects)
+    set_overlap = _coroutine(GeoVal_Communicator.set_overlap)
+    distribute = _coroutine(GeoVal_Communicator.distribute)
+    get_volume_fractions = _coroutine(GeoVal_Communicator.get_volume_fractions)
+    get_object_analysis = _coroutine(GeoVal_Communicator.get_object_analysis)
+    get_chord_length_analysis = _coroutine(GeoVal_Communicator.get_chord_length_analysis)
+    get_variance_analysis = _coroutine(GeoVal_Communicator.get_variance_analysis)
+    get_3d_region_analysis = _coroutine(GeoVal_Communicator.get_3d_region_analysis)
+    set_volume_fraction = _coroutine(GeoVal_Communicator.set_volume_fraction)
+    intro_at_interfaces = _coroutine(GeoVal_Communicator.intro_at_interfaces)
+    control_volume_fractions = _coroutine(GeoVal_Communicator.control_volume_fractions)
+    delete_small_regions = _coroutine(GeoVal_Communicator.delete_small_regions)
+    iterative_delete_small_regions = _coroutine(GeoVal_Communicator.iterative_delete_small_regions)
+    dilation = _coroutine(GeoVal_Communicator.dilation)
+    store_voxels = _coroutine(GeoVal_Communicator.store_voxels)
+    store_objects = _coroutine(GeoVal_Communicator.store_objects)
+    get_voxels = _coroutine(GeoVal_Communicator.get_voxels)
+    view_voxels = _coroutine(GeoVal_Communicator.view_voxels)
@@ -0,0 +1,1242 @@
+# -*- coding: utf-8 -*-
+"""
+Morphological descriptors of voxel RVEs.
+
+The Minkowski functionals (volume, surface area, integral mean curvature and
+Euler characteristic) of every phase are computed by treating the voxels of
+the phase as closed unit cubes. Every vertex of the voxel lattice is
+surrounded by a 2x2x2 configuration of voxels, which determines the share of
+the cubes, faces, edges and vertices of the phase at this vertex. The
+functionals are therefore obtained from a histogram of the 256 possible
+configurations and a lookup table, in a single vectorized pass over the RVE.
+
+Because the voxels are closed cubes, voxels touching at an edge or corner
+are connected, i.e. the Euler characteristic corresponds to 26-connectivity
+of the phase.
+
+Pore and particle sizes are derived from an exact Euclidean distance
+transform, computed with separable passes along the three axes. The
+continuous size distribution of a phase (Münch and Holzer, 2008) is the
+fraction of the phase volume covered by the morphological opening with
+spheres of increasing radius; the local thickness of a voxel is the largest
+sphere diameter for which the voxel is part of the opening.
+
+The anisotropy of a phase is described by its mean intercept length (MIL)
+tensor, fitted to the mean intercept lengths of test lines along a few 
+hundred directions, and by the fabric tensor of its interface normals.
+
+The module also contains native versions of GeoVal's voxel operations
+(dilation, deletion of small regions). They work on exported voxels and
+return a new :class:`~MPaut.voxels.VoxelGrid`, which can be written as
+``.val`` file for GeoVal or VoxSM::
+
+    grid = morphology.delete_small_regions_by_mean(geo_comm.get_voxels(), 0.05)
+    grid.to_val_file('voxels_cleaned.val')
+"""
+import itertools
+import numpy as np
+from MPaut.voxels import VoxelGrid, VoxelStreamReader, PHASE_FACTOR, as_voxel_grid
+from MPaut.voxel_analysis import label_regions
+
+# corner k of a 2x2x2 configuration is the voxel at offset
+# (k >> 2 & 1, k >> 1 & 1, k & 1) and corresponds to bit k of the
+# configuration index
+_CORNERS = list(itertools.product((0, 1), repeat=3))
+
+
+def _minkowski_lut():
+    # contribution of every configuration to volume, surface area, integral
+    # mean curvature and Euler characteristic (in voxel units)
+    lut = np.zeros((256, 4))
+    for config in range(256):
+        occupied = {corner for k, corner in enumerate(_CORNERS) if config >> k & 1}
+        n_cubes = len(occupied)
+        volume = n_cubes / 8
+        euler = (1.0 if occupied else 0.0) - n_cubes / 8
+        surface = 0.0
+        curvature = 0.0
+        for axis in range(3):
+            others = [a for a in range(3) if a != axis]
+            # quarter faces perpendicular to the axis, shared by two voxels
+            for u, v in itertools.product((0, 1), repeat=2):
+                pair = []
+                for side in (0, 1):
+                    corner = [0, 0, 0]
+                    corner[axis], corner[others[0]], corner[others[1]] = side, u, v
+                    pair.append(tuple(corner) in occupied)
+                surface += 0.25 * (pair[0] != pair[1])
+                euler += 0.25 * any(pair)
+            # half edges along the axis, shared by four voxels
+            for side in (0, 1):
+                square = []
+                for u, v in itertools.product((0, 1), repeat=2):
+                    corner = [0, 0, 0]
+                    corner[axis], corner[others[0]], corner[others[1]] = side, u, v
+                    square.append(tuple(corner) in occupied)
+                n = sum(square)
+                if n > 0:
+                    euler -= 0.5
+                if n == 1:
+                    # convex edge
+                    curvature += 0.5 * np.pi / 4
+                elif n == 3:
+                    # concave edge
+                    curvature -= 0.5 * np.pi / 4
+                elif n == 2 and square[0] == square[3]:
+                    # two cubes touching at the edge: two convex edges minus
+                    # the shared line segment
+                    curvature += 0.5 * (np.pi / 2 - np.pi)
+        lut[config] = (volume, surface, curvature, euler)
+    return lut
+
+
+_MINKOWSKI_LUT = _minkowski_lut()
+
+
+def configuration_histogram(indicator, periodic=False):
+    """Count the 2x2x2 voxel configurations of a binary voxel array.
+
+    Parameters
+    ----------
+    indicator : numpy.ndarray
+        3-dimensional boolean array.
+    periodic : bool, optional
+        Treat the array as periodic. Otherwise the array is surrounded by
+        empty voxels. The default is ``False``.
+
+    Returns
+    -------
+    histogram : numpy.ndarray
+        Number of occurrences of each of the 256 configurations.
+    """
+    indicator = np.asarray(indicator, dtype=bool).view(np.uint8)
+    if periodic:
+        padded = np.pad(indicator, [(0, 1)] * 3, mode='wrap')
+    else:
+        padded = np.pad(indicator, 1)
+    shape = tuple(n - 1 for n in padded.shape)
+    config = np.zeros(shape, dtype=np.uint8)
+    for k, (dx, dy, dz) in enumerate(_CORNERS):
+        corner = padded[dx:dx + shape[0], dy:dy + shape[1], dz:dz + shape[2]]
+        config |= corner << np.uint8(k)
+    return np.bincount(config.ravel(), minlength=256)
+
+
+def minkowski_functionals(voxels, periodic=False, include_phase_0=False):
+    """Compute the Minkowski functionals of every phase of the RVE.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    periodic : bool, optional
+        Treat the RVE as periodic. Otherwise the phases are cut at the RVE
+        boundaries, which adds the boundary faces to the surfaces.
+        The default is ``False``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores) in the result. The default is ``False``.
+
+    Returns
+    -------
+    phase_minkowski_dict : dict
+        contains as keys the phase number and as values a dictionary with
+        the volume (µm³), surface area (µm²), integral mean curvature (µm)
+        and Euler characteristic of the phase, and their densities per RVE
+        volume.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, voxel_size = grid.phases, grid.voxel_size
+    total_volume = labels.size * voxel_size**3
+
+    phase_minkowski_dict = {}
+    for phase in np.flatnonzero(np.bincount(labels.ravel())):
+        if phase == 0 and not include_phase_0:
+            continue
+        histogram = configuration_histogram(labels == phase, periodic)
+        volume, surface, curvature, euler = histogram @ _MINKOWSKI_LUT
+        info = {}
+        info['volume'] = float(volume * voxel_size**3)
+        info['surface_area'] = float(surface * voxel_size**2)
+        info['mean_curvature'] = float(curvature * voxel_size)
+        info['euler_characteristic'] = float(round(euler))
+        info['volume_fraction'] = info['volume'] / total_volume
+        info['surface_density'] = info['surface_area'] / total_volume
+        info['mean_curvature_density'] = info['mean_curvature'] / total_volume
+        info['euler_density'] = info['euler_characteristic'] / total_volume
+        phase_minkowski_dict[int(phase)] = info
+    return phase_minkowski_dict
+
+
+def euler_characteristic(voxels, phase, periodic=False):
+    """Compute the Euler characteristic of a single phase.
+
+    The Euler characteristic is the number of connected components minus the
+    number of tunnels plus the number of cavities of the phase.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int
+        Phase number.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+
+    Returns
+    -------
+    euler : int
+        Euler characteristic of the phase.
+    """
+    labels = as_voxel_grid(voxels).phases
+    histogram = configuration_histogram(labels == phase, periodic)
+    return int(round(histogram @ _MINKOWSKI_LUT[:, 3]))
+
+
+def _full_neighbor_offsets(connectivity):
+    if connectivity not in (6, 18, 26):
+        raise ValueError(f"Invalid connectivity {connectivity}. Possible values are 6, 18 and 26.")
+    return [offset for offset in itertools.product((-1, 0, 1), repeat=3)
+            if 0 < sum(abs(d) for d in offset) <= {6: 1, 18: 2, 26: 3}[connectivity]]
+
+
+def _shift(array, offset, periodic, fill):
+    # shifted[x] = array[x + offset]
+    if periodic:
+        return np.roll(array, [-d for d in offset], axis=(0, 1, 2))
+    shifted = np.full_like(array, fill)
+    src = tuple(slice(max(d, 0), n + min(d, 0)) for d, n in zip(offset, array.shape))
+    dst = tuple(slice(max(-d, 0), n + min(-d, 0)) for d, n in zip(offset, array.shape))
+    shifted[dst] = array[src]
+    return shifted
+
+
+def _neighbor_indices(index, shape, offset, periodic):
+    # flat indices of the neighbors of the voxels with the given flat indices
+    coords = np.unravel_index(index, shape)
+    valid = np.ones(len(index), dtype=bool)
+    shifted = []
+    for c, d, n in zip(coords, offset, shape):
+        c = c + d
+        if periodic:
+            c %= n
+        else:
+            valid &= (c >= 0) & (c < n)
+            np.clip(c, 0, n - 1, out=c)
+        shifted.append(c)
+    return np.ravel_multi_index(shifted, shape), valid
+
+
+def _majority_neighbor_codes(codes, index, allowed, offsets, periodic):
+    # most frequent code of the allowed neighbors of the voxels with the given
+    # flat indices, -1 for voxels without allowed neighbors
+    flat_codes = codes.ravel()
+    candidates = np.full((len(index), len(offsets)), -1, dtype=np.int64)
+    for k, offset in enumerate(offsets):
+        neighbors, valid = _neighbor_indices(index, codes.shape, offset, periodic)
+        valid &= allowed[neighbors]
+        candidates[valid, k] = flat_codes[neighbors[valid]]
+    counts = (candidates[:, :, np.newaxis] == candidates[:, np.newaxis, :]).sum(axis=2)
+    counts[candidates < 0] = 0
+    best = candidates[np.arange(len(index)), np.argmax(counts, axis=1)]
+    best[counts.max(axis=1) == 0] = -1
+    return best
+
+
+def _neighbor_count(select, connectivity, periodic):
+    count = np.zeros(select.shape, dtype=np.uint8)
+    for offset in _full_neighbor_offsets(connectivity):
+        count += _shift(select, offset, periodic, False)
+    return count
+
+
+def dilation(voxels, phase, number_of_neighbors=1, repetitions=1, connectivity=6, 
+             periodic=False, target_phases=None):
+    """Dilate a phase into voxels with enough neighbors of the phase.
+
+    This is the native counterpart of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.dilation`. A voxel 
+    of another phase is added to the phase if at least ``number_of_neighbors``
+    of its neighbors belong to the phase. It takes the most frequent voxel 
+    code (object) of these neighbors.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int
+        Phase number of voxels to apply the operation to.
+    number_of_neighbors : int, optional
+        Minimum number of neighbors of the phase. The default is ``1``.
+    repetitions : int, optional
+        Number of times the dilation operation is repeated. 
+        The default is ``1``.
+    connectivity : int, optional
+        Neighborhood of a voxel: ``6``, ``18`` or ``26``. The default is ``6``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+    target_phases : list of int, optional
+        Phases which may be replaced by the dilated phase, e.g. ``[0]`` to 
+        only fill pores. The default is ``None``, which allows all other 
+        phases.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        Voxel grid after the dilation.
+    """
+    return _neighbor_operation(voxels, phase, number_of_neighbors, repetitions, 
+                               connectivity, periodic, dilate=True, 
+                               target_phases=target_phases)
+
+
+def erosion(voxels, phase, number_of_neighbors=1, repetitions=1, connectivity=6, 
+            periodic=False, fill_code=None):
+    """Erode a phase at voxels with enough neighbors of other phases.
+
+    A voxel of the phase is removed if at least ``number_of_neighbors`` of 
+    its neighbors belong to other phases. It takes the most frequent voxel 
+    code of these neighbors or ``fill_code``.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int
+        Phase number of voxels to apply the operation to.
+    number_of_neighbors : int, optional
+        Minimum number of neighbors of other phases. The default is ``1``.
+    repetitions : int, optional
+        Number of times the erosion operation is repeated. 
+        The default is ``1``.
+    connectivity : int, optional
+        Neighborhood of a voxel: ``6``, ``18`` or ``26``. The default is ``6``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+    fill_code : int, optional
+        Voxel code assigned to the removed voxels, e.g. ``0`` to create pores.
+        The default is ``None``, which uses the neighboring voxel codes.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        Voxel grid after the erosion.
+    """
+    return _neighbor_operation(voxels, phase, number_of_neighbors, repetitions, 
+                               connectivity, periodic, dilate=False, 
+                               fill_code=fill_code)
+
+
+def _neighbor_operation(voxels, phase, number_of_neighbors, repetitions, connectivity, 
+                        periodic, dilate, target_phases=None, fill_code=None):
+    grid = as_voxel_grid(voxels)
+    offsets = _full_neighbor_offsets(connectivity)
+    if not 0 < number_of_neighbors <= len(offsets):
+        raise ValueError(f"Number of neighbors must be between 1 and {len(offsets)}.")
+    if not repetitions > 0:
+        raise ValueError("Number of repetitions must be positive")
+        
+    codes = np.array(grid.voxels)
+    for _ in range(repetitions):
+        phases = codes // PHASE_FACTOR
+        in_phase = phases == phase
+        # voxels contributing codes to their neighbors
+        source = in_phase if dilate else ~in_phase
+        count = _neighbor_count(source, connectivity, periodic)
+        change = ~source & (count >= number_of_neighbors)
+        if dilate and target_phases is not None:
+            change &= np.isin(phases, target_phases)
+        index = np.flatnonzero(change)
+        if len(index) == 0:
+            break
+        if fill_code is not None:
+            new_codes = np.full(len(index), fill_code)
+        else:
+            new_codes = _majority_neighbor_codes(codes, index, source.ravel(), 
+                                                 offsets, periodic)
+        codes.ravel()[index] = new_codes
+    return VoxelGrid(codes, grid.voxel_size)
+
+
+def _fill_from_neighbors(codes, index, periodic):
+    # assign the removed voxels with the given flat indices the most frequent 
+    # code of their face neighbors, growing the remaining regions layer by 
+    # layer into the removed voxels
+    offsets = _full_neighbor_offsets(6)
+    filled = np.ones(codes.size, dtype=bool)
+    filled[index] = False
+    while len(index) > 0:
+        new_codes = _majority_neighbor_codes(codes, index, filled, offsets, periodic)
+        assigned = new_codes >= 0
+        if not assigned.any():
+            break
+        codes.ravel()[index[assigned]] = new_codes[assigned]
+        filled[index[assigned]] = True
+        index = index[~assigned]
+
+
+def _delete_regions(grid, labels, small, periodic):
+    # delete the regions marked as small and fill them from their neighbors
+    codes = np.array(grid.voxels)
+    if small.any():
+        _fill_from_neighbors(codes, np.flatnonzero(small[labels]), periodic)
+    return VoxelGrid(codes, grid.voxel_size)
+
+
+def delete_small_regions(voxels, voxel_margin=10, phase=-1, connectivity=6, periodic=False):
+    """Delete small regions in the given phase.
+
+    This is the native counterpart of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.delete_small_regions`.
+    Regions are connected voxels with the same voxel code (see 
+    :func:`~MPaut.voxel_analysis.label_regions`). The voxels of deleted 
+    regions are filled by growing the neighboring regions into them.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    voxel_margin : int, optional
+        Minimum number of voxel for a region. All regions with less voxels 
+        that this value will be deleted. The default is ``10``.
+    phase : int, optional
+        Number of the phase for which regions should be deleted. 
+        A value of ``-1`` deletes small regions of all phases. 
+        The default is ``-1``.
+    connectivity : int, optional
+        Neighborhood used for connecting voxels to regions: ``6``, ``18`` or 
+        ``26``. The default is ``6``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        Voxel grid without the small regions.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, region_phases = label_regions(grid, connectivity, periodic)
+    volumes = np.bincount(labels.ravel(), minlength=len(region_phases))
+    small = volumes < voxel_margin
+    if phase != -1:
+        small &= region_phases == phase
+    return _delete_regions(grid, labels, small, periodic)
+
+
+def delete_small_regions_by_mean(voxels, margin_fraction_of_mean=0.05, connectivity=6, 
+                                 periodic=False, include_phase_0=False):
+    """Delete regions that are smaller than a fraction of the mean volume 
+    for each phase.
+
+    This is the native counterpart of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.iterative_delete_small_regions`.
+    The mean region volume of every phase is the volume weighted mean of 
+    :func:`~MPaut.voxel_analysis.region_analysis`. All regions below the 
+    cutoff are deleted at once and filled by growing the neighboring regions,
+    which only become larger. Hence no regions below the cutoff remain after
+    a single labelling pass.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    margin_fraction_of_mean : float, optional
+        Determines below what fraction of the mean region volume regions 
+        should be deleted. Possible values are between ``0.0`` and ``1.0``. 
+        The default is ``0.05``.
+    connectivity : int, optional
+        Neighborhood used for connecting voxels to regions: ``6``, ``18`` or 
+        ``26``. The default is ``6``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+    include_phase_0 : bool, optional
+        Also delete small regions of phase ``0`` (pores). 
+        The default is ``False``.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        Voxel grid without the small regions.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, region_phases = label_regions(grid, connectivity, periodic)
+    volumes = np.bincount(labels.ravel(), minlength=len(region_phases))
+    
+    min_region_volumes = np.zeros(len(region_phases))
+    for phase in np.unique(region_phases):
+        if phase == 0 and not include_phase_0:
+            continue
+        regions = region_phases == phase
+        mean_volume = np.average(volumes[regions], weights=volumes[regions])
+        min_region_volumes[regions] = margin_fraction_of_mean * mean_volume
+        
+    return _delete_regions(grid, labels, volumes < min_region_volumes, periodic)
+
+
+# distances (in voxels) along a single axis are capped at _MAX_DISTANCE and
+# squared distances of voxels without any background voxel are _INFINITE
+_MAX_DISTANCE = 2**15
+_INFINITE = 2**30
+# largest number of shifts before the lower envelope is used instead
+_MAX_SHIFTS = 8
+
+
+def _scan(mask, current, out=None, combine=False):
+    # distance to the last False voxel along axis 0, continuing from the 
+    # distances of the slice before the first slice
+    for i in range(mask.shape[0]):
+        current += 1
+        current *= mask[i]
+        np.minimum(current, _MAX_DISTANCE, out=current)
+        if out is None:
+            continue
+        if combine:
+            np.minimum(out[i], current, out=out[i])
+        else:
+            out[i] = current
+
+
+def _square(distance):
+    sq = distance.astype(np.int32)
+    np.multiply(sq, sq, out=sq)
+    sq[distance >= _MAX_DISTANCE] = _INFINITE
+    return sq
+
+
+def _root(sq):
+    distance = np.sqrt(sq, dtype=np.float32)
+    distance[sq >= _INFINITE] = np.inf
+    return distance
+
+
+def _shift_pass(sq, axis, periodic, max_shift):
+    # min over y of sq[y] + (x - y)^2 along the axis for |x - y| up to 
+    # max_shift. Shifts are applied in increasing order until they can no 
+    # longer improve any value, so the cost grows with the largest distance.
+    out = sq.copy()
+    tmp = np.empty_like(sq)
+    n = sq.shape[axis]
+    
+    def part(start, stop):
+        index = [slice(None)] * 3
+        index[axis] = slice(start, stop)
+        return tuple(index)
+    
+    max_shift = min(max_shift, n // 2 if periodic else n - 1)
+    current_max = out.max() if out.size else 0
+    shift = 1
+    while shift <= max_shift and shift * shift < current_max:
+        v = sq.dtype.type(shift * shift)
+        low, high = part(None, -shift), part(shift, None)
+        np.add(sq[low], v, out=tmp[low])
+        np.minimum(out[high], tmp[low], out=out[high])
+        np.add(sq[high], v, out=tmp[high])
+        np.minimum(out[low], tmp[high], out=out[low])
+        if periodic:
+            head, tail = part(None, shift), part(n - shift, None)
+            np.add(sq[tail], v, out=tmp[head])
+            np.minimum(out[head], tmp[head], out=out[head])
+            np.add(sq[head], v, out=tmp[tail])
+            np.minimum(out[tail], tmp[tail], out=out[tail])
+        shift += 1
+        if shift % 4 == 0:
+            current_max = out.max()
+    return out
+
+
+def _lower_envelope(f):
+    # min over y of f[y] + (x - y)^2 for every column of f (Felzenszwalb and
+    # Huttenlocher). The parabolas of the lower envelope are collected in 
+    # order of their vertices, the parabola with vertex v[k] and height 
+    # h[k] = f[v[k]] + v[k]^2 is the lowest one between z[k] and z[k + 1].
+    # Every parabola is added and removed at most once, so the cost is linear
+    # in the length of the columns. The envelopes of all columns are stored 
+    # with the flat indices k * lines + column.
+    m, lines = f.shape
+    sites = f < _INFINITE
+    g = f.astype(np.float64) + np.square(np.arange(m, dtype=np.float64))[:, np.newaxis]
+    v = np.zeros(m * lines)
+    h = np.full(m * lines, np.inf)
+    z = np.full((m + 1) * lines, np.inf)
+    z[:lines] = -np.inf
+    columns = np.arange(lines)
+    k = columns - lines
+    start = np.empty(lines)
+    for q in range(m):
+        active = columns if sites[q].all() else np.flatnonzero(sites[q])
+        first = k[active] < 0
+        if first.any():
+            start[active[first]] = -np.inf
+            todo = active[~first]
+        else:
+            todo = active
+        while todo.size:
+            # intersection with the last parabola, which is removed if the 
+            # new parabola is already lower where the last one starts
+            last = k[todo]
+            s = (g[q, todo] - h[last]) / (2.0 * (q - v[last]))
+            start[todo] = s
+            todo = todo[s <= z[last]]
+            k[todo] -= lines
+        k[active] += lines
+        last = k[active]
+        v[last] = q
+        h[last] = g[q, active]
+        z[last] = start[active]
+        z[last + lines] = np.inf
+    
+    out = np.empty((m, lines))
+    k = columns.copy()
+    for x in range(m):
+        todo = columns[z[k + lines] < x]
+        while todo.size:
+            k[todo] += lines
+            todo = todo[z[k[todo] + lines] < x]
+        np.multiply(v[k], -2.0 * x, out=out[x])
+        out[x] += h[k]
+        out[x] += x * x
+    # columns without any finite value stay infinite
+    np.minimum(out, _INFINITE, out=out)
+    return out.astype(np.int64)
+
+
+def _parabola_pass(sq, axis, periodic, chunk_size=2**14):
+    # min over y of sq[y] + (x - y)^2 along the axis. The shifts are cheaper 
+    # for short distances, the lower envelope is only computed for the lines 
+    # with larger distances. Periodic lines are extended by half of their 
+    # length on both sides, which contains the nearest image of every voxel.
+    n = sq.shape[axis]
+    out = _shift_pass(sq, axis, periodic, _MAX_SHIFTS)
+    if (n // 2 if periodic else n - 1) <= _MAX_SHIFTS:
+        return out
+    unresolved = out.max(axis=axis) > (_MAX_SHIFTS + 1)**2
+    if not unresolved.any():
+        return out
+    
+    lines = np.moveaxis(sq, axis, 0)[:, unresolved]
+    if periodic:
+        pad = n // 2 + 1
+        lines = lines[np.arange(-pad, n + pad) % n]
+    else:
+        pad = 0
+    result = np.moveaxis(out, axis, 0)
+    rows, columns = np.nonzero(unresolved)
+    for start in range(0, len(rows), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        envelope = _lower_envelope(lines[:, chunk])[pad:pad + n]
+        result[:, rows[chunk], columns[chunk]] = envelope
+    return out
+
+
+def _squared_distances(mask, periodic):
+    # squared Euclidean distance of every voxel to the nearest False voxel,
+    # periodic is a flag for every axis
+    current = np.full(mask.shape[1:], _MAX_DISTANCE, dtype=np.int32)
+    distance = np.empty(mask.shape, dtype=np.int32)
+    if periodic[0]:
+        # distances carried over from the other end of the lines
+        _scan(mask, current)
+    _scan(mask, current, distance)
+    current[...] = _MAX_DISTANCE
+    if periodic[0]:
+        _scan(mask[::-1], current)
+    _scan(mask[::-1], current, distance[::-1], combine=True)
+    
+    sq = _square(distance)
+    for axis in (1, 2):
+        sq = _parabola_pass(sq, axis, periodic[axis])
+    return sq
+
+
+def euclidean_distance_transform(mask, periodic=False):
+    """Compute the exact Euclidean distance transform of a binary voxel array.
+
+    The distances are computed with a scan along the first axis followed by
+    passes along the second and third axis, which take the minimum over all
+    voxels of a line of the squared distance along the first axis plus the 
+    squared distance along the line. Short distances are resolved with a 
+    few shifted copies of the array, lines with longer distances with the 
+    lower envelope of parabolas (Felzenszwalb and Huttenlocher), so the 
+    cost is linear in the number of voxels and does not depend on the 
+    largest distance.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        3-dimensional boolean array, e.g. ``grid.phases == 0`` for the pores.
+    periodic : bool, optional
+        Treat the array as periodic. The default is ``False``.
+
+    Returns
+    -------
+    distance : numpy.ndarray
+        Distance (in voxels) of every ``True`` voxel to the nearest ``False``
+        voxel, ``0`` for ``False`` voxels and ``inf`` if there are no 
+        ``False`` voxels.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    return _root(_squared_distances(mask, (periodic,) * 3))
+
+
+def distance_transform_file(file, phase, output_file, slab_size=16):
+    """Compute the Euclidean distance transform of a phase in a voxel file.
+
+    The voxel file is streamed in slabs along the x-axis (see 
+    :class:`~MPaut.voxels.VoxelStreamReader`) and the result is written to a
+    memory-mapped ``.npy`` file, so RVEs larger than the available memory can
+    be processed. The RVE is treated as non-periodic.
+
+    Parameters
+    ----------
+    file : str or pathlib.Path
+        Path of the voxel file (.val).
+    phase : int
+        Phase for which the distances are computed.
+    output_file : str or pathlib.Path
+        Path of the ``.npy`` file for the distances.
+    slab_size : int, optional
+        Number of slices along the x-axis processed at once. 
+        The default is ``16``.
+
+    Returns
+    -------
+    distance : numpy.memmap
+        Distance (in voxels) of every voxel of the phase to the nearest voxel
+        of another phase.
+    """
+    reader = VoxelStreamReader(file)
+    dims = reader.dims
+    distance = np.lib.format.open_memmap(output_file, mode='w+', dtype=np.float32, shape=dims)
+    
+    # forward scan along x, storing the distances to the last other voxel
+    current = np.full(dims[1:], _MAX_DISTANCE, dtype=np.int32)
+    for start, slab in reader.iter_slabs(slab_size):
+        forward = np.empty(slab.shape, dtype=np.int32)
+        _scan(slab // PHASE_FACTOR == phase, current, forward)
+        distance[start:start + len(slab)] = forward
+    
+    # backward scan along x, then the passes along y and z for every slab
+    current[...] = _MAX_DISTANCE
+    for start in reversed(range(0, dims[0], slab_size)):
+        stop = min(start + slab_size, dims[0])
+        x_distance = np.asarray(distance[start:stop]).astype(np.int32)
+        _scan(x_distance[::-1] != 0, current, x_distance[::-1], combine=True)
+        sq = _square(x_distance)
+        for axis in (1, 2):
+            sq = _parabola_pass(sq, axis, False)
+        distance[start:stop] = _root(sq)
+    distance.flush()
+    return distance
+
+
+def _dilation(mask, radius, periodic):
+    # all voxels closer than the radius to a True voxel. Only squared 
+    # distances below radius^2 matter, so they are saturated to fit in int16.
+    limit = radius * radius
+    dtype = np.int16 if 2 * limit < np.iinfo(np.int16).max else np.int32
+    cap = dtype(np.ceil(limit))
+    sq = np.where(mask, dtype(0), cap)
+    for axis in range(3):
+        sq = _shift_pass(sq, axis, periodic[axis], int(np.ceil(radius)) - 1)
+        np.minimum(sq, cap, out=sq)
+    return sq < limit
+
+
+def _sphere_ridge(levels, periodic):
+    # centers whose sphere lies within the sphere of a neighbouring center,
+    # i.e. whose radius is smaller by at least the distance between them, 
+    # do not change the opening and are removed
+    padded = levels
+    for axis in range(3):
+        pad = [(0, 0)] * 3
+        pad[axis] = (1, 1)
+        padded = np.pad(padded, pad, mode='wrap' if periodic[axis] else 'constant')
+    ridge = levels > 0
+    shape = levels.shape
+    # levels plus the distance to face, edge and corner neighbours
+    limits = {d: levels + np.float32(np.sqrt(d)) for d in (1, 2, 3)}
+    smaller = np.empty(shape, dtype=bool)
+    for offset in itertools.product((-1, 0, 1), repeat=3):
+        if offset == (0, 0, 0):
+            continue
+        neighbor = padded[tuple(slice(1 + o, 1 + o + n) for o, n in zip(offset, shape))]
+        np.less(neighbor, limits[np.dot(offset, offset)], out=smaller)
+        ridge &= smaller
+    return ridge
+
+
+def _box_dilation(thickness, coords, radius, periodic):
+    # dilation of the centers at the given coordinates, restricted to their
+    # bounding box extended by the radius (wrapped around periodic axes)
+    reach = max(int(np.ceil(radius)) - 1, 0)
+    starts, stops, box_periodic = [], [], []
+    for c, n, p in zip(coords, thickness.shape, periodic):
+        start, stop = int(c.min()) - reach, int(c.max()) + reach + 1
+        if p and stop - start >= n:
+            start, stop = 0, n
+        elif not p:
+            start, stop = max(start, 0), min(stop, n)
+        starts.append(start)
+        stops.append(stop)
+        box_periodic.append(p and stop - start == n)
+    mask = np.zeros([b - a for a, b in zip(starts, stops)], dtype=bool)
+    mask[tuple(c - a for c, a in zip(coords, starts))] = True
+    if all(a >= 0 and b <= n for a, b, n in zip(starts, stops, thickness.shape)):
+        box = tuple(slice(a, b) for a, b in zip(starts, stops))
+    else:
+        box = np.ix_(*[np.arange(a, b) % n for a, b, n in zip(starts, stops, thickness.shape)])
+    block = thickness[box]
+    block[_dilation(mask, radius, box_periodic)] = 2 * radius - 1
+    thickness[box] = block
+
+
+def _box_cost(coords, reach, shape):
+    # voxels times shifts of a box dilation, with the overhead of a box
+    size = [min(int(c.max() - c.min()) + 2 * reach + 1, n) for c, n in zip(coords, shape)]
+    return int(np.prod(size)) * (3 * reach + 1) + 2**16
+
+
+def _opening_thickness(sq, radii, periodic):
+    # local thickness from the openings of the phase with spheres of the 
+    # given radii: the erosion are all voxels at least r from the 
+    # background, the dilation all voxels closer than r to the erosion.
+    # Every voxel only needs the sphere of the largest radius it is a center
+    # for, and only the centers on the ridge of these spheres. The dilation
+    # for every radius is done in tiles around its centers, unless a single
+    # box around all of them is cheaper.
+    radii = np.array(sorted(radii), dtype=float)
+    count = np.searchsorted(radii * radii, sq, side='right')
+    levels = np.r_[0.0, radii].astype(np.float32)[count]
+    # a single radius has no larger spheres to contain the others
+    centers = np.flatnonzero(_sphere_ridge(levels, periodic) if len(radii) > 1 else levels > 0)
+    keys = count.ravel()[centers]
+    order = np.argsort(keys, kind='stable')
+    centers, keys = centers[order], keys[order]
+    
+    thickness = np.zeros(sq.shape, dtype=np.float32)
+    bounds = np.searchsorted(keys, np.arange(1, len(radii) + 2))
+    for k in range(1, len(radii) + 1):
+        if bounds[k - 1] == bounds[k]:
+            continue
+        radius = radii[k - 1]
+        reach = max(int(np.ceil(radius)) - 1, 0)
+        if reach == 0:
+            # spheres of a single voxel
+            thickness.flat[centers[bounds[k - 1]:bounds[k]]] = 2 * radius - 1
+            continue
+        coords = np.unravel_index(centers[bounds[k - 1]:bounds[k]], sq.shape)
+        
+        tile_size = max(16, 2 * reach)
+        tiles = np.ravel_multi_index(tuple(c // tile_size for c in coords), 
+                                     tuple(-(-n // tile_size) for n in sq.shape))
+        order = np.argsort(tiles, kind='stable')
+        splits = np.flatnonzero(np.diff(tiles[order])) + 1
+        groups = [tuple(c[part] for c in coords) for part in np.split(order, splits)]
+        tile_cost = sum(_box_cost(group, reach, sq.shape) for group in groups)
+        if tile_cost >= _box_cost(coords, reach, sq.shape):
+            groups = [coords]
+        for group in groups:
+            _box_dilation(thickness, group, radius, periodic)
+    return thickness
+
+
+def local_thickness(distance, radii=None, periodic=False, chunk_size=None):
+    """Compute the local thickness of a phase.
+
+    The local thickness of a voxel is the diameter of the largest sphere 
+    which contains the voxel and lies completely within the phase. A sphere
+    of radius ``r`` (in voxels) contains all voxels closer than ``r`` to its
+    center and has a diameter of ``2 r - 1`` voxels, so a layer of a single
+    voxel has a thickness of ``1``.
+
+    Parameters
+    ----------
+    distance : numpy.ndarray
+        Euclidean distance transform of the phase (in voxels), e.g. from 
+        :func:`~MPaut.morphology.euclidean_distance_transform` or a 
+        memory-mapped result of 
+        :func:`~MPaut.morphology.distance_transform_file`.
+    radii : list of float, optional
+        Sphere radii (in voxels) for which the openings are evaluated. The 
+        local thickness is resolved to these radii. The default is ``None``,
+        which uses all integer radii up to the largest distance.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+    chunk_size : int, optional
+        Number of slices along the x-axis processed at once. Every chunk is
+        extended by the largest radius on both sides, so the result does not
+        depend on the chunk size. The default is ``None``, which processes 
+        the whole RVE at once.
+
+    Returns
+    -------
+    thickness : numpy.ndarray
+        Local thickness (in voxels) of every voxel of the phase, ``0`` for 
+        all other voxels.
+    """
+    dims = distance.shape
+    max_distance = float(np.max(distance)) if distance.size else 0.0
+    if not np.isfinite(max_distance):
+        raise ValueError("The local thickness is only defined for phases with a boundary.")
+    if radii is None:
+        radii = np.arange(1, int(max_distance) + 1)
+    radii = [r for r in radii if r <= max_distance]
+    if not radii:
+        return np.zeros(dims, dtype=np.float32)
+    
+    if chunk_size is None or chunk_size >= dims[0]:
+        sq = np.rint(np.square(distance, dtype=np.float64)).astype(np.int32)
+        return _opening_thickness(sq, radii, (periodic,) * 3)
+    
+    halo = int(np.ceil(max(radii)))
+    thickness = np.zeros(dims, dtype=np.float32)
+    for start in range(0, dims[0], chunk_size):
+        stop = min(start + chunk_size, dims[0])
+        if periodic:
+            index = np.arange(start - halo, stop + halo) % dims[0]
+            offset = halo
+        else:
+            index = np.arange(max(0, start - halo), min(dims[0], stop + halo))
+            offset = start - index[0]
+        block = np.asarray(distance[index], dtype=np.float64)
+        sq = np.rint(np.square(block)).astype(np.int32)
+        block_thickness = _opening_thickness(sq, radii, (False, periodic, periodic))
+        thickness[start:stop] = block_thickness[offset:offset + stop - start]
+    return thickness
+
+
+def size_distribution(thickness, voxel_size=1.0, chunk_size=64):
+    """Compute the continuous size distribution from a local thickness map.
+
+    Parameters
+    ----------
+    thickness : numpy.ndarray
+        Local thickness (in voxels) from 
+        :func:`~MPaut.morphology.local_thickness`.
+    voxel_size : float, optional
+        Edge length of a voxel in µm. The default is ``1.0``.
+    chunk_size : int, optional
+        Number of slices along the x-axis processed at once. 
+        The default is ``64``.
+
+    Returns
+    -------
+    res : dict
+        Dictionary of the following form:
+            {'diameters_um': [<d_0>, ..., <d_n>],
+             'volume_fraction': [<fraction_0>, ..., <fraction_n>],
+             'cumulative_volume_fraction': [<cumulative_0>, ..., <cumulative_n>],
+             'mean_diameter_um': <mean_diameter>}
+        where the volume fraction is the fraction of the phase volume with 
+        the local thickness ``d_i`` and the cumulative volume fraction the 
+        fraction with a local thickness of at least ``d_i``.
+    """
+    counts = {}
+    for start in range(0, thickness.shape[0], chunk_size):
+        chunk = np.asarray(thickness[start:start + chunk_size])
+        values, value_counts = np.unique(chunk[chunk > 0], return_counts=True)
+        for value, count in zip(values.tolist(), value_counts.tolist()):
+            counts[value] = counts.get(value, 0) + count
+    
+    diameters = np.array(sorted(counts))
+    volumes = np.array([counts[d] for d in diameters], dtype=float)
+    total = volumes.sum()
+    fractions = volumes / total if total > 0 else volumes
+    res = {}
+    res['diameters_um'] = [float(d) for d in diameters * voxel_size]
+    res['volume_fraction'] = [float(f) for f in fractions]
+    res['cumulative_volume_fraction'] = [float(f) for f in np.cumsum(fractions[::-1])[::-1]]
+    res['mean_diameter_um'] = float(np.sum(diameters * fractions) * voxel_size)
+    return res
+
+
+def pore_size_distribution(voxels, phase=0, radii=None, periodic=False):
+    """Compute the continuous pore size distribution of the RVE.
+
+    For other phases than the pores this is the local thickness (particle 
+    size) distribution of the phase.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int, optional
+        Phase number. The default is ``0`` (pores).
+    radii : list of float, optional
+        Sphere radii in voxels, see :func:`~MPaut.morphology.local_thickness`.
+        The default is ``None``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``False``.
+
+    Returns
+    -------
+    res : dict
+        Size distribution of the phase, see 
+        :func:`~MPaut.morphology.size_distribution`.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, voxel_size = grid.phases, grid.voxel_size
+    distance = euclidean_distance_transform(labels == phase, periodic)
+    thickness = local_thickness(distance, radii, periodic)
+    return size_distribution(thickness, voxel_size)
+
+
+def hemisphere_directions(number_of_directions):
+    """Sample approximately uniformly distributed directions on a hemisphere.
+
+    The directions are the points of a Fibonacci lattice on the upper 
+    hemisphere, i.e. every line orientation is represented once.
+
+    Parameters
+    ----------
+    number_of_directions : int
+        Number of directions.
+
+    Returns
+    -------
+    directions : numpy.ndarray
+        Unit vectors of the directions, shape ``(number_of_directions, 3)``.
+    """
+    if number_of_directions < 1:
+        raise ValueError("At least one direction must be sampled.")
+    i = np.arange(number_of_directions)
+    z = 1.0 - (i + 0.5) / number_of_directions
+    r = np.sqrt(1.0 - z**2)
+    phi = i * np.pi * (3.0 - np.sqrt(5.0))
+    return np.stack([r * np.cos(phi), r * np.sin(phi), z], axis=-1)
+
+
+def _line_samples(shape, direction, periodic, line_spacing):
+    # sample the voxel grid along parallel lines, advancing one voxel per 
+    # sample along the dominant axis of the direction. The start points are
+    # integer, so all lines share the same rounded offsets along each axis.
+    direction = np.asarray(direction, dtype=float)
+    a = int(np.argmax(np.abs(direction)))
+    t = np.arange(shape[a])
+    strides = np.cumprod((1,) + tuple(shape[:0:-1]))[::-1]
+    
+    index = t * strides[a]
+    valid = np.ones(1, dtype=bool)
+    for axis in range(3):
+        if axis == a:
+            continue
+        n = shape[axis]
+        offsets = np.floor(t * direction[axis] / direction[a] + 0.5).astype(np.int64)
+        positions = np.arange(0, n, line_spacing)[:, None] + offsets
+        if periodic:
+            positions %= n
+        else:
+            inside = (positions >= 0) & (positions < n)
+            positions = np.where(inside, positions, 0)
+            valid = valid[..., None, :] & inside
+        index = index[..., None, :] + positions * strides[axis]
+    index = index.reshape(-1, shape[a])
+    valid = None if periodic else valid.reshape(-1, shape[a])
+    return index, valid, 1.0 / abs(direction[a])
+
+
+def mean_intercept_lengths(voxels, directions=256, periodic=True, line_spacing=1, 
+                           include_phase_0=False):
+    """Compute the mean intercept length of every phase along many directions.
+
+    For every direction, the RVE is sampled along parallel test lines through
+    all voxels of the face perpendicular to the dominant axis of the 
+    direction. The mean intercept length of a phase is the total length of
+    the test lines inside the phase divided by the number of intercepts 
+    (segments of the lines inside the phase).
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    directions : int or numpy.ndarray, optional
+        Number of directions sampled on the hemisphere (see 
+        :func:`~MPaut.morphology.hemisphere_directions`) or array of 
+        direction vectors with shape ``(n, 3)``. The default is ``256``.
+    periodic : bool, optional
+        Wrap the test lines around the RVE boundaries. The default is ``True``.
+    line_spacing : int, optional
+        Spacing of the test lines in voxels. Larger spacings are faster but 
+        less accurate. The default is ``1``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores). The default is ``False``.
+
+    Returns
+    -------
+    directions : numpy.ndarray
+        Unit vectors of the directions, shape ``(n, 3)``.
+    phase_mil_dict : dict
+        contains as keys the phase number and as values the mean intercept 
+        lengths (in µm) for all directions, ``nan`` for directions in which
+        no test line hits the phase.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, voxel_size = grid.phases, grid.voxel_size
+    if np.isscalar(directions):
+        directions = hemisphere_directions(int(directions))
+    directions = np.asarray(directions, dtype=float).reshape(-1, 3)
+    directions = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+    
+    phases, inverse = np.unique(labels, return_inverse=True)
+    inverse = inverse.reshape(-1).astype(np.int32)
+    outside = len(phases)
+    lengths = np.zeros((len(directions), len(phases)))
+    intercepts = np.zeros((len(directions), len(phases)))
+    for i, direction in enumerate(directions):
+        index, valid, step = _line_samples(labels.shape, direction, periodic, line_spacing)
+        samples = inverse[index]
+        if valid is not None:
+            samples[~valid] = outside
+        entries = np.ones(samples.shape, dtype=bool)
+        entries[:, 1:] = samples[:, 1:] != samples[:, :-1]
+        lengths[i] = np.bincount(samples.ravel(), minlength=outside + 1)[:outside] * step
+        intercepts[i] = np.bincount(samples[entries], minlength=outside + 1)[:outside]
+    
+    phase_mil_dict = {}
+    for j, phase in enumerate(phases):
+        if phase == 0 and not include_phase_0:
+            continue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            phase_mil_dict[int(phase)] = lengths[:, j] / intercepts[:, j] * voxel_size
+    return directions, phase_mil_dict
+
+
+def _mil_tensor(directions, mil):
+    # fit the quadratic form 1 / MIL(d)^2 = d^T M d (Harrigan and Mann, 1984)
+    d = directions
+    design = np.stack([d[:, 0]**2, d[:, 1]**2, d[:, 2]**2, 
+                       2 * d[:, 0] * d[:, 1], 2 * d[:, 0] * d[:, 2], 2 * d[:, 1] * d[:, 2]], axis=-1)
+    m = np.linalg.lstsq(design, 1.0 / mil**2, rcond=None)[0]
+    return np.array([[m[0], m[3], m[4]], 
+                     [m[3], m[1], m[5]], 
+                     [m[4], m[5], m[2]]])
+
+
+def _box_filter(array, periodic):
+    for axis in range(3):
+        if periodic:
+            array = np.roll(array, 1, axis) + array + np.roll(array, -1, axis)
+        else:
+            padded = np.pad(array, [(1, 1) if a == axis else (0, 0) for a in range(3)], mode='edge')
+            n = array.shape[axis]
+            array = (padded.take(range(0, n), axis) + padded.take(range(1, n + 1), axis) 
+                     + padded.take(range(2, n + 2), axis))
+    return array / 3.0
+
+
+def _gradient(array, axis, periodic):
+    if periodic:
+        return (np.roll(array, -1, axis) - np.roll(array, 1, axis)) / 2.0
+    return np.gradient(array, axis=axis)
+
+
+def interface_fabric_tensor(voxels, phase, periodic=True):
+    """Compute the fabric tensor of the interface normals of a phase.
+
+    The interface normals are the gradients of the (smoothed) indicator 
+    function of the phase. The fabric tensor is the average of the dyadic 
+    products of the normals, weighted by the interface area, and has a 
+    trace of ``1``. Isotropic structures have three eigenvalues of ``1/3``,
+    grains elongated along a direction have a small eigenvalue for this 
+    direction.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int
+        Phase number.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``True``.
+
+    Returns
+    -------
+    fabric : numpy.ndarray
+        Symmetric 3x3 fabric tensor, zero if the phase has no interface.
+    """
+    labels = as_voxel_grid(voxels).phases
+    indicator = _box_filter((labels == phase).astype(np.float32), periodic)
+    gradient = [_gradient(indicator, axis, periodic) for axis in range(3)]
+    norm = np.sqrt(gradient[0]**2 + gradient[1]**2 + gradient[2]**2)
+    interface = norm > 0
+    norm = norm[interface]
+    gradient = [g[interface] for g in gradient]
+    
+    fabric = np.zeros((3, 3))
+    if len(norm) == 0:
+        return fabric
+    for i in range(3):
+        for j in range(i, 3):
+            fabric[i, j] = fabric[j, i] = np.sum(gradient[i] * gradient[j] / norm, dtype=np.float64)
+    return fabric / np.sum(norm, dtype=np.float64)
+
+
+def _eigen(tensor, descending=True):
+    values, vectors = np.linalg.eigh(tensor)
+    order = np.argsort(values)
+    if descending:
+        order = order[::-1]
+    return values[order], vectors[:, order].T
+
+
+def anisotropy_analysis(voxels, directions=256, periodic=True, line_spacing=1, 
+                        include_phase_0=False):
+    """Compute the mean intercept length and interface fabric tensors of 
+    every phase.
+
+    The mean intercept lengths along all directions (see 
+    :func:`~MPaut.morphology.mean_intercept_lengths`) are fitted by an 
+    ellipsoid. Its principal axes are the principal directions of the phase 
+    and its semi-axes the mean intercept lengths along them. The interface 
+    fabric tensor is computed with 
+    :func:`~MPaut.morphology.interface_fabric_tensor`.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    directions : int or numpy.ndarray, optional
+        Number of directions or array of direction vectors. 
+        The default is ``256``.
+    periodic : bool, optional
+        Treat the RVE as periodic. The default is ``True``.
+    line_spacing : int, optional
+        Spacing of the test lines in voxels. The default is ``1``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores). The default is ``False``.
+
+    Returns
+    -------
+    phase_anisotropy_dict : dict
+        contains as keys the phase number and as values a dictionary with 
+        the mean intercept lengths along the principal directions in 
+        descending order (``'mil_eigenvalues_um'``), the principal directions 
+        (``'mil_eigenvectors'``, one row per eigenvalue), the degree of 
+        anisotropy (``'mil_degree_of_anisotropy'``, ratio of the largest 
+        and smallest mean intercept length), the eigenvalues and eigenvectors
+        of the interface fabric tensor in descending order 
+        (``'fabric_eigenvalues'``, ``'fabric_eigenvectors'``) and its degree
+        of anisotropy (``'fabric_degree_of_anisotropy'``).
+    """
+    grid = as_voxel_grid(voxels)
+    directions, phase_mil_dict = mean_intercept_lengths(grid, directions, periodic, line_spacing, 
+                                                        include_phase_0)
+    
+    phase_anisotropy_dict = {}
+    for phase, mil in phase_mil_dict.items():
+        sampled = np.isfinite(mil)
+        if np.count_nonzero(sampled) < 6:
+            continue
+        tensor = _mil_tensor(directions[sampled], mil[sampled])
+        values, vectors = _eigen(tensor, descending=False)
+        mil_values = 1.0 / np.sqrt(np.maximum(values, np.finfo(float).tiny))
+        fabric_values, fabric_vectors = _eigen(interface_fabric_tensor(grid, phase, periodic))
+        
+        phase_anisotropy_dict[phase] = {
+            'mil_eigenvalues_um': [float(v) for v in mil_values],
+            'mil_eigenvectors': vectors.tolist(),
+            'mil_degree_of_anisotropy': float(mil_values[0] / mil_values[-1]),
+            'fabric_eigenvalues': [float(v) for v in fabric_values],
+            'fabric_eigenvectors': fabric_vectors.tolist(),
+            'fabric_degree_of_anisotropy': (float(fabric_values[0] / fabric_values[-1]) 
+                                            if fabric_values[-1] > 0 else None)}
+    return phase_anisotropy_dict
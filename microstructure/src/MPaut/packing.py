@@ -0,0 +1,850 @@
+# -*- coding: utf-8 -*-
+"""
+Native generation of sphere packings.
+
+The packings are generated in continuous space and voxelized directly into
+an array of GeoVal voxel codes, so sphere-based RVEs can be created without
+the GeoVal executable (e.g. on Linux) and without repeated calls of
+:func:`~MPaut.geoval_subprocess.GeoVal_Communicator.distribute`::
+
+    spheres = packing.random_sequential_addition(rve_dims=64, radius_um=5.0,
+                                                 number_of_spheres=60, seed=3)
+    grid = spheres.to_voxel_grid()
+    grid.to_val_file('voxels.val')
+
+Random sequential addition (:func:`~MPaut.packing.random_sequential_addition`)
+is fast but jams at about 38 % volume fraction. Denser packings (up to about
+64 %) are generated with the event-driven Lubachevsky-Stillinger algorithm
+(:func:`~MPaut.packing.lubachevsky_stillinger`).
+
+Overlaps and collisions are detected with a uniform cell list whose cells are
+at least as large as the largest sphere diameter, so every sphere only has to
+be checked against the spheres in the 27 surrounding cells. Lengths are given
+in µm.
+"""
+import heapq
+import warnings
+import numpy as np
+from MPaut.voxels import VoxelGrid, PHASE_FACTOR
+
+# GeoVal assigns spheres to phase 1 (the type id of the object type)
+SPHERE_PHASE = 1
+
+
+class SpherePacking:
+    """Spheres in a box-shaped RVE.
+
+    Attributes
+    ----------
+    centers : numpy.ndarray
+        Centers of the spheres in µm, shape ``(n, 3)``.
+    radii : numpy.ndarray
+        Radii of the spheres in µm.
+    phases : numpy.ndarray
+        Phase number of every sphere.
+    box_size : numpy.ndarray
+        Edge lengths of the RVE in µm.
+    voxel_size : float
+        Edge length of the voxels used by
+        :func:`~MPaut.packing.SpherePacking.to_voxel_grid` in µm.
+    periodic : bool
+        Whether the spheres continue across opposite faces of the RVE.
+    """
+
+    def __init__(self, centers, radii, box_size, phases=SPHERE_PHASE, voxel_size=1.0, periodic=True):
+        self.centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        self.radii = np.asarray(radii, dtype=float).reshape(-1)
+        if len(self.centers) != len(self.radii):
+            raise ValueError(f"Got {len(self.centers)} sphere centers but {len(self.radii)} radii.")
+        self.phases = np.broadcast_to(np.asarray(phases, dtype=int), self.radii.shape).copy()
+        self.box_size = np.broadcast_to(np.asarray(box_size, dtype=float), (3,)).copy()
+        self.voxel_size = float(voxel_size)
+        self.periodic = periodic
+
+    def __len__(self):
+        return len(self.radii)
+
+    def __repr__(self):
+        return (f"SpherePacking(spheres={len(self)}, box_size={tuple(float(b) for b in self.box_size)}, "
+                f"volume_fraction={self.volume_fraction:.4f})")
+
+    @property
+    def volume_fraction(self):
+        """Volume fraction of the (non-overlapping) spheres.
+
+        Only the parts of the spheres inside of the RVE are counted for 
+        non-periodic packings, like in :func:`~MPaut.packing.SpherePacking.to_voxel_grid`.
+        """
+        if self.periodic:
+            volume = np.sum(4.0 / 3.0 * np.pi * self.radii**3)
+        else:
+            volume = np.sum(_volumes_inside(self.centers, self.radii, self.box_size))
+        return float(volume / np.prod(self.box_size))
+
+    @property
+    def object_numbers(self):
+        """Object number of every sphere, counted from ``1`` within each phase."""
+        numbers = np.zeros(len(self), dtype=np.int64)
+        for phase in np.unique(self.phases):
+            spheres = self.phases == phase
+            numbers[spheres] = np.arange(1, np.count_nonzero(spheres) + 1)
+        return numbers
+
+    @property
+    def codes(self):
+        """GeoVal voxel code of every sphere."""
+        return self.phases * PHASE_FACTOR + self.object_numbers
+
+    def overlaps(self, tolerance=1e-9):
+        """Find overlapping spheres.
+
+        Parameters
+        ----------
+        tolerance : float, optional
+            Overlaps smaller than the tolerance (in µm) are ignored.
+            The default is ``1e-9``.
+
+        Returns
+        -------
+        pairs : numpy.ndarray
+            Indices ``(i, j)`` with ``i < j`` of the overlapping spheres.
+        """
+        # at least one sphere per cell on average
+        cell_size = max(2.0 * self.radii.max(), (np.prod(self.box_size) / len(self))**(1.0 / 3.0)) if len(self) else 1.0
+        cells = _CellList(self.box_size, cell_size, self.periodic, len(self))
+        cells.insert(np.arange(len(self)), self.centers, self.radii)
+        pairs = []
+        for i in range(len(self)):
+            neighbors = cells.neighbors(self.centers[i:i + 1])[0]
+            # small boxes contain some cells several times
+            neighbors = np.unique(neighbors[neighbors > i])
+            distance = _distances(self.centers[i], self.centers[neighbors], self.box_size, self.periodic)
+            overlap = distance < self.radii[i] + self.radii[neighbors] - tolerance
+            pairs.extend((i, int(j)) for j in neighbors[overlap])
+        return np.array(pairs, dtype=np.int64).reshape(-1, 2)
+
+    def to_voxel_grid(self, voxel_size=None, background=0):
+        """Voxelize the spheres into GeoVal voxel codes.
+
+        A voxel belongs to a sphere if its center lies inside of the sphere.
+        Only the voxels in the bounding box of each sphere are evaluated.
+
+        Parameters
+        ----------
+        voxel_size : float, optional
+            Edge length of the voxels in µm. The default is ``None``, which
+            uses the voxel size of the packing.
+        background : int, optional
+            Voxel code of the voxels outside of all spheres.
+            The default is ``0`` (pores).
+
+        Returns
+        -------
+        grid : MPaut.voxels.VoxelGrid
+            Voxel grid of the RVE.
+        """
+        voxel_size = self.voxel_size if voxel_size is None else float(voxel_size)
+        dims = tuple(int(round(b / voxel_size)) for b in self.box_size)
+        voxels = np.full(dims, background, dtype=np.int32)
+        spacing = (voxel_size,) * 3
+        for center, radius, code in zip(self.centers, self.radii, self.codes):
+            index, mask = _ball_voxels(center, radius, dims, self.periodic, spacing)
+            voxels[index] = np.where(mask, code, voxels[index])
+        return VoxelGrid(voxels, voxel_size)
+
+
+def _ball_voxels(center, radius, dims, periodic, spacing):
+    # voxels with centers inside of a ball, evaluated in its bounding box;
+    # returns an open mesh index into the voxel array and the mask of the ball
+    axes = []
+    for c, n, h in zip(center, dims, spacing):
+        i = np.arange(int(np.ceil((c - radius) / h - 0.5)), int(np.floor((c + radius) / h - 0.5)) + 1)
+        if periodic:
+            i = i[:n]
+        axes.append(i)
+    d = [(i + 0.5) * h - c for i, c, h in zip(axes, center, spacing)]
+    mask = d[0][:, None, None]**2 + d[1][None, :, None]**2 + d[2][None, None, :]**2 < radius**2
+    if periodic:
+        axes = [i % n for i, n in zip(axes, dims)]
+    else:
+        inside = [(i >= 0) & (i < n) for i, n in zip(axes, dims)]
+        mask = mask[np.ix_(*inside)]
+        axes = [i[k] for i, k in zip(axes, inside)]
+    return np.ix_(*axes), mask
+
+
+def _volumes_inside(centers, radii, box_size, n=32, chunk_size=1024):
+    # volume of every sphere inside of the box. The height of the spheres 
+    # inside of the box is integrated with the midpoint rule over the part of
+    # their cross-section which lies inside of the box, only for the spheres 
+    # crossing a face of the box
+    volumes = 4.0 / 3.0 * np.pi * radii**3
+    low = np.maximum(centers - radii[:, None], 0.0)
+    high = np.minimum(centers + radii[:, None], box_size)
+    cut = np.flatnonzero(np.any((centers - radii[:, None] < 0) | (centers + radii[:, None] > box_size), axis=1))
+    t = (np.arange(n) + 0.5) / n
+    for start in range(0, len(cut), chunk_size):
+        i = cut[start:start + chunk_size]
+        x = low[i, 0, None] + np.outer(high[i, 0] - low[i, 0], t) - centers[i, 0, None]
+        y = low[i, 1, None] + np.outer(high[i, 1] - low[i, 1], t) - centers[i, 1, None]
+        h = np.sqrt(np.maximum(radii[i, None, None]**2 - x[:, :, None]**2 - y[:, None, :]**2, 0.0))
+        z = centers[i, 2, None, None]
+        height = np.clip(np.minimum(z + h, box_size[2]) - np.maximum(z - h, 0.0), 0.0, None)
+        area = (high[i, 0] - low[i, 0]) * (high[i, 1] - low[i, 1]) / n**2
+        volumes[i] = np.sum(height, axis=(1, 2)) * area
+    return volumes
+
+
+def _distances(center, others, box_size, periodic):
+    d = others - center
+    if periodic:
+        d -= box_size * np.round(d / box_size)
+    return np.sqrt(np.sum(d**2, axis=-1))
+
+
+class _CellList:
+    # uniform grid of cells storing the indices, centers and radii of the
+    # spheres whose centers lie inside of each cell. Empty slots have index
+    # -1 and a large negative radius, so they never overlap.
+
+    offsets = np.array(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij')).reshape(3, -1).T
+    empty_radius = -1e30
+
+    def __init__(self, box_size, min_cell_size, periodic, capacity_hint=0):
+        self.box_size = box_size
+        self.periodic = periodic
+        self.counts = np.maximum(np.floor(box_size / min_cell_size).astype(int), 1)
+        self.cell_size = box_size / self.counts
+        # non-periodic cell lists are padded with a layer of empty cells
+        self.pad = 0 if periodic else 1
+        self.shape = tuple(self.counts + 2 * self.pad)
+        n_cells = int(np.prod(self.shape))
+        capacity = max(1, -(-capacity_hint // n_cells))
+        self.slots = np.full((n_cells, capacity), -1, dtype=np.int64)
+        self.spheres = np.zeros((n_cells, capacity, 4))
+        self.spheres[..., 3] = self.empty_radius
+        self.fill = np.zeros(n_cells, dtype=np.int64)
+
+        # the 27 cells around every cell
+        cells = np.stack(np.unravel_index(np.arange(n_cells), self.shape), axis=-1)
+        cells = cells[:, None, :] + self.offsets
+        if self.periodic:
+            cells %= self.counts
+        else:
+            cells = np.clip(cells, 0, np.array(self.shape) - 1)
+        self.table = np.ravel_multi_index(tuple(np.moveaxis(cells, -1, 0)), self.shape)
+
+    def cell_index(self, centers):
+        cell = np.floor(centers / self.cell_size).astype(np.int64)
+        cell = np.clip(cell, 0, self.counts - 1) + self.pad
+        return np.ravel_multi_index(tuple(cell.T), self.shape)
+
+    def insert(self, indices, centers, radii):
+        for index, center, radius, cell in zip(indices, centers, radii, self.cell_index(centers)):
+            if self.fill[cell] == self.slots.shape[1]:
+                self.slots = np.concatenate([self.slots, np.full_like(self.slots, -1)], axis=1)
+                empty = np.zeros_like(self.spheres)
+                empty[..., 3] = self.empty_radius
+                self.spheres = np.concatenate([self.spheres, empty], axis=1)
+            self.slots[cell, self.fill[cell]] = index
+            self.spheres[cell, self.fill[cell], :3] = center
+            self.spheres[cell, self.fill[cell], 3] = radius
+            self.fill[cell] += 1
+
+    def neighbors(self, centers):
+        # indices of the spheres in the 27 cells around every center,
+        # including empty slots
+        return self.slots[self.table[self.cell_index(centers)]].reshape(len(centers), -1)
+
+    def spheres_near(self, points):
+        # centers and radii of the spheres in the 27 cells around every
+        # point, shape (n, k, 4)
+        return self.spheres[self.table[self.cell_index(points)]].reshape(len(points), -1, 4)
+
+    def gaps(self, points, chunk_size=4096):
+        # distance from every point to the surface of the closest sphere.
+        # Spheres outside of the 27 cells are at least one cell size minus
+        # the largest radius away, so the gaps are exact up to this value
+        result = np.empty(len(points))
+        for start in range(0, len(points), chunk_size):
+            chunk = slice(start, start + chunk_size)
+            spheres = self.spheres_near(points[chunk])
+            d2 = 0.0
+            for axis in range(3):
+                d = spheres[..., axis] - points[chunk, None, axis]
+                if self.periodic:
+                    d -= self.box_size[axis] * np.round(d / self.box_size[axis])
+                d2 = d2 + d * d
+            result[chunk] = np.min(np.sqrt(d2) - spheres[..., 3], axis=1)
+        return result
+
+
+def _overlap(points, point_radii, spheres, margin, box_size, periodic):
+    # overlap of points (with radii) and spheres, broadcast along all but the
+    # last axis of the points and spheres
+    d2 = 0.0
+    for axis in range(3):
+        d = spheres[..., axis] - points[..., axis]
+        if periodic:
+            d -= box_size[axis] * np.round(d / box_size[axis])
+        d2 = d2 + d * d
+    limit = np.maximum(point_radii + spheres[..., 3] - margin, 0.0)
+    return d2 < limit * limit
+
+
+class _FreeSpace:
+    # sub-cells which can still contain the center of a new sphere with at
+    # least the given radius. Sub-cells are removed once they lie completely
+    # inside of the exclusion zone of an inserted sphere, so candidates are
+    # only drawn from the remaining space. When no candidate can be placed,
+    # the remaining sub-cells are subdivided, which removes the covered parts
+    # until the packing is saturated (no sub-cells left).
+
+    max_level = 12
+
+    def __init__(self, box_size, periodic, max_cells=2**21):
+        self.box_size = box_size
+        self.periodic = periodic
+        self.max_cells = max_cells
+        self.radius = None
+
+    def __len__(self):
+        return len(self.live)
+
+    def build(self, radius, centers, radii):
+        self.radius = radius
+        self.level = 0
+        size = max(radius / 4.0, (np.prod(self.box_size) / self.max_cells)**(1.0 / 3.0))
+        self.dims = tuple(int(d) for d in np.maximum(np.round(self.box_size / size), 1))
+        self.spacing = self.box_size / self.dims
+        self.base_dims = self.dims
+        self.base_half_diagonal = np.linalg.norm(self.spacing) / 2.0
+        self.excluded = np.zeros(self.dims, dtype=bool)
+        self.live = None
+        self.exclude(centers, radii)
+
+    def exclude(self, centers, radii):
+        half_diagonal = np.linalg.norm(self.spacing) / 2.0
+        if self.level > 0:
+            # check the remaining sub-cells inside of the level 0 cells near
+            # the new spheres
+            near = np.zeros(self.base_dims, dtype=bool)
+            for center, radius in zip(centers, radii):
+                index, mask = _ball_voxels(center, radius + self.radius + self.base_half_diagonal,
+                                           self.base_dims, self.periodic, self.box_size / self.base_dims)
+                near[index] |= mask
+            parents = np.ravel_multi_index(tuple(np.stack(np.unravel_index(self.live, self.dims)) >> self.level),
+                                           self.base_dims)
+            candidates = np.flatnonzero(near.ravel()[parents])
+            d = self.centers(self.live[candidates])[:, None, :] - centers[None, :, :]
+            if self.periodic:
+                d -= self.box_size * np.round(d / self.box_size)
+            limit = np.maximum(radii + self.radius - half_diagonal, 0.0)
+            covered = candidates[np.any(np.sum(d**2, axis=-1) < limit**2, axis=1)]
+            self.live = np.delete(self.live, covered)
+            return
+
+        for center, radius in zip(centers, radii):
+            exclusion = radius + self.radius - half_diagonal
+            if exclusion > 0:
+                index, mask = _ball_voxels(center, exclusion, self.dims, self.periodic, self.spacing)
+                self.excluded[index] |= mask
+        if self.live is None:
+            self.live = np.flatnonzero(~self.excluded.ravel())
+        else:
+            self.live = self.live[~self.excluded.ravel()[self.live]]
+
+    def refine(self, cells):
+        if self.level == self.max_level:
+            self.live = self.live[:0]
+            return
+        parents = self.centers()
+        self.level += 1
+        self.dims = tuple(2 * d for d in self.dims)
+        self.spacing = self.spacing / 2.0
+        half_diagonal = np.linalg.norm(self.spacing) / 2.0
+        children = parents[:, None, :] + (_CellList.offsets[_CellList.offsets.min(axis=1) >= 0] - 0.5) * self.spacing
+
+        live = []
+        for start in range(0, len(parents), 4096):
+            chunk = slice(start, start + 4096)
+            # only spheres whose exclusion zone reaches into the parent can
+            # cover one of its children
+            spheres = cells.spheres_near(parents[chunk])
+            relevant = _overlap(parents[chunk, None, :], self.radius, spheres, 0.0,
+                                self.box_size, self.periodic)
+            count = max(int(relevant.sum(axis=1).max()), 1)
+            order = np.argsort(~relevant, axis=1, kind='stable')[:, :count]
+            spheres = np.take_along_axis(spheres, order[..., None], axis=1)
+            spheres[..., 3] = np.where(np.take_along_axis(relevant, order, axis=1),
+                                       spheres[..., 3], _CellList.empty_radius)
+            covered = np.any(_overlap(children[chunk, :, None, :], self.radius, spheres[:, None],
+                                      half_diagonal, self.box_size, self.periodic), axis=-1)
+            live.append(children[chunk][~covered])
+        cells_index = np.floor(np.concatenate(live) / self.spacing).astype(np.int64)
+        self.live = np.ravel_multi_index(tuple(cells_index.T), self.dims)
+
+    def centers(self, live=None):
+        live = self.live if live is None else live
+        return (np.stack(np.unravel_index(live, self.dims), axis=-1) + 0.5) * self.spacing
+
+    def sample(self, number, rng):
+        cells = self.live[rng.integers(len(self.live), size=number)]
+        cells = np.stack(np.unravel_index(cells, self.dims), axis=-1)
+        return (cells + rng.random((number, 3))) * self.spacing
+
+
+def sample_radii(number, radius_um, radius_std_um=0.0, distribution='gauss', rng=None):
+    """Sample sphere radii from a random distribution.
+
+    Parameters
+    ----------
+    number : int
+        Number of radii.
+    radius_um : float
+        Mean radius in µm.
+    radius_std_um : float, optional
+        Standard deviation of the radii in µm. The default is ``0.0``.
+    distribution : str, optional
+        ``'gauss'`` (normal distribution, non-positive radii are drawn
+        again) or ``'log_normal'``, like
+        :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.introduce_objects`.
+        The default is ``'gauss'``.
+    rng : numpy.random.Generator, optional
+        Random number generator. The default is ``None``, which creates a
+        new generator.
+
+    Returns
+    -------
+    radii : numpy.ndarray
+        Radii in µm.
+    """
+    if radius_um <= 0 or radius_std_um < 0:
+        raise ValueError("The mean radius must be positive and the standard deviation must not be negative.")
+    if rng is None:
+        rng = np.random.default_rng()
+
+    if distribution == 'gauss':
+        radii = rng.normal(radius_um, radius_std_um, number)
+        invalid = radii <= 0
+        while np.any(invalid):
+            radii[invalid] = rng.normal(radius_um, radius_std_um, np.count_nonzero(invalid))
+            invalid = radii <= 0
+        return radii
+    elif distribution == 'log_normal':
+        sigma2 = np.log(1.0 + (radius_std_um / radius_um)**2)
+        return rng.lognormal(np.log(radius_um) - sigma2 / 2.0, np.sqrt(sigma2), number)
+    raise ValueError("Random distributions other than 'gauss' and 'log_normal' are not supported yet!")
+
+
+def _box_size(rve_dims, voxel_size_um):
+    dims = np.broadcast_to(np.asarray(rve_dims, dtype=int), (3,))
+    return dims * float(voxel_size_um)
+
+
+def _radii_for_volume(volume, radius_um, radius_std_um, distribution, rng):
+    # draw radii until the volume of the spheres reaches the given volume
+    mean_volume = 4.0 / 3.0 * np.pi * (radius_um**2 + radius_std_um**2)**1.5
+    radii = np.empty(0)
+    while np.sum(4.0 / 3.0 * np.pi * radii**3) < volume:
+        count = int(max(volume - np.sum(4.0 / 3.0 * np.pi * radii**3), 0) / mean_volume) + 16
+        radii = np.concatenate([radii, sample_radii(count, radius_um, radius_std_um, distribution, rng)])
+    volumes = np.cumsum(4.0 / 3.0 * np.pi * radii**3)
+    return radii[:np.searchsorted(volumes, volume) + 1] if volume > 0 else radii[:0]
+
+
+def random_sequential_addition(rve_dims=64, voxel_size_um=1.0, radius_um=5.0, radius_std_um=0.0,
+                               distribution='gauss', number_of_spheres=None, volume_fraction=None,
+                               phase=SPHERE_PHASE, periodic=True, packing=None, max_attempts=1000,
+                               batch_size=256, seed=None):
+    """Generate a packing of non-overlapping spheres by random sequential
+    addition (RSA).
+
+    The spheres are inserted one after another, largest first, at random
+    positions which do not overlap with the spheres inserted before.
+    Candidate positions are drawn in vectorized batches from the space which
+    is still free for the next sphere and checked against a cell list. The
+    free space is tracked on a grid of sub-cells, which are subdivided when
+    no candidate fits any more, so the generation also works close to
+    saturation. It stops when all spheres are inserted or when the largest
+    remaining sphere does not fit anywhere, i.e. when the packing is jammed
+    (about 38 % volume fraction for monodisperse spheres). To fill the RVE
+    up to the jamming limit, pass ``volume_fraction=1.0``.
+
+    Parameters
+    ----------
+    rve_dims : int or tuple of int, optional
+        Number of voxels of the RVE along x, y and z. The default is ``64``.
+    voxel_size_um : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    radius_um : float, optional
+        Mean radius of the spheres in µm. The default is ``5.0``.
+    radius_std_um : float, optional
+        Standard deviation of the radii in µm. The default is ``0.0``.
+    distribution : str, optional
+        Radius distribution, ``'gauss'`` or ``'log_normal'`` (see
+        :func:`~MPaut.packing.sample_radii`). The default is ``'gauss'``.
+    number_of_spheres : int, optional
+        Number of spheres to insert. The default is ``None``.
+    volume_fraction : float, optional
+        Insert spheres until their volume fraction reaches this value. Used
+        if ``number_of_spheres`` is not given. For non-periodic packings only
+        the volume inside of the RVE is counted, the spheres for the volume 
+        cut off at the faces are inserted after the others. 
+        The default is ``None``.
+    phase : int, optional
+        Phase number of the inserted spheres. The default is ``1`` (like
+        GeoVal's spheres).
+    periodic : bool, optional
+        Generate a periodic packing. The default is ``True``.
+    packing : MPaut.packing.SpherePacking, optional
+        Existing packing to which the spheres are added, e.g. to add spheres
+        of a second phase. Its box size, voxel size and periodicity are used.
+        The default is ``None``.
+    max_attempts : int, optional
+        Number of consecutive batches without inserted sphere after which the
+        packing is considered jammed, even if some free space is left.
+        The default is ``1000``.
+    batch_size : int, optional
+        Number of candidate positions checked at once. The default is ``256``.
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+
+    Returns
+    -------
+    packing : MPaut.packing.SpherePacking
+        The generated packing. It contains fewer spheres than requested if
+        the packing jammed.
+    """
+    rng = np.random.default_rng(seed)
+    if packing is None:
+        packing = SpherePacking(np.empty((0, 3)), [], _box_size(rve_dims, voxel_size_um),
+                                voxel_size=voxel_size_um, periodic=periodic)
+    box_size = packing.box_size
+    periodic = packing.periodic
+
+    if number_of_spheres is not None:
+        radii = sample_radii(number_of_spheres, radius_um, radius_std_um, distribution, rng)
+    elif volume_fraction is not None:
+        target = (volume_fraction - packing.volume_fraction) * np.prod(box_size)
+        radii = _radii_for_volume(target, radius_um, radius_std_um, distribution, rng)
+    else:
+        raise ValueError("Either the number of spheres or the volume fraction must be given.")
+    radii = np.sort(radii)[::-1]
+
+    n_old = len(packing)
+    n_total = n_old + len(radii)
+    centers = np.zeros((n_total, 3))
+    all_radii = np.zeros(n_total)
+    centers[:n_old] = packing.centers
+    all_radii[:n_old] = packing.radii
+    max_radius = max(radii.max() if len(radii) else 0.0, packing.radii.max() if n_old else 0.0)
+    cells = _CellList(box_size, 2.0 * max_radius if max_radius > 0 else 1.0, periodic, n_total)
+    cells.insert(np.arange(n_old), packing.centers, packing.radii)
+
+    free_space = _FreeSpace(box_size, periodic)
+    # the free space is built for a smaller radius than needed, so it contains
+    # all positions of the next spheres. It is reused until the radii drop
+    # below this ratio of the radius it was built for, spheres smaller than
+    # that radius are only placed in its (smaller) free space
+    shrink = 0.8
+    placed = n_old
+    next_radius = 0
+    failed_batches = 0
+    while next_radius < len(radii) and failed_batches < max_attempts:
+        if free_space.radius is None or radii[next_radius] < shrink * free_space.radius:
+            free_space.build(shrink * radii[next_radius], centers[:placed], all_radii[:placed])
+        if len(free_space) == 0:
+            if free_space.radius <= radii[next_radius]:
+                break
+            # only the space for the larger radius is used up
+            free_space.build(shrink * radii[next_radius], centers[:placed], all_radii[:placed])
+            continue
+        # only the spheres for which the free space is valid
+        batch = radii[next_radius:next_radius + batch_size]
+        batch = batch[batch >= shrink * free_space.radius]
+        candidates = free_space.sample(batch_size, rng)
+        gaps = cells.gaps(candidates)
+        d = candidates[:, None, :] - candidates[None, :, :]
+        if periodic:
+            d -= box_size * np.round(d / box_size)
+        d = np.sqrt(np.sum(d**2, axis=-1))
+
+        # like sequential RSA, every sphere takes the next candidate where it
+        # fits, so the spheres are inserted in the order of their radii
+        accepted = []
+        for candidate in np.flatnonzero(gaps >= batch[-1]):
+            radius = batch[len(accepted)]
+            if gaps[candidate] >= radius and np.all(d[candidate, accepted] >= radius + batch[:len(accepted)]):
+                accepted.append(candidate)
+                if len(accepted) == len(batch):
+                    break
+
+        if len(accepted) == 0:
+            failed_batches += 1
+            if free_space.radius < batch[0]:
+                # exclude the space which is only free for smaller spheres
+                free_space.build(batch[0], centers[:placed], all_radii[:placed])
+            else:
+                free_space.refine(cells)
+            continue
+        failed_batches = 0
+        new = np.arange(placed, placed + len(accepted))
+        centers[new] = candidates[accepted]
+        all_radii[new] = batch[:len(accepted)]
+        cells.insert(new, centers[new], all_radii[new])
+        free_space.exclude(centers[new], all_radii[new])
+        placed += len(accepted)
+        next_radius += len(accepted)
+
+    phases = np.concatenate([packing.phases, np.full(placed - n_old, phase)])
+    result = SpherePacking(centers[:placed], all_radii[:placed], box_size, phases,
+                           packing.voxel_size, periodic)
+    if (number_of_spheres is None and next_radius == len(radii) 
+            and result.volume_fraction < volume_fraction):
+        # the parts of the spheres outside of a non-periodic RVE do not 
+        # count, spheres are added for the missing volume
+        return random_sequential_addition(radius_um=radius_um, radius_std_um=radius_std_um,
+                                          distribution=distribution, volume_fraction=volume_fraction,
+                                          phase=phase, packing=result, max_attempts=max_attempts,
+                                          batch_size=batch_size, seed=rng)
+    return result
+
+
+class _EventDrivenPacking:
+    # event-driven molecular dynamics of hard spheres growing in a periodic
+    # box. The radii grow as growth * t; every sphere stores its position
+    # at its own time stamp and has exactly one scheduled event (collision
+    # or crossing into a neighboring cell) in the priority queue. Events are
+    # invalidated by collision counters, and spheres whose collision partner
+    # collided with another sphere are predicted again. The spheres are few
+    # per cell, so the single events are evaluated with little numpy
+    # overhead.
+
+    def __init__(self, centers, growth, box_size, max_diameter, speed, rng):
+        n = len(growth)
+        self.x = centers.copy()
+        self.v = rng.normal(0.0, speed, (n, 3))
+        self.v -= self.v.mean(axis=0)
+        self.t = np.zeros(n)
+        self.time = 0.0
+        self.growth = growth
+        self.speed = speed
+        self.box_size = box_size
+        self.counts = np.maximum(np.floor(box_size / max_diameter).astype(int), 1)
+        self.cell_size = box_size / self.counts
+        self.cell = np.floor(centers / self.cell_size).astype(int) % self.counts
+        self.flat_cell = np.ravel_multi_index(tuple(self.cell.T), self.counts)
+        self.members = [set() for _ in range(int(np.prod(self.counts)))]
+        for i, cell in enumerate(self.flat_cell):
+            self.members[cell].add(i)
+        cells = np.stack(np.unravel_index(np.arange(len(self.members)), self.counts), axis=-1)
+        cells = (cells[:, None, :] + _CellList.offsets) % self.counts
+        self.table = [[self.members[c] for c in np.unique(row)]
+                      for row in np.ravel_multi_index(tuple(np.moveaxis(cells, -1, 0)), self.counts)]
+        self.counter = np.zeros(n, dtype=np.int64)
+        self.partner = np.full(n, -1)
+        self.collisions = 0
+        self.restart()
+
+    def positions(self, spheres):
+        return self.x[spheres] + self.v[spheres] * (self.time - self.t[spheres])[..., None]
+
+    def synchronize(self):
+        self.x = self.positions(slice(None)) % self.box_size
+        self.t[:] = self.time
+
+    def restart(self):
+        # synchronize all spheres, rescale the velocities (the collisions
+        # of growing spheres add kinetic energy) and predict all events
+        self.synchronize()
+        self.v *= self.speed / np.sqrt(np.mean(self.v**2))
+        self.counter += 1
+        self.queue = []
+        for i in range(len(self.x)):
+            self.predict(i)
+
+    def predict(self, i):
+        xi = self.x[i] + self.v[i] * (self.time - self.t[i])
+        others = set().union(*self.table[self.flat_cell[i]])
+        others.discard(i)
+        event_time, partner = np.inf, -1
+        if others:
+            others = np.fromiter(others, dtype=np.int64, count=len(others))
+            dx = self.positions(others) - xi
+            dx -= self.box_size * np.rint(dx / self.box_size)
+            dv = self.v[others] - self.v[i]
+            b = self.growth[i] + self.growth[others]
+            a = b * self.time
+            # |dx + dv*tau| = a + b*tau
+            A = (dv * dv).sum(axis=1) - b * b
+            B = (dx * dv).sum(axis=1) - a * b
+            C = (dx * dx).sum(axis=1) - a * a
+            D = B * B - A * C
+            tau = np.where((D >= 0) & ((B < 0) | (A < 0)), C / (np.sqrt(np.abs(D)) - B), np.inf)
+            # touching spheres (round-off) which approach each other
+            tau = np.where(C > 0, tau, np.where(B < 0, 0.0, np.where(A < 0, -B / A, np.inf)))
+            k = tau.argmin()
+            event_time, partner = float(tau[k]), int(others[k])
+
+        # crossing into a neighboring cell
+        for axis, (x, v, cell, w, size) in enumerate(zip(xi.tolist(), self.v[i].tolist(), self.cell[i].tolist(),
+                                                          self.cell_size.tolist(), self.box_size.tolist())):
+            if v == 0 or w == size:
+                continue
+            # position relative to the center of the cell
+            rel = (x - (cell + 0.5) * w + size / 2.0) % size - size / 2.0
+            crossing = (np.copysign(w / 2.0, v) - rel) / v
+            if crossing < event_time:
+                event_time, partner = max(crossing, 0.0), -2 - axis
+
+        self.partner[i] = partner
+        heapq.heappush(self.queue, (self.time + event_time, i, partner, self.counter[i],
+                                    self.counter[partner] if partner >= 0 else 0))
+
+    def step(self):
+        # process the next valid event
+        while True:
+            time, i, j, counter_i, counter_j = heapq.heappop(self.queue)
+            if counter_i == self.counter[i] and (j < 0 or counter_j == self.counter[j]):
+                break
+        self.time = time
+
+        if j < 0:
+            axis = -2 - j
+            self.x[i] = self.positions(i)
+            self.t[i] = time
+            self.members[self.flat_cell[i]].discard(i)
+            self.cell[i, axis] = (self.cell[i, axis] + (1 if self.v[i, axis] > 0 else -1)) % self.counts[axis]
+            self.flat_cell[i] = np.ravel_multi_index(tuple(self.cell[i]), self.counts)
+            self.members[self.flat_cell[i]].add(i)
+            self.predict(i)
+            return
+
+        self.collisions += 1
+        pair = [i, j]
+        self.x[pair] = self.positions(pair)
+        self.t[pair] = time
+        n = self.x[j] - self.x[i]
+        n -= self.box_size * np.rint(n / self.box_size)
+        n /= np.sqrt(n.dot(n))
+        approach = (self.v[i] - self.v[j]).dot(n)
+        # elastic collision, the spheres separate faster than they grow
+        delta = (approach + max(approach, 0.0) + 2.0 * (self.growth[i] + self.growth[j])) / 2.0
+        self.v[i] -= delta * n
+        self.v[j] += delta * n
+        self.counter[pair] += 1
+        # every sphere must have exactly one scheduled event
+        for k in set(np.flatnonzero((self.partner == i) | (self.partner == j)).tolist()) | {i, j}:
+            self.predict(k)
+
+    def run(self, end_time, max_collisions=None):
+        # process the events until the end time, the maximum number of
+        # collisions or until the packing is jammed
+        events = 0
+        last_time = self.time
+        with np.errstate(divide='ignore', invalid='ignore'):
+            while self.next_time() < end_time:
+                self.step()
+                events += 1
+                if max_collisions is not None and self.collisions >= max_collisions:
+                    break
+                if events % (10 * len(self.x)) == 0:
+                    self.restart()
+                    # the radii hardly grow any more if the packing is jammed
+                    if self.time - last_time < 1e-4 * self.time:
+                        break
+                    last_time = self.time
+            else:
+                self.time = end_time
+        self.synchronize()
+
+    def next_time(self):
+        while self.queue:
+            time, i, j, counter_i, counter_j = self.queue[0]
+            if counter_i == self.counter[i] and (j < 0 or counter_j == self.counter[j]):
+                return time
+            heapq.heappop(self.queue)
+        return np.inf
+
+
+def lubachevsky_stillinger(rve_dims=64, voxel_size_um=1.0, radius_um=5.0, radius_std_um=0.0,
+                           distribution='gauss', number_of_spheres=None, volume_fraction=0.6,
+                           growth_rate=0.05, phase=SPHERE_PHASE, max_collisions=None, seed=None):
+    """Generate a dense periodic packing of spheres with the
+    Lubachevsky-Stillinger algorithm.
+
+    The spheres start as points at random positions with random velocities
+    and grow while they move, until they reach the target volume fraction.
+    The motion is simulated event by event (event-driven molecular
+    dynamics): the next collision of every sphere is predicted with a cell
+    list and the events are processed in the order of a priority queue.
+    Unlike :func:`~MPaut.packing.random_sequential_addition`, this reaches
+    volume fractions beyond 60 %. Monodisperse spheres jam between about
+    60 % and 64 % (random close packing, denser for slower growth), broad
+    radius distributions reach a few percent more. Higher volume fractions,
+    e.g. the 77 % or 80 % of dense WC-Co structures, cannot be reached with
+    spheres. If the packing jams before, the spheres keep their size ratios,
+    the final volume fraction is lower than requested and a
+    ``RuntimeWarning`` is issued.
+
+    Parameters
+    ----------
+    rve_dims : int or tuple of int, optional
+        Number of voxels of the RVE along x, y and z. The default is ``64``.
+    voxel_size_um : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    radius_um : float, optional
+        Mean radius of the spheres in µm. The default is ``5.0``.
+    radius_std_um : float, optional
+        Standard deviation of the radii in µm. The default is ``0.0``.
+    distribution : str, optional
+        Radius distribution, ``'gauss'`` or ``'log_normal'`` (see
+        :func:`~MPaut.packing.sample_radii`). The default is ``'gauss'``.
+    number_of_spheres : int, optional
+        Number of spheres. The default is ``None``, which uses as many spheres
+        as needed for the volume fraction with the given radii. Otherwise, the
+        radii are scaled to reach the volume fraction.
+    volume_fraction : float, optional
+        Target volume fraction of the spheres. The default is ``0.6``.
+    growth_rate : float, optional
+        Growth speed of the radii relative to the thermal speed of the
+        spheres. Smaller growth rates give denser and more ordered packings,
+        but need more collisions. The default is ``0.05``.
+    phase : int, optional
+        Phase number of the spheres. The default is ``1`` (like GeoVal's
+        spheres).
+    max_collisions : int, optional
+        Stop after this number of collisions. The default is ``None``
+        (no limit).
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+
+    Returns
+    -------
+    packing : MPaut.packing.SpherePacking
+        The generated periodic packing.
+    """
+    rng = np.random.default_rng(seed)
+    box_size = _box_size(rve_dims, voxel_size_um)
+    target = volume_fraction * np.prod(box_size)
+    if number_of_spheres is None:
+        radii = _radii_for_volume(target, radius_um, radius_std_um, distribution, rng)
+    else:
+        radii = sample_radii(number_of_spheres, radius_um, radius_std_um, distribution, rng)
+    radii *= (target / np.sum(4.0 / 3.0 * np.pi * radii**3))**(1.0 / 3.0)
+    if 4.0 * radii.max() > box_size.min():
+        raise ValueError("The RVE must be larger than twice the diameter of the largest sphere.")
+
+    # the radii grow as radii * t until t = 1
+    md = _EventDrivenPacking(rng.random((len(radii), 3)) * box_size, radii, box_size,
+                             2.0 * radii.max(), radii.mean() / growth_rate, rng)
+    md.run(1.0, max_collisions)
+    if md.time < 1.0:
+        if max_collisions is not None and md.collisions >= max_collisions:
+            reason = f"it was stopped after {max_collisions} collisions"
+        else:
+            reason = "the packing jammed"
+        warnings.warn(f"The volume fraction of the spheres {volume_fraction * md.time**3:.3f} is below "
+                      f"the target {volume_fraction} because {reason}.", RuntimeWarning)
+    return SpherePacking(md.x, radii * md.time, box_size, phase, voxel_size_um, periodic=True)
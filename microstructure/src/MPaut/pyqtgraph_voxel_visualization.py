@@ -5,8 +5,8 @@ Created on Tue Dec  1 10:58:43 2020
 @author: pirkelma
 """
 import numpy as np
-import re
 import functools
+from MPaut.voxels import VoxelGrid, load_voxels
 try:
     import pyqtgraph as pg
     from pyqtgraph.Qt import QtCore, QtGui
@@ -16,46 +16,19 @@ except ModuleNotFoundError:
     plotting_available = False
     print("error Qt libraries not found! 3D visualizations will not be available.")
 
-def _parse_line(line, rx_dict):
-    """
-    Do a regex search against all defined regexes and
-    return the key and match result of the first matching regex
-
-    """
-
-    for key, rx in rx_dict.items():
-        match = rx.search(line)
-        if match:
-            return key, match
-    # if there are no matches
-    return None, None
-
 def view_RVE(file, phases, screenshot_file=None):
     if plotting_available:
-        data = open(file).readlines()
-        file = "".join(data)
-        rx_dict = {
-            'dims': re.compile(r'^(?P<nx>\d+\s*)(?P<ny>\d+\s*)(?P<nz>\d+\s*)(?P<edge_length>\d*\.?\d+\s*)\n'),
-            }
-        key, match = _parse_line(data[0], rx_dict)
-        nx = int(match['nx'])
-        ny = int(match['ny'])
-        nz = int(match['nz'])
-        
-        x, y, z = np.indices((nx, ny, nz))
+        if isinstance(file, VoxelGrid):
+            grid = file
+        else:
+            grid = load_voxels(file)
         
+        phase_numbers = grid.phases
         
         #phases = dict(zip([1 + 6 * i for i in range(phases_count)], [np.empty(x.shape, dtype=np.bool)] * phases_count))
-        phase_voxels = {p: np.empty(x.shape, dtype=np.bool) for p in phases}
-        
-        for phase_id, phase_vals in phase_voxels.items():
-            ccl = 1
-            for ix in range(nx):
-                cl = ccl + nx * ix
-                for iy in range(ny):
-                    phase_vals[ix, iy] = list(map(lambda zz: int(zz) // (phase_id * 100000) >= 1, data[cl+iy].split())) 
-                ccl += 1
-                    #list(map(int, data[cl + iy].split()))
+        # every phase includes the voxels of all higher phases (codes of at
+        # least p * PHASE_FACTOR), later phases are drawn over earlier ones
+        phase_voxels = {p: phase_numbers >= p for p in phases}
         
         #val_rx = re.compile(r'(^(\d+\s*){{{nx}}}\n){{{ny}}}'.format(nx=nx, ny=ny))
         #val_rx = re.compile(r'^(\d+\s*){{{nx}}}\n'.format(nx=nx))
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+Statistical reconstruction of RVEs from two-point correlations.
+
+Following Yeong and Torquato, an RVE is reconstructed by simulated annealing:
+starting from random voxels with the target volume fractions, pairs of
+voxels of different phases are swapped and a swap is accepted with the
+Metropolis criterion for the energy
+
+.. math::
+
+    E = \\sum_{i} \\sum_{\\mathbf{e}} \\sum_{r=1}^{r_{max}}
+        \\left(S_i(r \\mathbf{e}) - \\hat{S}_i(r \\mathbf{e})\\right)^2,
+
+the squared difference of the two-point correlations of every phase along
+the x, y and z axes from the target correlations. A swap only changes the
+correlations along the lines through the two swapped voxels, so the change
+of energy is evaluated from the ``2 * r_max`` neighbours of both voxels along
+every axis instead of recomputing the correlations of the whole RVE::
+
+    measured = voxels.VoxelGrid.from_val_file('measured.val')
+    grid = reconstruction.reconstruct(measured, rve_dims=64, seed=1)
+    grid.to_val_file('reconstructed.val')
+
+The candidate swaps are evaluated in vectorized batches against the same
+state. Rejected swaps leave the state unchanged, and the swaps after an
+accepted one are only used while none of their voxels lies on the lines
+through the accepted swaps, so the batches give the same Markov chain as
+evaluating the swaps one after another.
+"""
+import logging
+import numpy as np
+from MPaut.voxels import VoxelGrid, as_voxel_grid
+
+
+def directional_correlations(voxels, phases=None, max_distance=None):
+    """Compute the two-point correlations along the x, y and z axes.
+
+    The RVE is treated as periodic.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phases : list of int, optional
+        Phases for which the correlations are computed. The default is
+        ``None``, which uses all phases of the RVE (including phase ``0``).
+    max_distance : int, optional
+        Largest distance in voxels. The default is ``None``, which uses half
+        of the smallest edge length of the RVE.
+
+    Returns
+    -------
+    correlations : dict
+        Array of shape ``(3, max_distance + 1)`` for every phase, containing
+        the probability that two voxels at distance ``r`` along the x, y or z
+        axis both belong to the phase. The values at ``r = 0`` are the volume
+        fractions.
+    """
+    labels = as_voxel_grid(voxels).phases
+    if phases is None:
+        phases = np.unique(labels)
+    if max_distance is None:
+        max_distance = min(labels.shape) // 2
+    if max_distance > min(labels.shape) // 2:
+        raise ValueError(f"The maximum distance must not exceed half of the RVE shape {labels.shape}.")
+    return _directional_correlations(labels, phases, max_distance)
+
+
+def _directional_correlations(labels, phases, max_distance):
+    res = {}
+    for phase in phases:
+        indicator = (labels == phase).astype(float)
+        correlation = np.empty((3, max_distance + 1))
+        for axis, n in enumerate(labels.shape):
+            transform = np.fft.rfft(indicator, axis=axis)
+            line = np.fft.irfft(transform.real**2 + transform.imag**2, n=n, axis=axis)
+            correlation[axis] = np.sum(np.moveaxis(line, axis, 0)[:max_distance + 1].reshape(max_distance + 1, -1),
+                                       axis=1) / labels.size
+        res[int(phase)] = correlation
+    return res
+
+
+class AnnealingReconstruction:
+    """Yeong-Torquato reconstruction of an RVE by simulated annealing.
+
+    Parameters
+    ----------
+    target : dict
+        Target two-point correlation for every phase, as array of shape
+        ``(3, max_distance + 1)`` (along x, y and z, see
+        :func:`~MPaut.reconstruction.directional_correlations`) or
+        ``(max_distance + 1,)`` (the same along all axes). The values at
+        ``r = 0`` are the volume fractions.
+    shape : tuple
+        Shape ``(dim_x, dim_y, dim_z)`` of the reconstructed RVE.
+    background : int, optional
+        Phase of the voxels not belonging to any of the target phases, if
+        the target volume fractions sum up to less than ``1``. Its
+        correlation is not part of the energy. The default is ``0``.
+    initial : MPaut.voxels.VoxelGrid or numpy.ndarray, optional
+        Initial RVE as voxel grid or array of GeoVal voxel codes (phase
+        labels are passed as :meth:`~MPaut.voxels.VoxelGrid.from_labels`).
+        The default is ``None``, which starts from
+        random voxels with the target volume fractions.
+    voxel_size : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+
+    Attributes
+    ----------
+    phases : list of int
+        Phases of the RVE.
+    max_distance : int
+        Largest distance of the correlations in voxels.
+    history : list of dict
+        Step, temperature, energy and acceptance rate after every temperature
+        stage of :func:`~MPaut.reconstruction.AnnealingReconstruction.anneal`.
+    """
+
+    def __init__(self, target, shape, background=0, initial=None, voxel_size=1.0, seed=None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.rng = np.random.default_rng(seed)
+        self.shape = tuple(int(n) for n in shape)
+        if len(self.shape) != 3:
+            raise ValueError(f"RVE shape must be 3-dimensional, got {shape}.")
+        self.voxel_size = float(voxel_size)
+
+        target = {int(p): np.asarray(t, dtype=float) for p, t in target.items()}
+        self.max_distance = max(t.shape[-1] for t in target.values()) - 1
+        if not 0 < self.max_distance <= min(self.shape) // 2:
+            raise ValueError(f"The target correlations must be given for distances between 1 and half "
+                             f"of the RVE shape {self.shape}.")
+        fractions = {p: float(np.mean(np.broadcast_to(t, (3, t.shape[-1]))[:, 0])) for p, t in target.items()}
+        self.phases = sorted(target)
+        if sum(fractions.values()) < 1.0 - 1e-6 and background not in target:
+            self.phases.append(int(background))
+            fractions[int(background)] = 1.0 - sum(fractions.values())
+        elif not np.isclose(sum(fractions.values()), 1.0, atol=1e-6):
+            raise ValueError(f"The volume fractions of the target phases must sum up to 1, got {fractions}.")
+
+        # correlations of all phases as arrays (phase, axis, distance)
+        self._target = np.zeros((len(self.phases), 3, self.max_distance + 1))
+        self._tracked = np.zeros(len(self.phases), dtype=bool)
+        for k, phase in enumerate(self.phases):
+            if phase in target:
+                t = target[phase]
+                if t.shape[-1] != self.max_distance + 1 or t.shape not in ((3, t.shape[-1]), (t.shape[-1],)):
+                    raise ValueError(f"Invalid shape {t.shape} of the target correlation of phase {phase}.")
+                self._target[k] = t
+                self._tracked[k] = True
+
+        if initial is None:
+            counts = np.round(np.array([fractions[p] for p in self.phases]) * np.prod(self.shape)).astype(int)
+            counts[-1] = np.prod(self.shape) - np.sum(counts[:-1])
+            state = np.repeat(np.arange(len(self.phases)), counts)
+            self.rng.shuffle(state)
+        else:
+            labels = as_voxel_grid(initial).phases
+            if labels.shape != self.shape:
+                raise ValueError(f"Expected initial labels with shape {self.shape}, got {labels.shape}.")
+            if not set(np.unique(labels)) <= set(self.phases):
+                raise ValueError(f"The initial labels contain phases other than {self.phases}.")
+            order = np.argsort(self.phases)
+            state = order[np.searchsorted(np.asarray(self.phases)[order], labels.ravel())]
+        self._state = state.astype(np.int8)
+
+        # offsets of the neighbours at distances 1 ... r_max in positive and
+        # negative direction, for every position along every axis
+        strides = [self.shape[1] * self.shape[2], self.shape[2], 1]
+        distances = np.r_[np.arange(1, self.max_distance + 1), -np.arange(1, self.max_distance + 1)]
+        self._offsets = [((((np.arange(n)[:, None] + distances) % n) - np.arange(n)[:, None]) * s).astype(np.int32)
+                         for n, s in zip(self.shape, strides)]
+        self._recount()
+        # voxels on the lines through the swaps accepted in the current batch
+        self._marks = np.zeros(self._state.size, dtype=np.int64)
+        self._stamp = 0
+        self.history = []
+
+    def _recount(self):
+        labels = self.labels
+        correlations = _directional_correlations(labels, self.phases, self.max_distance)
+        self._counts = np.round(np.array([correlations[p] for p in self.phases]) * self._state.size)
+        self._energy = self._compute_energy(self._counts)
+
+    def _compute_energy(self, counts):
+        difference = counts[self._tracked, :, 1:] / self._state.size - self._target[self._tracked, :, 1:]
+        return float(np.sum(difference**2))
+
+    @property
+    def labels(self):
+        """Phase number of every voxel of the current RVE."""
+        return np.asarray(self.phases)[self._state].reshape(self.shape)
+
+    def to_voxel_grid(self):
+        """Voxel grid of the current RVE.
+
+        Returns
+        -------
+        grid : MPaut.voxels.VoxelGrid
+            Voxel grid with object number ``0`` for all voxels, which can be
+            stored with :func:`~MPaut.voxels.VoxelGrid.to_val_file`.
+        """
+        return VoxelGrid.from_labels(self.labels, voxel_size=self.voxel_size)
+
+    @property
+    def energy(self):
+        """Squared difference of the current correlations from the target."""
+        return self._energy
+
+    @property
+    def correlations(self):
+        """Current two-point correlations along x, y and z of every phase."""
+        return {p: c / self._state.size for p, c in zip(self.phases, self._counts)}
+
+    def _neighbours(self, voxels):
+        # flat indices of the neighbours along all axes, shape (n, 3, 2 r_max)
+        coordinates = np.unravel_index(voxels, self.shape)
+        neighbours = np.empty((len(voxels), 3, 2 * self.max_distance), dtype=np.int32)
+        for axis, (offsets, c) in enumerate(zip(self._offsets, coordinates)):
+            np.take(offsets, c, axis=0, out=neighbours[:, axis, :])
+        neighbours += voxels[:, None, None].astype(np.int32)
+        return neighbours
+
+    def _propose(self, number):
+        # random swaps of two voxels, the neighbours of both voxels and the
+        # resulting changes of the correlation counts of both phases, swaps of
+        # voxels of the same phase get an infinite energy
+        first = self.rng.integers(0, self._state.size, number)
+        second = self.rng.integers(0, self._state.size, number)
+        p, q = self._state[first], self._state[second]
+
+        first_neighbours = self._neighbours(first)
+        r = self.max_distance
+        p3, q3 = p[:, None, None], q[:, None, None]
+        # first voxel changes from p to q, then the second one from q to p
+        values = self._state[first_neighbours]
+        first_p, first_q = values == p3, values == q3
+        second_neighbours = self._neighbours(second)
+        values = self._state[second_neighbours]
+        values[second_neighbours == first[:, None, None]] = -1
+        second_p, second_q = values == p3, values == q3
+        # the neighbours in positive and negative direction are summed
+        change_p = second_p.view(np.int8) - first_p.view(np.int8)
+        change_p = change_p[..., :r] + change_p[..., r:]
+        # the first voxel is of phase q when the second one changes
+        change_q = first_q.view(np.int8) - second_q.view(np.int8) - (second_neighbours == first[:, None, None])
+        change_q = change_q[..., :r] + change_q[..., r:]
+
+        n = self._state.size
+        difference = self._counts[:, :, 1:] / n - self._target[:, :, 1:]
+        energy = ((2.0 / n * np.einsum('kar,kar->k', difference[p], change_p)
+                   + np.einsum('kar,kar->k', change_p, change_p, dtype=float) / n**2) * self._tracked[p]
+                  + (2.0 / n * np.einsum('kar,kar->k', difference[q], change_q)
+                     + np.einsum('kar,kar->k', change_q, change_q, dtype=float) / n**2) * self._tracked[q])
+        energy[p == q] = np.inf
+        return first, second, p, q, change_p, change_q, energy, first_neighbours, second_neighbours
+
+    def _swap(self, proposal, k):
+        first, second, p, q, change_p, change_q = proposal[:6]
+        self._state[first[k]], self._state[second[k]] = q[k], p[k]
+        self._counts[p[k], :, 1:] += change_p[k]
+        self._counts[q[k], :, 1:] += change_q[k]
+
+    def _metropolis(self, proposal, temperature, window=64):
+        # accept swaps of a batch like one after another, returns the number
+        # of evaluated and accepted swaps. Swaps after an accepted one stay
+        # exact as long as none of their voxels lies on the lines through the
+        # accepted swaps within the maximum distance: their count changes are
+        # unchanged and the energy only changes by the product with the count
+        # changes of the accepted swaps. At most ``window`` swaps after the
+        # first accepted one are evaluated one by one.
+        first, second, p, q, change_p, change_q, energy, first_neighbours, second_neighbours = proposal
+        uniform = self.rng.random(len(energy))
+        with np.errstate(over='ignore'):
+            accept = (energy <= 0) | (uniform < np.exp(-np.maximum(energy, 0) / temperature))
+        hits = np.flatnonzero(accept)
+        if len(hits) == 0:
+            return len(energy), 0
+        candidates = np.arange(hits[0], min(hits[0] + window + 1, len(energy)))
+        m = len(candidates)
+        changes = np.zeros((m, len(self.phases), 3, self.max_distance))
+        changes[np.arange(m), p[candidates]] = change_p[candidates]
+        changes[np.arange(m), q[candidates]] = change_q[candidates]
+        changes = (changes * self._tracked[:, None, None]).reshape(m, -1) / self._state.size
+
+        self._stamp += 1
+        cross = np.zeros(m)
+        accepted = 0
+        for k, j in enumerate(candidates):
+            if self._marks[first[j]] == self._stamp or self._marks[second[j]] == self._stamp:
+                # this and the remaining swaps were evaluated for an
+                # outdated state
+                return j, accepted
+            change = energy[j] + cross[k]
+            if k == 0 or change <= 0 or uniform[j] < np.exp(-change / temperature):
+                self._swap(proposal, j)
+                self._energy += change
+                accepted += 1
+                cross += 2.0 * changes @ changes[k]
+                for voxels in (first[j], second[j], first_neighbours[j], second_neighbours[j]):
+                    self._marks[voxels] = self._stamp
+        return candidates[-1] + 1, accepted
+
+    def _initial_temperature(self, acceptance=0.1, samples=1024):
+        # uphill swaps are accepted with the given probability on average
+        energy = self._propose(samples)[6]
+        uphill = energy[(energy > 0) & np.isfinite(energy)]
+        return float(np.mean(uphill) / -np.log(acceptance)) if len(uphill) else 1e-12
+
+    def anneal(self, temperature=None, cooling=0.9, steps_per_temperature=None, max_steps=None,
+               tolerance=1e-8, patience=5, max_batch=1024):
+        """Reconstruct the RVE by simulated annealing.
+
+        The temperature is lowered by the factor ``cooling`` after every
+        ``steps_per_temperature`` swap attempts. The annealing stops when the
+        energy drops below ``tolerance``, after ``max_steps`` swap attempts
+        or when the energy decreased by less than 1 % during ``patience``
+        consecutive temperature stages.
+
+        Parameters
+        ----------
+        temperature : float, optional
+            Initial temperature. The default is ``None``, which chooses the
+            temperature such that about 10 % of the swaps increasing the
+            energy are accepted initially.
+        cooling : float, optional
+            Factor of the exponential cooling schedule. The default is ``0.9``.
+        steps_per_temperature : int, optional
+            Number of swap attempts per temperature. The default is ``None``,
+            which uses the number of voxels.
+        max_steps : int, optional
+            Maximum number of swap attempts. The default is ``None``
+            (unlimited).
+        tolerance : float, optional
+            Energy at which the reconstruction is considered converged.
+            The default is ``1e-8``.
+        patience : int, optional
+            Number of temperature stages without progress after which the
+            annealing stops. The default is ``5``.
+        max_batch : int, optional
+            Maximum number of swaps evaluated at once. The default is ``1024``.
+
+        Returns
+        -------
+        energy : float
+            Final energy.
+        """
+        if not 0 < cooling < 1:
+            raise ValueError("The cooling factor must lie between 0 and 1.")
+        if temperature is None:
+            temperature = self._initial_temperature()
+        if steps_per_temperature is None:
+            steps_per_temperature = self._state.size
+        step = self.history[-1]['step'] if self.history else 0
+        stalled = 0
+        acceptance = 0.5
+        while self._energy > tolerance and (max_steps is None or step < max_steps) and stalled < patience:
+            start_energy = self._energy
+            attempts = accepted = 0
+            stage = steps_per_temperature if max_steps is None else min(steps_per_temperature, max_steps - step)
+            while attempts < stage and self._energy > tolerance:
+                # about two expected acceptances before the end of the batch
+                batch = int(min(max_batch, stage - attempts, max(64, 2.0 / max(acceptance, 1e-6))))
+                evaluated, hits = self._metropolis(self._propose(batch), temperature)
+                attempts += int(evaluated)
+                accepted += hits
+                if hits:
+                    self._energy = self._compute_energy(self._counts)
+            step += attempts
+            acceptance = accepted / max(attempts, 1)
+            self.history.append({'step': step, 'temperature': float(temperature), 'energy': self._energy,
+                                 'acceptance': acceptance})
+            self.logger.info(f"step {step}: temperature {temperature:.3e}, energy {self._energy:.3e}, "
+                             f"acceptance {acceptance:.4f}")
+            stalled = stalled + 1 if self._energy > 0.99 * start_energy else 0
+            temperature *= cooling
+        return self._energy
+
+
+def reconstruct(target, rve_dims=64, voxel_size_um=1.0, phases=None, max_distance=None, background=0,
+                seed=None, **options):
+    """Reconstruct an RVE with the two-point correlations of a measured one.
+
+    Parameters
+    ----------
+    target : MPaut.voxels.VoxelGrid or numpy.ndarray or dict
+        Measured voxel grid or array of GeoVal voxel codes, or target
+        correlations for every phase (see
+        :class:`~MPaut.reconstruction.AnnealingReconstruction`).
+    rve_dims : int or tuple of int, optional
+        Number of voxels of the reconstructed RVE along x, y and z.
+        The default is ``64``.
+    voxel_size_um : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    phases : list of int, optional
+        Phases whose correlations are matched, if a measured RVE is given.
+        The default is ``None``, which uses all phases except
+        ``background``.
+    max_distance : int, optional
+        Largest distance of the correlations in voxels, if a measured RVE is
+        given. The default is ``None``, which uses half of the smallest edge
+        length of both RVEs.
+    background : int, optional
+        Phase of the remaining voxels. The default is ``0``.
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+    **options
+        Options of :func:`~MPaut.reconstruction.AnnealingReconstruction.anneal`.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        The reconstructed RVE.
+    """
+    dims = tuple(int(d) for d in np.broadcast_to(np.asarray(rve_dims, dtype=int), (3,)))
+    if not isinstance(target, dict):
+        grid = as_voxel_grid(target)
+        if phases is None:
+            phases = [p for p in np.unique(grid.phases) if p != background]
+        if max_distance is None:
+            max_distance = min(min(dims), min(grid.dims)) // 2
+        target = directional_correlations(grid, phases, max_distance)
+    reconstruction = AnnealingReconstruction(target, dims, background, voxel_size=voxel_size_um, seed=seed)
+    reconstruction.anneal(**options)
+    return reconstruction.to_voxel_grid()
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Archive format for storing large numbers of RVEs in a single file.
+
+The archive is a zip file in which the voxel codes of every RVE are split into
+chunks that are compressed individually. This allows loading a single RVE or
+a sub-block of an RVE without decompressing the rest of the archive. Only
+numpy and the python standard library are needed to read and write archives.
+
+Layout of the archive::
+
+    <rve_name>/header.txt              dims, voxel size, chunk shape, dtype
+    <rve_name>/metadata.txt            seed, generation parameters, results, ...
+    <rve_name>/chunks/<i>_<j>_<k>.npy  compressed chunk of voxel codes
+
+Header and metadata are stored as python literals (like the ``info.txt``
+files of the RVE generation examples), so dictionaries with integer or tuple
+keys (e.g. from :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.get_chord_length_analysis`)
+are preserved.
+"""
+import io
+import ast
+import zipfile
+import itertools
+import numpy as np
+from pathlib import Path
+from pprint import pformat
+from MPaut.voxels import VoxelGrid, load_voxels
+
+ARCHIVE_VERSION = 1
+
+
+class RVEArchive:
+    """Collection of RVEs stored as chunked, compressed voxel arrays.
+
+    Archives can be written incrementally, e.g. from a running parameter
+    study, by opening them in append mode for every new RVE::
+
+        with RVEArchive('campaign.rvez', mode='a') as archive:
+            archive.add(f'rve_{j}', geo_comm.get_voxels(), metadata=rve_info)
+
+    and read with random access to single RVEs or sub-blocks::
+
+        with RVEArchive('campaign.rvez') as archive:
+            grid = archive.load('rve_3')
+            block = archive.load_block('rve_3', (slice(0, 16), slice(0, 16), slice(0, 16)))
+    """
+
+    def __init__(self, file, mode='r', compresslevel=6):
+        """Open an RVE archive.
+
+        Parameters
+        ----------
+        file : str or pathlib.Path
+            Path of the archive file.
+        mode : str, optional
+            ``'r'`` to read an existing archive, ``'w'`` to create a new
+            archive (an existing file is overwritten) or ``'a'`` to append to
+            an existing archive (the archive is created if it does not exist).
+            The default is ``'r'``.
+        compresslevel : int, optional
+            Compression level (``0`` - ``9``) used for new chunks.
+            The default is ``6``.
+
+        """
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"Invalid mode '{mode}' for RVE archive. Possible modes are 'r', 'w' and 'a'.")
+        self.file = Path(file)
+        self.mode = mode
+        if mode != 'r' and not self.file.parent.exists():
+            self.file.parent.mkdir(parents=True)
+        self._zip = zipfile.ZipFile(self.file, mode, compression=zipfile.ZIP_DEFLATED,
+                                    compresslevel=compresslevel)
+
+        # read headers of all RVEs already contained in the archive
+        self._headers = {}
+        for member in self._zip.namelist():
+            if member.endswith('/header.txt'):
+                name = member[:-len('/header.txt')]
+                self._headers[name] = self._read_literal(member)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the archive.
+
+        This writes the index of the archive, so it must be called after
+        adding RVEs.
+        """
+        self._zip.close()
+
+    def __len__(self):
+        return len(self._headers)
+
+    def __contains__(self, name):
+        return name in self._headers
+
+    def __iter__(self):
+        return iter(self._headers)
+
+    def names(self):
+        """Names of all RVEs in the archive."""
+        return list(self._headers)
+
+    def header(self, name):
+        """Get the header (dimensions, voxel size, chunk shape, dtype) of an RVE.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE.
+
+        Returns
+        -------
+        header : dict
+            Header of the RVE.
+        """
+        self._check_name(name)
+        return dict(self._headers[name])
+
+    def metadata(self, name):
+        """Get the metadata stored for an RVE.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE.
+
+        Returns
+        -------
+        metadata : dict
+            Metadata of the RVE (e.g. seed, generation parameters and analysis
+            results).
+        """
+        self._check_name(name)
+        return self._read_literal(f'{name}/metadata.txt')
+
+    def add(self, name, grid, metadata=None, chunk_shape=(32, 32, 32)):
+        """Add an RVE to the archive.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE. Must be unique within the archive.
+        grid : MPaut.voxels.VoxelGrid
+            Voxel data of the RVE.
+        metadata : dict, optional
+            Additional information about the RVE such as seed, generation
+            parameters or analysis results. Must only contain python literals
+            (numbers, strings, tuples, lists, dicts, ...), numpy scalars and
+            arrays are converted to python numbers and lists.
+            The default is ``None``.
+        chunk_shape : tuple, optional
+            Shape of the individually compressed chunks. Smaller chunks allow
+            more fine grained random access, larger chunks compress better.
+            The default is ``(32, 32, 32)``.
+
+        """
+        if self.mode == 'r':
+            raise ValueError("Cannot add RVEs to an archive opened in read mode.")
+        if not name or '/' in name:
+            raise ValueError(f"Invalid RVE name '{name}'. Names must not be empty or contain '/'.")
+        if name in self._headers:
+            raise ValueError(f"An RVE with name '{name}' already exists in the archive.")
+        if len(chunk_shape) != 3 or min(chunk_shape) < 1:
+            raise ValueError(f"Invalid chunk shape {chunk_shape}.")
+
+        # the metadata is checked before anything is written, so it can be 
+        # read back from the archive
+        metadata_text = pformat(_to_literal(metadata if metadata is not None else {}))
+        try:
+            ast.literal_eval(metadata_text)
+        except (ValueError, SyntaxError) as error:
+            raise ValueError(f"The metadata of RVE '{name}' must only contain python literals.") from error
+
+        voxels = np.asarray(grid.voxels)
+        header = {'version': ARCHIVE_VERSION,
+                  'dims': tuple(int(d) for d in voxels.shape),
+                  'voxel_size': float(grid.voxel_size),
+                  'chunk_shape': tuple(int(c) for c in chunk_shape),
+                  'dtype': voxels.dtype.str}
+
+        for index in itertools.product(*(range(n) for n in _chunk_counts(header))):
+            chunk = voxels[_chunk_slices(header, index)]
+            buffer = io.BytesIO()
+            np.save(buffer, np.ascontiguousarray(chunk))
+            self._zip.writestr(_chunk_member(name, index), buffer.getvalue())
+
+        self._zip.writestr(f'{name}/metadata.txt', metadata_text)
+        # the header is written last, so RVEs are only listed once complete
+        self._zip.writestr(f'{name}/header.txt', pformat(header))
+        self._headers[name] = header
+
+    def add_val_file(self, name, file, metadata=None, chunk_shape=(32, 32, 32)):
+        """Add an RVE from a GeoVal voxel file (.val) to the archive.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE. Must be unique within the archive.
+        file : str or pathlib.Path
+            Path of the voxel file.
+        metadata : dict, optional
+            Additional information about the RVE. The default is ``None``.
+        chunk_shape : tuple, optional
+            Shape of the individually compressed chunks.
+            The default is ``(32, 32, 32)``.
+
+        """
+        grid = load_voxels(file, cache=False)
+        self.add(name, grid, metadata, chunk_shape)
+
+    def add_rve_folder(self, folder, name=None, voxel_file='voxels.val',
+                       info_file='info.txt', chunk_shape=(32, 32, 32)):
+        """Add an RVE folder as written by the RVE generation examples.
+
+        The folder must contain the voxel file and can optionally contain an
+        info file with a python literal (written with ``pformat``) which is
+        stored as metadata.
+
+        Parameters
+        ----------
+        folder : str or pathlib.Path
+            Folder containing the RVE.
+        name : str, optional
+            Name of the RVE. The default is ``None``, which uses the folder
+            name.
+        voxel_file : str, optional
+            Name of the voxel file in the folder. The default is ``'voxels.val'``.
+        info_file : str, optional
+            Name of the info file in the folder. The default is ``'info.txt'``.
+        chunk_shape : tuple, optional
+            Shape of the individually compressed chunks.
+            The default is ``(32, 32, 32)``.
+
+        """
+        folder = Path(folder)
+        if name is None:
+            name = folder.name
+        info_path = folder / info_file
+        metadata = ast.literal_eval(info_path.read_text()) if info_path.exists() else None
+        self.add_val_file(name, folder / voxel_file, metadata, chunk_shape)
+
+    def load(self, name):
+        """Load the complete voxel data of an RVE.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE.
+
+        Returns
+        -------
+        grid : MPaut.voxels.VoxelGrid
+            Voxel data of the RVE.
+        """
+        self._check_name(name)
+        header = self._headers[name]
+        return VoxelGrid(self.load_block(name), header['voxel_size'])
+
+    def load_block(self, name, index=None):
+        """Load a sub-block of an RVE.
+
+        Only the chunks intersecting the sub-block are decompressed.
+
+        Parameters
+        ----------
+        name : str
+            Name of the RVE.
+        index : tuple of slice, optional
+            Slices along x, y and z defining the sub-block, e.g.
+            ``(slice(0, 16), slice(8, 24), slice(None))``. Steps are not
+            supported. The default is ``None``, which loads the complete RVE.
+
+        Returns
+        -------
+        block : numpy.ndarray
+            Voxel codes of the sub-block.
+        """
+        self._check_name(name)
+        header = self._headers[name]
+        dims = header['dims']
+        chunk_shape = header['chunk_shape']
+        if index is None:
+            index = (slice(None),) * 3
+        if len(index) != 3:
+            raise ValueError("Sub-block index must contain a slice for each of the three axes.")
+
+        bounds = []
+        for s, n in zip(index, dims):
+            start, stop, step = s.indices(n)
+            if step != 1:
+                raise ValueError("Steps are not supported for loading sub-blocks.")
+            bounds.append((start, max(start, stop)))
+
+        block = np.empty([stop - start for start, stop in bounds], dtype=np.dtype(header['dtype']))
+        if block.size == 0:
+            return block
+
+        chunk_ranges = [range(start // c, (stop - 1) // c + 1)
+                        for (start, stop), c in zip(bounds, chunk_shape)]
+        for chunk_index in itertools.product(*chunk_ranges):
+            chunk = np.load(io.BytesIO(self._zip.read(_chunk_member(name, chunk_index))))
+            src = []
+            dst = []
+            for i, (start, stop), c in zip(chunk_index, bounds, chunk_shape):
+                lo = max(start, i * c)
+                hi = min(stop, (i + 1) * c)
+                src.append(slice(lo - i * c, hi - i * c))
+                dst.append(slice(lo - start, hi - start))
+            block[tuple(dst)] = chunk[tuple(src)]
+        return block
+
+    def _check_name(self, name):
+        if name not in self._headers:
+            raise KeyError(f"There is no RVE with name '{name}' in the archive {self.file}.")
+
+    def _read_literal(self, member):
+        return ast.literal_eval(self._zip.read(member).decode())
+
+
+def _chunk_counts(header):
+    return [-(-n // c) for n, c in zip(header['dims'], header['chunk_shape'])]
+
+
+def _chunk_slices(header, index):
+    return tuple(slice(i * c, (i + 1) * c) for i, c in zip(index, header['chunk_shape']))
+
+
+def _chunk_member(name, index):
+    return f'{name}/chunks/{index[0]}_{index[1]}_{index[2]}.npy'
+
+
+def _to_literal(value):
+    # numpy scalars and arrays (e.g. seeds or analysis results) as python
+    # numbers and lists, which are written as python literals
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {_to_literal(k): _to_literal(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return type(value)(_to_literal(v) for v in value)
+    return value
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Native Voronoi and power (Laguerre) tessellations.
+
+Every voxel is assigned to the seed with the smallest power distance
+``|x - s|^2 - w`` (the Euclidean distance for zero weights), which creates
+grains like GeoVal's ``voronoi_polyeder`` objects without the GeoVal
+executable::
+
+    grid = tessellation.voronoi_tessellation(rve_dims=64, number_of_grains=200,
+                                             phase_fractions={4: 0.16, 10: 0.84},
+                                             seed=1)
+    grid.to_val_file('voxels.val')
+
+With the centers of a :class:`~MPaut.packing.SpherePacking` as seeds and the
+squared radii as weights, the power tessellation corresponds to GeoVal's
+transformation of distributed spheres into voronoi polyeders.
+
+The seeds are sorted into bins of about one seed each and the voxels are
+processed bin by bin against the seeds of the 27 surrounding bins, so the
+work grows linearly with the number of voxels. The bins are evaluated in
+chunks of bounded memory. Lengths are given in µm.
+"""
+import numpy as np
+from MPaut.voxels import VoxelGrid, PHASE_FACTOR
+
+# GeoVal assigns voronoi polyeders to phase 4 (the type id of the object type)
+VORONOI_PHASE = 4
+
+
+def _bin_starts(n, bins):
+    # first voxel of every bin along an axis (and the end), bins have a
+    # width of n // bins or n // bins + 1 voxels
+    return (np.arange(bins + 1) * n) // bins
+
+
+def _ring_candidates(table, bins, bin_index, ring, box_size, periodic):
+    # seeds in the bins up to ``ring`` bins around the given bins and the
+    # shifts of their periodic images, empty slots (-1) at the end of every
+    # row
+    steps = np.arange(-ring, ring + 1)
+    offsets = np.array(np.meshgrid(steps, steps, steps, indexing='ij')).reshape(3, -1).T
+    neighbors = bin_index[:, None, :] + offsets
+    shifts = np.floor_divide(neighbors, bins) * box_size
+    if periodic:
+        # small grids contain some bins several times, as different images,
+        # images beyond the neighboring RVEs are not needed
+        outside = np.any(np.abs(np.floor_divide(neighbors, bins)) > 1, axis=-1)
+    else:
+        outside = np.any((neighbors < 0) | (neighbors >= bins), axis=-1)
+    neighbors = np.ravel_multi_index(tuple(np.moveaxis(neighbors % bins, -1, 0)), bins)
+    capacity = table.shape[1]
+    candidates = table[neighbors].reshape(len(bin_index), -1)
+    candidates[np.repeat(outside, capacity, axis=1)] = -1
+    shifts = np.repeat(shifts, capacity, axis=1)
+    compact = np.argsort(candidates < 0, axis=1, kind='stable')
+    candidates = np.take_along_axis(candidates, compact, axis=1)
+    shifts = np.take_along_axis(shifts, compact[..., None], axis=1)
+    count = max(int(np.count_nonzero(candidates >= 0, axis=1).max(initial=1)), 1)
+    return candidates[:, :count], shifts[:, :count]
+
+
+def nearest_seeds(seeds, dims, voxel_size=1.0, weights=None, periodic=True, chunk_size=2**22):
+    """Assign every voxel to the seed with the smallest power distance.
+
+    Parameters
+    ----------
+    seeds : array_like
+        Positions of the seeds in µm, shape ``(n, 3)``. Seeds outside of the
+        RVE are wrapped into it if ``periodic`` is set and clipped otherwise.
+    dims : tuple of int
+        Number of voxels along x, y and z.
+    voxel_size : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    weights : array_like, optional
+        Weights of the seeds in µm^2 (e.g. the squared radii of spheres).
+        The default is ``None``, which gives a Voronoi tessellation.
+    periodic : bool, optional
+        Whether the seeds act across opposite faces of the RVE.
+        The default is ``True``.
+    chunk_size : int, optional
+        Maximum number of voxel-seed distances evaluated at once.
+        The default is ``2**22``.
+
+    Returns
+    -------
+    labels : numpy.ndarray
+        Index of the nearest seed for every voxel, shape ``dims``.
+    """
+    dims = tuple(int(d) for d in dims)
+    seeds = np.asarray(seeds, dtype=float).reshape(-1, 3)
+    weights = np.zeros(len(seeds)) if weights is None else np.asarray(weights, dtype=float).reshape(-1)
+    if len(seeds) == 0 or len(weights) != len(seeds):
+        raise ValueError("At least one seed and one weight per seed are needed.")
+    box_size = np.array(dims) * voxel_size
+    if periodic:
+        seeds = seeds % box_size
+    else:
+        seeds = np.clip(seeds, 0.0, np.nextafter(box_size, 0.0))
+
+    # bins of about one seed each
+    width = (np.prod(dims) / len(seeds))**(1.0 / 3.0)
+    bins = np.array([max(int(d / width), 1) for d in dims])
+    starts = [_bin_starts(d, b) for d, b in zip(dims, bins)]
+    seed_bins = np.stack([np.searchsorted(s, np.floor(seeds[:, axis] / voxel_size), side='right') - 1
+                          for axis, s in enumerate(starts)], axis=-1)
+    flat = np.ravel_multi_index(tuple(seed_bins.T), bins)
+    order = np.argsort(flat, kind='stable')
+    counts = np.bincount(flat, minlength=np.prod(bins))
+    capacity = counts.max()
+    table = np.full((np.prod(bins), capacity), -1, dtype=np.int64)
+    table[flat[order], np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)] = order
+
+    # candidate seeds in the 27 bins around every bin, processed in chunks
+    # of bins with similar numbers of candidates
+    bin_index = np.stack(np.unravel_index(np.arange(np.prod(bins)), bins), axis=-1)
+    candidates, shifts = _ring_candidates(table, bins, bin_index, 1, box_size, periodic)
+    number = np.count_nonzero(candidates >= 0, axis=1)
+    bin_order = np.argsort(number, kind='stable')
+    # the power distance minus |x|^2 is linear in the voxel position x,
+    # -2 x.s + |s|^2 - w, so it is evaluated as a matrix product. Empty
+    # slots lie infinitely far away
+    positions = seeds[candidates] + shifts
+    linear = np.concatenate([-2.0 * positions, np.sum(positions**2, axis=-1, keepdims=True)
+                             - weights[candidates][..., None]], axis=-1)
+    linear[candidates < 0] = [0.0, 0.0, 0.0, np.inf]
+    linear = np.swapaxes(linear, 1, 2)
+
+    # voxel centers of every bin (padded to the largest bin) and a one
+    block = [int(np.max(np.diff(s))) for s in starts]
+    voxel = np.stack(np.meshgrid(*[np.arange(b) for b in block], indexing='ij'), axis=-1).reshape(-1, 3)
+    voxel = np.concatenate([(voxel + 0.5) * voxel_size, np.ones((len(voxel), 1))], axis=-1)
+    origins = np.stack([s[bin_index[:, axis]] for axis, s in enumerate(starts)], axis=-1) * voxel_size
+
+    labels = np.empty(dims, dtype=np.int64)
+    best = np.empty(dims)
+    first = 0
+    while first < len(bin_order):
+        # as many bins as fit into the chunk size
+        count = max(int(number[bin_order[first]]), 1)
+        step = max(int(chunk_size // (len(voxel) * count)), 1)
+        count = max(int(number[bin_order[min(first + step, len(bin_order)) - 1]]), 1)
+        step = max(int(chunk_size // (len(voxel) * count)), 1)
+        chunk = bin_order[first:first + step]
+        first += step
+
+        points = voxel + np.concatenate([origins[chunk], np.zeros((len(chunk), 1))], axis=-1)[:, None, :]
+        power = np.matmul(points, linear[chunk, :, :count])
+        nearest = np.argmin(power, axis=-1)
+        seed = np.take_along_axis(candidates[chunk, :count], nearest, axis=-1)
+        distance = (np.take_along_axis(power, nearest[..., None], axis=-1)[..., 0]
+                    + np.einsum('ijk,ijk->ij', points[..., :3], points[..., :3]))
+        seed = seed.reshape(-1, *block)
+        distance = distance.reshape(-1, *block)
+        for k, index in enumerate(chunk):
+            region = tuple(slice(s[i], s[i + 1]) for s, i in zip(starts, bin_index[index]))
+            size = tuple(r.stop - r.start for r in region)
+            labels[region] = seed[k, :size[0], :size[1], :size[2]]
+            best[region] = distance[k, :size[0], :size[1], :size[2]]
+
+    # seeds outside of the 27 bins around a voxel are at least one bin width
+    # farther away than the faces of its bin, so only the few voxels with a
+    # larger distance to their nearest seed are checked again, first against
+    # the seeds in the 125 bins around them (two bin widths) and finally
+    # against all seeds
+    width = min(d // b for d, b in zip(dims, bins)) * voxel_size
+    # plus the distance of the voxel to the faces of its own bin
+    faces = []
+    for d, s in zip(dims, starts):
+        index = np.arange(d)
+        bin_of = np.searchsorted(s, index, side='right') - 1
+        faces.append(np.minimum(index - s[bin_of], s[bin_of + 1] - 1 - index) * voxel_size)
+    margin = np.minimum(np.minimum(faces[0][:, None, None], faces[1][None, :, None]), faces[2][None, None, :])
+    uncertain = np.flatnonzero(~(best <= (width + margin)**2 - weights.max()).ravel())
+    if len(uncertain):
+        index = np.stack(np.unravel_index(uncertain, dims), axis=-1)
+        points = (index + 0.5) * voxel_size
+        index = np.stack([np.searchsorted(s, index[:, axis], side='right') - 1
+                          for axis, s in enumerate(starts)], axis=-1)
+        index, inverse = np.unique(index, axis=0, return_inverse=True)
+        candidates, shifts = _ring_candidates(table, bins, index, 2, box_size, periodic)
+        inverse = inverse.reshape(-1)
+        step = max(int(chunk_size // candidates.shape[1]), 1)
+        distance = np.empty(len(uncertain))
+        for first in range(0, len(points), step):
+            chunk = slice(first, first + step)
+            near = candidates[inverse[chunk]]
+            d = points[chunk, None, :] - seeds[near] - shifts[inverse[chunk]]
+            power = np.where(near >= 0, np.sum(d**2, axis=-1) - weights[near], np.inf)
+            nearest = np.argmin(power, axis=-1)
+            labels.ravel()[uncertain[chunk]] = np.take_along_axis(near, nearest[:, None], axis=1)[:, 0]
+            distance[chunk] = np.take_along_axis(power, nearest[:, None], axis=1)[:, 0]
+        uncertain = uncertain[~(distance <= (2 * width + margin.ravel()[uncertain])**2 - weights.max())]
+    if len(uncertain):
+        points = (np.stack(np.unravel_index(uncertain, dims), axis=-1) + 0.5) * voxel_size
+        step = max(int(chunk_size // len(seeds)), 1)
+        for first in range(0, len(points), step):
+            d = points[first:first + step, None, :] - seeds
+            if periodic:
+                d -= box_size * np.round(d / box_size)
+            labels.ravel()[uncertain[first:first + step]] = np.argmin(np.sum(d**2, axis=-1) - weights, axis=-1)
+    return labels
+
+
+def assign_phases(volumes, phase_fractions, rng=None):
+    """Assign grains to phases according to target volume fractions.
+
+    The grains are visited in random order and assigned to the phases in turn
+    until the volume of each phase reaches its fraction, so the volume
+    fractions deviate by at most about one grain volume.
+
+    Parameters
+    ----------
+    volumes : array_like
+        Volume of every grain.
+    phase_fractions : dict
+        Target volume fraction of every phase, e.g. ``{4: 0.16, 10: 0.84}``.
+        The fractions are normalized to a sum of one.
+    rng : numpy.random.Generator, optional
+        Random number generator. The default is ``None``, which creates a
+        new generator.
+
+    Returns
+    -------
+    phases : numpy.ndarray
+        Phase number of every grain.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    volumes = np.asarray(volumes, dtype=float)
+    phases = np.array(list(phase_fractions.keys()), dtype=int)
+    fractions = np.array(list(phase_fractions.values()), dtype=float)
+    if len(phases) == 0 or np.any(fractions < 0) or fractions.sum() <= 0:
+        raise ValueError("The phase fractions must not be negative and must not all be zero.")
+
+    order = rng.permutation(len(volumes))
+    # the phase of a grain is given by the center of its volume interval
+    centers = (np.cumsum(volumes[order]) - volumes[order] / 2.0) / max(volumes.sum(), 1e-300)
+    result = np.empty(len(volumes), dtype=int)
+    result[order] = phases[np.minimum(np.searchsorted(np.cumsum(fractions) / fractions.sum(), centers),
+                                      len(phases) - 1)]
+    return result
+
+
+def voronoi_tessellation(rve_dims=64, voxel_size_um=1.0, number_of_grains=100, seeds=None,
+                         weights=None, phase_fractions=None, periodic=True, seed=None,
+                         chunk_size=2**22):
+    """Generate an RVE of Voronoi or power (Laguerre) grains.
+
+    Parameters
+    ----------
+    rve_dims : int or tuple of int, optional
+        Number of voxels of the RVE along x, y and z. The default is ``64``.
+    voxel_size_um : float, optional
+        Edge length of the voxels in µm. The default is ``1.0``.
+    number_of_grains : int, optional
+        Number of uniformly random seeds. Only used if no seeds are given.
+        The default is ``100``.
+    seeds : array_like, optional
+        Positions of the seeds in µm, shape ``(n, 3)``, e.g. the centers of
+        a :class:`~MPaut.packing.SpherePacking`. The default is ``None``.
+    weights : array_like, optional
+        Weights of the seeds in µm^2 for a power tessellation, e.g. the
+        squared radii of a sphere packing. The default is ``None``
+        (Voronoi tessellation).
+    phase_fractions : dict, optional
+        Target volume fraction of every phase (see
+        :func:`~MPaut.tessellation.assign_phases`). The default is ``None``,
+        which assigns all grains to phase ``4`` like GeoVal's voronoi
+        polyeders.
+    periodic : bool, optional
+        Generate a periodic tessellation. The default is ``True``.
+    seed : int, optional
+        Seed for the random number generator. The default is ``None``.
+    chunk_size : int, optional
+        Maximum number of voxel-seed distances evaluated at once.
+        The default is ``2**22``.
+
+    Returns
+    -------
+    grid : MPaut.voxels.VoxelGrid
+        Voxel grid with GeoVal voxel codes; the grains of every phase are
+        numbered from ``1``.
+    """
+    rng = np.random.default_rng(seed)
+    dims = tuple(int(d) for d in np.broadcast_to(np.asarray(rve_dims, dtype=int), (3,)))
+    if seeds is None:
+        seeds = rng.random((number_of_grains, 3)) * np.array(dims) * voxel_size_um
+    labels = nearest_seeds(seeds, dims, voxel_size_um, weights, periodic, chunk_size)
+
+    volumes = np.bincount(labels.ravel(), minlength=len(np.asarray(seeds).reshape(-1, 3)))
+    if phase_fractions is None:
+        phase_fractions = {VORONOI_PHASE: 1.0}
+    phases = assign_phases(volumes, phase_fractions, rng)
+    # number the grains of every phase from 1, grains without voxels vanish
+    codes = np.zeros(len(volumes), dtype=np.int64)
+    for phase in np.unique(phases):
+        grains = np.flatnonzero((phases == phase) & (volumes > 0))
+        codes[grains] = phase * PHASE_FACTOR + np.arange(1, len(grains) + 1)
+    return VoxelGrid(codes[labels].astype(np.int32), voxel_size_um)
@@ -0,0 +1,1034 @@
+# -*- coding: utf-8 -*-
+"""
+Native analysis of voxel RVEs.
+
+The functions in this module compute the same quantities as GeoVal's voxel
+analyses directly on the voxel array of an RVE (e.g. loaded from a ``.val``
+file with :func:`~MPaut.voxels.load_voxels`), without a round trip to GeoVal.
+The results are returned in the same format as the corresponding methods of
+:class:`~MPaut.geoval_subprocess.GeoVal_Communicator`.
+"""
+import numpy as np
+from MPaut.voxels import VoxelGrid, PHASE_FACTOR, as_voxel_grid
+
+
+def phase_counts(voxels, chunk_size=64):
+    """Count the voxels of every phase.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    chunk_size : int, optional
+        Number of slices along the first axis processed at once.
+        The default is ``64``.
+
+    Returns
+    -------
+    counts : numpy.ndarray
+        Number of voxels for every phase number, i.e. ``counts[p]`` is the
+        number of voxels of phase ``p``.
+    """
+    codes = as_voxel_grid(voxels).voxels
+    counts = np.zeros(1, dtype=np.int64)
+    for start in range(0, len(codes), chunk_size):
+        chunk_counts = np.bincount((codes[start:start + chunk_size] // PHASE_FACTOR).ravel())
+        if len(chunk_counts) > len(counts):
+            counts = np.pad(counts, (0, len(chunk_counts) - len(counts)))
+        counts[:len(chunk_counts)] += chunk_counts
+    return counts
+
+
+def volume_fractions(voxels, include_phase_0=False):
+    """Compute the voxel volume fractions for all phases in the RVE.
+
+    This is the native equivalent of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.get_volume_fractions`.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    include_phase_0 : bool, optional
+        Include the volume fraction of phase ``0`` (pores) in the result.
+        GeoVal does not report this phase. The default is ``False``.
+
+    Returns
+    -------
+    phase_volume_dict : dict
+        contains as keys the phase number and as values the corresponding volume
+        fraction between 0.0 and 1.0
+    """
+    counts = phase_counts(voxels)
+    total = counts.sum()
+    phase_volume_dict = {}
+    for phase in np.flatnonzero(counts):
+        if phase == 0 and not include_phase_0:
+            continue
+        phase_volume_dict[int(phase)] = float(counts[phase] / total)
+    return phase_volume_dict
+
+
+def _axis_runs(codes, axis, periodic=False):
+    # detect runs of identical voxel codes along the lines in the given axis
+    lines = np.moveaxis(codes, axis, -1)
+    n = lines.shape[-1]
+    flat = np.ascontiguousarray(lines).ravel()
+    
+    boundary = np.empty(flat.size, dtype=bool)
+    boundary[0] = True
+    np.not_equal(flat[1:], flat[:-1], out=boundary[1:])
+    # interfaces are changes of the voxel code inside a line
+    interface_pos = np.flatnonzero(boundary)
+    interface_pos = interface_pos[interface_pos % n != 0]
+    left, right = flat[interface_pos - 1], flat[interface_pos]
+    # every line starts a new run
+    boundary[::n] = True
+    
+    starts = np.flatnonzero(boundary)
+    lengths = np.diff(np.append(starts, flat.size))
+    values = flat[starts]
+    
+    if periodic:
+        first_values = flat[::n]
+        last_values = flat[n - 1::n]
+        wrap = first_values != last_values
+        left = np.concatenate((left, last_values[wrap]))
+        right = np.concatenate((right, first_values[wrap]))
+        
+        # merge the last run of a line with the first run if they continue 
+        # across the periodic boundary
+        line_first = np.flatnonzero(starts % n == 0)
+        line_last = np.append(line_first[1:], len(starts)) - 1
+        merge = ~wrap & (line_first != line_last)
+        lengths[line_first[merge]] += lengths[line_last[merge]]
+        keep = np.ones(len(starts), dtype=bool)
+        keep[line_last[merge]] = False
+        values = values[keep]
+        lengths = lengths[keep]
+        
+    return values, lengths, left, right
+
+
+def chord_length_analysis(voxels, periodic=False, include_phase_0=False):
+    """Run chord length analysis for the RVE.
+
+    This is the native equivalent of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.get_chord_length_analysis`
+    and returns the same keys, extended by full chord length distributions.
+    
+    Chords are runs of voxels with identical voxel code (i.e. voxels of the 
+    same object) along lines in x, y and z direction. Interfaces are changes 
+    of the voxel code between neighboring voxels, so boundaries between 
+    objects of the same phase are counted as interfaces of that phase with 
+    itself.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    periodic : bool, optional
+        Treat the RVE as periodic, i.e. chords continue across opposite faces
+        of the RVE. The default is ``False``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores) in the per phase results. 
+        The default is ``False``.
+
+    Returns
+    -------
+    res : dict
+        Dictionary containing result of the chord length analysis:
+            
+        - ``'phase_chord_lengths'``: for every phase the volume fraction, 
+          the number of chords (``'particle_count'``), the mean chord length 
+          and its standard deviation (``'variance'``, like GeoVal) in m.
+        - ``'interface_fractions'``: fraction of all interfaces between the 
+          phase pairs ``(p1, p2)`` with ``p1 <= p2``.
+        - ``'interface_per_volume_1/um'``: interface area per volume, 
+          estimated from the interface density along the lines (``2 * P_L``).
+        - ``'chord_length_histograms'``: for every phase the number of chords 
+          of each length in voxels, i.e. ``hist[l]`` chords of length ``l``.
+        - ``'directional_mean_chord_lengths'``: for every phase the mean 
+          chord lengths in m along x, y and z.
+
+    """
+    grid = as_voxel_grid(voxels)
+    codes = grid.voxels
+    voxel_length_m = grid.voxel_size * 1e-6
+    n_phases = int(codes.max()) // PHASE_FACTOR + 1
+    n_lengths = max(codes.shape) + 1
+    
+    # accumulate counts per phase and chord length as well as interface 
+    # counts per phase pair for all three axes
+    histogram = np.zeros(n_phases * n_lengths, dtype=np.int64)
+    axis_counts = []
+    axis_sums = []
+    pair_counts = np.zeros(n_phases * n_phases, dtype=np.int64)
+    for axis in range(3):
+        values, lengths, left, right = _axis_runs(codes, axis, periodic)
+        phases = values // PHASE_FACTOR
+        axis_counts.append(np.bincount(phases, minlength=n_phases))
+        axis_sums.append(np.bincount(phases, weights=lengths, minlength=n_phases))
+        histogram += np.bincount(phases * n_lengths + lengths, minlength=len(histogram))
+        
+        left = left // PHASE_FACTOR
+        right = right // PHASE_FACTOR
+        pair_counts += np.bincount(np.minimum(left, right) * n_phases + np.maximum(left, right), 
+                                   minlength=len(pair_counts))
+    histogram = histogram.reshape(n_phases, n_lengths)
+    
+    chord_lengths = np.arange(n_lengths)
+    chord_counts = histogram.sum(axis=1)
+    length_sums = histogram @ chord_lengths
+    length_sq_sums = histogram @ chord_lengths**2
+    total_length = length_sums.sum()
+    
+    res = {}
+    phase_chord_dict = {}
+    histograms = {}
+    directional_means = {}
+    for phase in np.flatnonzero(chord_counts):
+        if phase == 0 and not include_phase_0:
+            continue
+        mean = length_sums[phase] / chord_counts[phase]
+        std = np.sqrt(max(length_sq_sums[phase] / chord_counts[phase] - mean**2, 0.0))
+        chord_info = {}
+        chord_info['volume_fraction'] = float(length_sums[phase] / total_length)
+        chord_info['mean_chord_length'] = float(mean * voxel_length_m)
+        chord_info['variance'] = float(std * voxel_length_m)
+        chord_info['particle_count'] = int(chord_counts[phase])
+        phase_chord_dict[int(phase)] = chord_info
+        
+        hist = histogram[phase]
+        histograms[int(phase)] = hist[:np.flatnonzero(hist)[-1] + 1].tolist()
+        directional_means[int(phase)] = tuple(
+            float(s[phase] / c[phase] * voxel_length_m) if c[phase] > 0 else 0.0 
+            for c, s in zip(axis_counts, axis_sums))
+    res['phase_chord_lengths'] = phase_chord_dict
+    
+    n_interfaces = pair_counts.sum()
+    interface_fraction_dict = {}
+    for pair_index in np.flatnonzero(pair_counts):
+        p1, p2 = divmod(int(pair_index), n_phases)
+        if 0 in (p1, p2) and not include_phase_0:
+            continue
+        interface_fraction_dict[(p1, p2)] = float(pair_counts[pair_index] / n_interfaces)
+    res['interface_fractions'] = interface_fraction_dict
+    
+    # stereology: interface area per volume is twice the number of interface
+    # points per unit line length
+    res['interface_per_volume_1/um'] = float(2.0 * n_interfaces / (total_length * grid.voxel_size))
+    res['chord_length_histograms'] = histograms
+    res['directional_mean_chord_lengths'] = directional_means
+    
+    return res
+
+
+def _neighbor_offsets(connectivity):
+    # half of the neighborhood, every pair of neighbors is visited once
+    if connectivity not in (6, 18, 26):
+        raise ValueError(f"Invalid connectivity {connectivity}. Possible values are 6, 18 and 26.")
+    offsets = []
+    for offset in np.ndindex(3, 3, 3):
+        offset = tuple(o - 1 for o in offset)
+        if offset <= (0, 0, 0):
+            continue
+        order = sum(abs(o) for o in offset)
+        if (connectivity == 6 and order > 1) or (connectivity == 18 and order > 2):
+            continue
+        offsets.append(offset)
+    return offsets
+
+
+def _neighbor_pairs(array, offset, periodic):
+    # views of all voxel pairs (a, b) with b = a + offset
+    if periodic:
+        shifted = np.roll(array, [-o for o in offset], axis=(0, 1, 2))
+        return array, shifted
+    src = tuple(slice(max(0, -o), n - max(0, o)) for o, n in zip(offset, array.shape))
+    dst = tuple(slice(max(0, o), n - max(0, -o)) for o, n in zip(offset, array.shape))
+    return array[src], array[dst]
+
+
+def _union(parent, u, v):
+    # vectorized union-find: hook the larger root to the smaller root and
+    # compress paths until all edges connect nodes with the same root
+    while True:
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        ru = parent[u]
+        rv = parent[v]
+        differ = ru != rv
+        if not differ.any():
+            return parent
+        u = u[differ]
+        v = v[differ]
+        np.minimum.at(parent, np.maximum(ru[differ], rv[differ]), 
+                      np.minimum(ru[differ], rv[differ]))
+
+
+def _label(values, connectivity, periodic):
+    # connected component labelling of voxels with identical values
+    offsets = _neighbor_offsets(connectivity)
+    
+    # runs of voxels with the same value along z are always connected
+    run_start = np.empty(values.shape, dtype=bool)
+    run_start[:, :, 0] = True
+    np.not_equal(values[:, :, 1:], values[:, :, :-1], out=run_start[:, :, 1:])
+    index_dtype = np.int64 if values.size >= 2**31 else np.int32
+    run_ids = np.cumsum(run_start, dtype=index_dtype).reshape(values.shape)
+    run_ids -= 1
+    n_runs = int(run_ids[-1, -1, -1]) + 1
+    run_values = values.ravel()[np.flatnonzero(run_start)]
+    del run_start
+    
+    edges_u = []
+    edges_v = []
+    for offset in offsets:
+        if offset == (0, 0, 1) and not periodic:
+            continue
+        value_a, value_b = _neighbor_pairs(values, offset, periodic)
+        run_a, run_b = _neighbor_pairs(run_ids, offset, periodic)
+        same = value_a == value_b
+        u = run_a[same]
+        v = run_b[same]
+        # neighboring runs produce many identical consecutive edges
+        keep = np.ones(len(u), dtype=bool)
+        keep[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        keep &= u != v
+        edges_u.append(u[keep])
+        edges_v.append(v[keep])
+        
+    parent = np.arange(n_runs, dtype=index_dtype)
+    if edges_u:
+        parent = _union(parent, np.concatenate(edges_u), np.concatenate(edges_v))
+    
+    roots, run_labels = np.unique(parent, return_inverse=True)
+    labels = run_labels.astype(index_dtype)[run_ids]
+    return labels, run_values[roots]
+
+
+def label_regions(voxels, connectivity=6, periodic=False, by='object'):
+    """Label the connected regions of the RVE.
+
+    A region is a connected set of voxels with the same voxel code (i.e. a 
+    connected part of an object, like in GeoVal's region analysis) or, when 
+    labelling by phase, a connected set of voxels of the same phase. 
+    The labelling first combines runs of identical voxels along z and then 
+    merges neighboring runs using a vectorized union-find.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    connectivity : int, optional
+        Neighborhood used for connecting voxels: ``6`` (faces), ``18`` 
+        (faces and edges) or ``26`` (faces, edges and corners). 
+        The default is ``6``.
+    periodic : bool, optional
+        Connect regions across opposite faces of the RVE. 
+        The default is ``False``.
+    by : str, optional
+        ``'object'`` to label connected voxels with the same voxel code or 
+        ``'phase'`` to label connected voxels of the same phase. 
+        The default is ``'object'``.
+
+    Returns
+    -------
+    labels : numpy.ndarray
+        Region number of every voxel (``0`` to ``n_regions - 1``).
+    region_phases : numpy.ndarray
+        Phase number of every region.
+    """
+    grid = as_voxel_grid(voxels)
+    if by == 'object':
+        labels, region_codes = _label(grid.voxels, connectivity, periodic)
+        return labels, region_codes // PHASE_FACTOR
+    elif by == 'phase':
+        return _label(grid.phases, connectivity, periodic)
+    else:
+        raise ValueError(f"Invalid region type '{by}'. Possible values are 'object' and 'phase'.")
+
+
+def _weighted_mean_std(values, weights):
+    mean = np.average(values, weights=weights)
+    std = np.sqrt(np.average((values - mean)**2, weights=weights))
+    return float(mean), float(std)
+
+
+def region_analysis(voxels, connectivity=6, periodic=False, by='object', 
+                    include_phase_0=False):
+    """Get the 3-dimensional region analysis for all phases in the RVE.
+
+    This is the native equivalent of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.get_3d_region_analysis`.
+    All values are computed from a single labelling of the RVE (see 
+    :func:`~MPaut.voxel_analysis.label_regions`). Like GeoVal, mean values 
+    and their spread (reported as standard deviation in the ``*_variance`` 
+    entries) are weighted by the region volumes. With the default settings, 
+    region counts and volumes are identical to GeoVal's analysis.
+    
+    Surfaces are estimated from the voxel faces shared with other regions, 
+    scaled by ``2/3`` to correct the overestimation of isotropic surfaces by
+    voxel faces. Neighbors are regions sharing at least one voxel face.
+    The anisotropy and edge/corner ratios of GeoVal's analysis are not 
+    computed.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    connectivity : int, optional
+        Neighborhood used for connecting voxels to regions: ``6``, ``18`` or 
+        ``26``. The default is ``6``.
+    periodic : bool, optional
+        Connect regions across opposite faces of the RVE. 
+        The default is ``False``.
+    by : str, optional
+        ``'object'`` or ``'phase'``, see 
+        :func:`~MPaut.voxel_analysis.label_regions`. The default is ``'object'``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores) in the result. The default is ``False``.
+
+    Returns
+    -------
+    phase_region_dict : dict
+        contains as keys the phase number and as values a dictionary of
+        data from the region analysis for the phase.
+    """
+    grid = as_voxel_grid(voxels)
+    labels, region_phases = label_regions(grid, connectivity, periodic, by)
+    n_regions = len(region_phases)
+    volumes = np.bincount(labels.ravel(), minlength=n_regions)
+    
+    # faces shared by voxels of different regions
+    faces = np.zeros(n_regions, dtype=np.int64)
+    neighbor_pairs = []
+    for offset in _neighbor_offsets(6):
+        label_a, label_b = _neighbor_pairs(labels, offset, periodic)
+        differ = label_a != label_b
+        a = label_a[differ].astype(np.int64)
+        b = label_b[differ].astype(np.int64)
+        faces += np.bincount(a, minlength=n_regions)
+        faces += np.bincount(b, minlength=n_regions)
+        neighbor_pairs.append(np.minimum(a, b) * n_regions + np.maximum(a, b))
+    neighbor_pairs = np.unique(np.concatenate(neighbor_pairs))
+    neighbor_counts = (np.bincount(neighbor_pairs // n_regions, minlength=n_regions) 
+                       + np.bincount(neighbor_pairs % n_regions, minlength=n_regions))
+    
+    voxel_size = grid.voxel_size
+    volumes_um = volumes * voxel_size**3
+    equiv_diams = np.cbrt(6.0 * volumes_um / np.pi)
+    surf_volume_ratios = 2.0 / 3.0 * faces * voxel_size**2 / volumes_um
+    
+    phase_region_dict = {}
+    for phase in np.unique(region_phases):
+        if phase == 0 and not include_phase_0:
+            continue
+        regions = region_phases == phase
+        weights = volumes[regions]
+        info = {}
+        info['region_count'] = float(np.count_nonzero(regions))
+        info['region_volume'], info['region_volume_variance'] = _weighted_mean_std(volumes[regions], weights)
+        info['region_volume_min'] = float(volumes[regions].min())
+        info['region_volume_max'] = float(volumes[regions].max())
+        info['region_volume_um'], info['region_volume_um_variance'] = _weighted_mean_std(volumes_um[regions], weights)
+        info['equiv_diam'], info['equiv_diam_variance'] = _weighted_mean_std(equiv_diams[regions], weights)
+        info['surf_volume_ratio'], info['surf_volume_ratio_variance'] = _weighted_mean_std(surf_volume_ratios[regions], weights)
+        info['neighbor_count'], info['neighbor_count_variance'] = _weighted_mean_std(neighbor_counts[regions], weights)
+        phase_region_dict[int(phase)] = info
+    return phase_region_dict
+
+
+def _summed_volume_table(indicator, pad, dtype):
+    # 3-dimensional integral image with a leading row of zeros along every 
+    # axis; periodic RVEs are extended by the first pad voxels of every axis
+    if pad > 0:
+        indicator = np.pad(indicator, [(0, pad)] * 3, mode='wrap')
+    table = np.zeros(tuple(n + 1 for n in indicator.shape), dtype=dtype)
+    inner = table[1:, 1:, 1:]
+    np.cumsum(indicator, axis=0, dtype=dtype, out=inner)
+    np.cumsum(inner, axis=1, out=inner)
+    np.cumsum(inner, axis=2, out=inner)
+    return table
+
+
+def _window_sums(table, window, positions):
+    # sums over all windows of the given edge length (in voxels) by 
+    # differencing the integral image successively along every axis
+    sums = table
+    for axis, m in enumerate(positions):
+        upper = [slice(None)] * 3
+        lower = [slice(None)] * 3
+        upper[axis] = slice(window, window + m)
+        lower[axis] = slice(0, m)
+        sums = sums[tuple(upper)] - sums[tuple(lower)]
+    return sums
+
+
+def _window_voxels(grid, window_sizes, periodic):
+    # window edge lengths in voxels for window sizes in µm; periodic windows
+    # may be larger than the RVE and contain voxels more than once
+    windows = [max(1, int(round(size / grid.voxel_size))) for size in window_sizes]
+    for size, window in zip(window_sizes, windows):
+        if not periodic and window > min(grid.dims):
+            raise ValueError(f"Window size {size} um ({window} voxels) is larger than the RVE {grid.dims}.")
+    return windows
+
+
+def local_volume_statistics(voxels, window_sizes=(8, 16, 32), periodic=False, 
+                            include_phase_0=True):
+    """Compute statistics of the local volume fractions for several window sizes.
+
+    The local volume fraction of every phase is evaluated for cubic windows 
+    at every voxel position of the RVE from a 3-dimensional integral image 
+    (summed-area table) of the phase, so the cost does not depend on the 
+    window size.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    window_sizes : list of float, optional
+        Edge lengths of the windows in µm, rounded to whole voxels.
+        The default is ``(8, 16, 32)``, the window sizes of GeoVal's variance
+        analysis.
+    periodic : bool, optional
+        Let windows wrap around the RVE boundaries, so windows may also be 
+        larger than the RVE. Otherwise only windows completely inside the RVE 
+        are evaluated. The default is ``False``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores) in the result. The default is ``True``.
+
+    Returns
+    -------
+    res : dict
+        Dictionary of the following form:
+            {'window_sizes_um': [<size_0>, ..., <size_n>],
+             'mean': {<phase>: [<mean_size_0>, ..., <mean_size_n>], ...},
+             'variance': {<phase>: [<variance_size_0>, ..., <variance_size_n>], ...},
+             'min': {<phase>: [<min_size_0>, ..., <min_size_n>], ...},
+             'max': {<phase>: [<max_size_0>, ..., <max_size_n>], ...}}
+        where the window sizes are the rounded sizes in µm and the other 
+        entries are statistics of the local volume fractions.
+    """
+    grid = as_voxel_grid(voxels)
+    windows = _window_voxels(grid, window_sizes, periodic)
+    phases = grid.phases
+    dtype = np.int64 if grid.voxels.size >= 2**31 else np.int32
+    pad = max(windows) - 1 if periodic else 0
+    
+    res = {'window_sizes_um': [float(w * grid.voxel_size) for w in windows],
+           'mean': {}, 'variance': {}, 'min': {}, 'max': {}}
+    for phase in np.flatnonzero(np.bincount(phases.ravel())):
+        if phase == 0 and not include_phase_0:
+            continue
+        table = _summed_volume_table(phases == phase, pad, dtype)
+        for key in ('mean', 'variance', 'min', 'max'):
+            res[key][int(phase)] = []
+        for window in windows:
+            positions = [n if periodic else n - window + 1 for n in grid.dims]
+            fractions = _window_sums(table, window, positions) / float(window**3)
+            res['mean'][int(phase)].append(float(fractions.mean()))
+            res['variance'][int(phase)].append(float(fractions.var()))
+            res['min'][int(phase)].append(float(fractions.min()))
+            res['max'][int(phase)].append(float(fractions.max()))
+    return res
+
+
+def variance_analysis(voxels, mode='unscaled', window_sizes=(8, 16, 32), periodic=False):
+    """Run a variance analysis of the local volume fractions.
+
+    This is the native counterpart of
+    :func:`~MPaut.geoval_subprocess.GeoVal_Communicator.get_variance_analysis`
+    and returns results in the same format, but for any window sizes (see 
+    :func:`~MPaut.voxel_analysis.local_volume_statistics`). The variance of 
+    the local volume fractions is reported as is (``'unscaled'``), multiplied 
+    by the window area in µm² (``'area_scaled'``) or multiplied by the window 
+    volume in µm³ (``'fully_scaled'``). The scaled variances of a random 
+    structure become independent of the window size for large windows.
+    The minimum and maximum porosity are the extreme local volume fractions 
+    of phase ``0`` in the smallest windows.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    mode : str, optional
+        Mode to use for the variance analysis. Possible values are
+        ``'unscaled'``, ``'area_scaled'``, ``'fully_scaled'``.
+        The default is ``'unscaled'``.
+    window_sizes : list of float, optional
+        Edge lengths of the windows in µm. The default is ``(8, 16, 32)``.
+    periodic : bool, optional
+        Let windows wrap around the RVE boundaries, so windows may also be 
+        larger than the RVE. The default is ``False``.
+
+    Returns
+    -------
+    res : dict
+        Dictionary containing the result of the variance analysis in the 
+        following form:
+            {'variance_<mode>_<size_0>': {<phase_0>: <variance_phase_0>,
+                                          ...
+                                          <phase_n>: <variance_phase_n>},
+             ...
+             'porosity': {'min': <min_porosity_fraction>,
+                          'max': <max_porosity_fraction>}
+             }
+    """
+    exponents = {'unscaled': 0, 'area_scaled': 2, 'fully_scaled': 3}
+    if not mode in exponents:
+        raise ValueError(f"Invalid mode for variance analysis. Possible modes are {set(exponents.keys())}")
+        
+    stats = local_volume_statistics(voxels, window_sizes, periodic)
+    res = {}
+    for k, size in enumerate(window_sizes):
+        scale = stats['window_sizes_um'][k]**exponents[mode]
+        res[f'variance_{mode}_{size}'] = {phase: variances[k] * scale 
+                                          for phase, variances in stats['variance'].items()}
+    smallest = int(np.argmin(stats['window_sizes_um']))
+    if 0 in stats['min']:
+        res['porosity'] = {'min': stats['min'][0][smallest], 'max': stats['max'][0][smallest]}
+    else:
+        res['porosity'] = {'min': 0.0, 'max': 0.0}
+    return res
+
+
+def representative_volume_size(voxels, phase, relative_error=0.05, realizations=1, 
+                               window_sizes=None, periodic=False):
+    """Estimate the size of a representative volume element for a phase.
+
+    The variance of the local volume fraction :math:`D^2(V)` is fitted with 
+    the power law :math:`D^2(V) = K V^{-\\alpha}` over the window volumes 
+    :math:`V` (Kanit et al., 2003). The representative volume is the volume 
+    for which the mean volume fraction of ``realizations`` RVEs has the 
+    given relative error (two standard deviations).
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phase : int
+        Phase for which the representative volume is estimated.
+    relative_error : float, optional
+        Accepted relative error of the volume fraction. The default is ``0.05``.
+    realizations : int, optional
+        Number of RVEs which will be averaged. The default is ``1``.
+    window_sizes : list of float, optional
+        Edge lengths of the windows in µm used for the fit. The default is 
+        ``None``, which uses window sizes from an eighth up to half of the 
+        RVE size. The windows should be larger than the typical structure 
+        size (e.g. the grain size) for a reliable fit.
+    periodic : bool, optional
+        Let windows wrap around the RVE boundaries, so windows may also be 
+        larger than the RVE. The default is ``False``.
+
+    Returns
+    -------
+    rve_size : float
+        Estimated edge length of a cubic representative volume in µm.
+    """
+    grid = as_voxel_grid(voxels)
+    if window_sizes is None:
+        max_window = max(2, min(grid.dims) // 2)
+        windows = np.unique(np.geomspace(max(1, min(grid.dims) // 8), max_window, 6).round().astype(int))
+        window_sizes = [w * grid.voxel_size for w in windows]
+    stats = local_volume_statistics(grid, window_sizes, periodic)
+    if phase not in stats['variance']:
+        raise ValueError(f"Phase {phase} does not exist in the RVE.")
+    
+    sizes = np.array(stats['window_sizes_um'])
+    variances = np.array(stats['variance'][phase])
+    valid = variances > 0
+    if np.count_nonzero(valid) < 2:
+        raise ValueError("Not enough windows with non-zero variance to fit the variance curve.")
+    slope, intercept = np.polyfit(np.log(sizes[valid]**3), np.log(variances[valid]), 1)
+    alpha = -slope
+    if alpha <= 0:
+        raise ValueError("The variance of the local volume fraction does not decrease with the window size.")
+    fraction = np.mean(stats['mean'][phase])
+    volume = (4.0 * np.exp(intercept) / (relative_error**2 * fraction**2 * realizations))**(1.0 / alpha)
+    return float(np.cbrt(volume))
+
+
+def geodesic_distance(mask, sources, connectivity=26):
+    """Compute geodesic distances within a phase from a set of source voxels.
+
+    The distances are computed with a multi-source breadth-first search. 
+    For 6-connectivity every step has the length of one voxel, for 18- and 
+    26-connectivity steps are weighted with the 3-4-5 chamfer metric (edge 
+    neighbors 4/3, corner neighbors 5/3), which approximates Euclidean path 
+    lengths within a few percent.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        3-dimensional boolean array of the voxels which can be traversed.
+    sources : numpy.ndarray
+        3-dimensional boolean array of the start voxels.
+    connectivity : int, optional
+        Neighborhood used for the paths: ``6``, ``18`` or ``26``. 
+        The default is ``26``.
+
+    Returns
+    -------
+    distance : numpy.ndarray
+        Geodesic distance (in voxels) of every voxel to the nearest source, 
+        ``inf`` for voxels which cannot be reached.
+    """
+    offsets = _neighbor_offsets(connectivity)
+    offsets = offsets + [tuple(-o for o in offset) for offset in offsets]
+    if connectivity == 6:
+        scale = 1
+        weights = [1] * len(offsets)
+    else:
+        # 3-4-5 chamfer weights for face, edge and corner neighbors
+        scale = 3
+        weights = [2 + sum(abs(o) for o in offset) for offset in offsets]
+    
+    # pad with untraversable voxels, so neighbors never leave the array
+    padded = np.pad(np.asarray(mask, dtype=bool), 1)
+    strides = np.array([padded.shape[1] * padded.shape[2], padded.shape[2], 1])
+    flat_offsets = [int(np.dot(offset, strides)) for offset in offsets]
+    traversable = padded.ravel()
+    unreached = np.iinfo(np.int64).max
+    distance = np.full(padded.size, unreached, dtype=np.int64)
+    
+    start = np.flatnonzero(np.pad(np.asarray(sources, dtype=bool), 1).ravel() & traversable)
+    distance[start] = 0
+    # bucket queue indexed by the (integer) distance
+    buckets = {0: [start]}
+    while buckets:
+        current = min(buckets)
+        frontier = np.unique(np.concatenate(buckets.pop(current)))
+        frontier = frontier[distance[frontier] == current]
+        for flat_offset, weight in zip(flat_offsets, weights):
+            neighbors = frontier + flat_offset
+            neighbors = neighbors[traversable[neighbors]]
+            new_distance = current + weight
+            neighbors = neighbors[distance[neighbors] > new_distance]
+            if len(neighbors) > 0:
+                distance[neighbors] = new_distance
+                buckets.setdefault(new_distance, []).append(neighbors)
+                
+    distance = distance.reshape(padded.shape)[1:-1, 1:-1, 1:-1]
+    result = distance / scale
+    result[distance == unreached] = np.inf
+    return result
+
+
+def percolation_analysis(voxels, phases=None, connectivity=6, tortuosity=True):
+    """Check which phases percolate along x, y and z and compute their 
+    geometric tortuosity.
+
+    A phase percolates along an axis if a connected region of the phase 
+    touches both faces of the RVE perpendicular to the axis (see 
+    :func:`~MPaut.voxel_analysis.label_regions`). The geometric tortuosity
+    is the mean geodesic path length from the inlet face to the voxels of 
+    the phase at the outlet face (see 
+    :func:`~MPaut.voxel_analysis.geodesic_distance`), divided by the 
+    distance between both faces.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    phases : list of int, optional
+        Phases to analyse. The default is ``None``, which analyses all phases
+        of the RVE including phase ``0`` (pores).
+    connectivity : int, optional
+        Neighborhood used for connecting voxels and for the paths: ``6``, 
+        ``18`` or ``26``. The default is ``6``.
+    tortuosity : bool, optional
+        Compute the geometric tortuosity of percolating phases. 
+        The default is ``True``.
+
+    Returns
+    -------
+    phase_percolation_dict : dict
+        contains as keys the phase number and as values a dictionary with the
+        keys ``'x'``, ``'y'`` and ``'z'``. For every axis it contains whether 
+        the phase percolates (``'percolates'``), the fraction of the phase 
+        volume in percolating regions (``'percolating_fraction'``) and the 
+        geometric tortuosity (``'tortuosity'``, ``None`` if the phase does 
+        not percolate or the tortuosity is not computed).
+    """
+    grid = as_voxel_grid(voxels)
+    labels, region_phases = label_regions(grid, connectivity, periodic=False, by='phase')
+    volumes = np.bincount(labels.ravel(), minlength=len(region_phases))
+    if phases is None:
+        phases = np.unique(region_phases)
+        
+    phase_percolation_dict = {}
+    for phase in phases:
+        phase = int(phase)
+        phase_volume = volumes[region_phases == phase].sum()
+        phase_percolation_dict[phase] = {}
+        for axis, name in enumerate('xyz'):
+            inlet = np.take(labels, 0, axis=axis)
+            outlet = np.take(labels, -1, axis=axis)
+            spanning = np.intersect1d(inlet, outlet)
+            spanning = spanning[region_phases[spanning] == phase]
+            info = {'percolates': len(spanning) > 0,
+                    'percolating_fraction': float(volumes[spanning].sum() / phase_volume) if phase_volume else 0.0,
+                    'tortuosity': None}
+            if info['percolates'] and tortuosity:
+                info['tortuosity'] = geometric_tortuosity(grid.phases == phase, axis, connectivity)
+            phase_percolation_dict[phase][name] = info
+    return phase_percolation_dict
+
+
+def geometric_tortuosity(mask, axis, connectivity=6):
+    """Compute the geometric tortuosity of a phase along an axis.
+
+    Parameters
+    ----------
+    mask : numpy.ndarray
+        3-dimensional boolean array of the voxels of the phase.
+    axis : int
+        Axis (``0``, ``1`` or ``2`` for x, y and z) along which the 
+        tortuosity is computed.
+    connectivity : int, optional
+        Neighborhood used for the paths: ``6``, ``18`` or ``26``. 
+        The default is ``6``.
+
+    Returns
+    -------
+    tortuosity : float or None
+        Mean geodesic path length from the inlet face to the reachable 
+        voxels of the outlet face divided by the distance between the faces,
+        ``None`` if the outlet face cannot be reached.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    n = mask.shape[axis]
+    if n < 2:
+        raise ValueError("The tortuosity can only be computed for RVEs with at least two voxels along the axis.")
+    sources = np.zeros(mask.shape, dtype=bool)
+    index = [slice(None)] * 3
+    index[axis] = 0
+    sources[tuple(index)] = True
+    
+    distance = geodesic_distance(mask, sources, connectivity)
+    outlet = np.take(distance, -1, axis=axis)
+    reached = np.isfinite(outlet)
+    if not reached.any():
+        return None
+    return float(outlet[reached].mean() / (n - 1))
+
+
+class GrainGraph:
+    """Adjacency graph of the grains (objects) of an RVE.
+
+    Every distinct voxel code (i.e. object of a phase) is a node of the 
+    graph. Two grains are adjacent if they share at least one voxel face. 
+    The edges are stored in compressed sparse row (CSR) format: the 
+    neighbors of grain ``i`` are ``indices[indptr[i]:indptr[i + 1]]`` and the
+    numbers of shared voxel faces ``shared_faces[indptr[i]:indptr[i + 1]]``.
+    Every edge is stored for both grains.
+
+    Attributes
+    ----------
+    codes : numpy.ndarray
+        GeoVal voxel code of every grain.
+    volumes : numpy.ndarray
+        Number of voxels of every grain.
+    indptr : numpy.ndarray
+        Start of the neighbors of every grain in ``indices``.
+    indices : numpy.ndarray
+        Neighbor grains.
+    shared_faces : numpy.ndarray
+        Number of voxel faces shared with the neighbor grains.
+    voxel_size : float
+        Edge length of the voxels in µm.
+    """
+
+    def __init__(self, codes, volumes, indptr, indices, shared_faces, voxel_size=1.0):
+        self.codes = codes
+        self.volumes = volumes
+        self.indptr = indptr
+        self.indices = indices
+        self.shared_faces = shared_faces
+        self.voxel_size = voxel_size
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def phases(self):
+        """Phase of every grain."""
+        return self.codes // PHASE_FACTOR
+
+    @property
+    def coordination_numbers(self):
+        """Number of neighbor grains of every grain."""
+        return np.diff(self.indptr)
+
+    @property
+    def shared_areas(self):
+        """Areas of the grain boundaries in µm², aligned with ``indices``."""
+        return self.shared_faces * self.voxel_size**2
+
+    def index(self, code):
+        """Get the node index of the grain with the given voxel code."""
+        i = int(np.searchsorted(self.codes, code))
+        if i == len(self.codes) or self.codes[i] != code:
+            raise KeyError(f"There is no grain with voxel code {code}.")
+        return i
+
+    def neighbors(self, grain):
+        """Get the neighbors of a grain.
+
+        Parameters
+        ----------
+        grain : int
+            Node index of the grain.
+
+        Returns
+        -------
+        neighbors : numpy.ndarray
+            Node indices of the neighbor grains.
+        shared_faces : numpy.ndarray
+            Number of voxel faces shared with each neighbor.
+        """
+        rows = slice(self.indptr[grain], self.indptr[grain + 1])
+        return self.indices[rows], self.shared_faces[rows]
+
+    def edges(self):
+        """Get all edges of the graph once.
+
+        Returns
+        -------
+        edges : numpy.ndarray
+            Node indices ``(i, j)`` with ``i < j`` of all adjacent grains,
+            shape ``(n, 2)``.
+        shared_faces : numpy.ndarray
+            Number of voxel faces shared by the grains.
+        """
+        rows = np.repeat(np.arange(len(self.codes)), self.coordination_numbers)
+        upper = rows < self.indices
+        return np.stack([rows[upper], self.indices[upper]], axis=-1), self.shared_faces[upper]
+
+
+def grain_adjacency_graph(voxels, periodic=False):
+    """Build the adjacency graph of the grains (objects) of the RVE.
+
+    The shared faces of all grains are counted in one vectorized pass over 
+    the pairs of neighboring voxels along each axis.
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    periodic : bool, optional
+        Include faces shared across opposite faces of the RVE. 
+        The default is ``False``.
+
+    Returns
+    -------
+    graph : MPaut.voxel_analysis.GrainGraph
+        Adjacency graph of the grains.
+    """
+    grid = as_voxel_grid(voxels)
+    codes, inverse, volumes = np.unique(grid.voxels, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(grid.voxels.shape)
+    n_grains = len(codes)
+    
+    pairs = []
+    for offset in _neighbor_offsets(6):
+        a, b = _neighbor_pairs(inverse, offset, periodic)
+        differ = a != b
+        a = a[differ].astype(np.int64)
+        b = b[differ].astype(np.int64)
+        pairs.append(np.minimum(a, b) * n_grains + np.maximum(a, b))
+    pairs, shared_faces = np.unique(np.concatenate(pairs), return_counts=True)
+    
+    # store every edge for both grains, sorted by row
+    rows = np.concatenate([pairs // n_grains, pairs % n_grains])
+    cols = np.concatenate([pairs % n_grains, pairs // n_grains])
+    shared_faces = np.concatenate([shared_faces, shared_faces])
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_grains + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_grains), out=indptr[1:])
+    return GrainGraph(codes, volumes, indptr, cols[order], shared_faces[order], grid.voxel_size)
+
+
+def grain_boundary_analysis(voxels, periodic=False, include_phase_0=False):
+    """Compute grain boundary areas, coordination numbers and contiguity.
+
+    Grain boundary areas are the areas of the voxel faces shared by 
+    neighboring grains (see :func:`~MPaut.voxel_analysis.grain_adjacency_graph`).
+    Unlike the surfaces of :func:`~MPaut.voxel_analysis.region_analysis` 
+    they are not corrected for the overestimation by voxel faces. The 
+    contiguity of a phase ``a`` is ``2 S_aa / (2 S_aa + S_ab)``, where 
+    ``S_aa`` is the area of boundaries between grains of the phase and 
+    ``S_ab`` the area of interfaces with all other phases (including pores).
+
+    Parameters
+    ----------
+    voxels : MPaut.voxels.VoxelGrid or numpy.ndarray
+        Voxel grid or array of GeoVal voxel codes.
+    periodic : bool, optional
+        Include boundaries across opposite faces of the RVE. 
+        The default is ``False``.
+    include_phase_0 : bool, optional
+        Include phase ``0`` (pores) in the per phase results and phase pairs. 
+        The default is ``False``.
+
+    Returns
+    -------
+    res : dict
+        Dictionary containing:
+            
+        - ``'grain_boundary_area_um2'``: area of the boundaries between 
+          grains of the phase pairs ``(p1, p2)`` with ``p1 <= p2``.
+        - ``'grain_boundary_per_volume_1/um'``: grain boundary area of the 
+          phase pairs per RVE volume.
+        - ``'coordination_numbers'``: for every phase the volume-weighted 
+          mean number of neighbor grains (``'mean'``), its standard deviation
+          (``'variance'``, like GeoVal) and the minimum and maximum.
+        - ``'contiguity'``: contiguity of every phase.
+    """
+    grid = as_voxel_grid(voxels)
+    graph = grain_adjacency_graph(grid, periodic)
+    phases = graph.phases
+    edges, faces = graph.edges()
+    a, b = edges.T
+    n_phases = int(phases.max()) + 1
+    pa = np.minimum(phases[a], phases[b])
+    pb = np.maximum(phases[a], phases[b])
+    pair_faces = np.bincount(pa * n_phases + pb, weights=faces, minlength=n_phases**2)
+    pair_faces = pair_faces.reshape(n_phases, n_phases)
+    face_area = grid.voxel_size**2
+    volume = float(np.prod(grid.voxels.shape)) * grid.voxel_size**3
+    
+    res = {'grain_boundary_area_um2': {},
+           'grain_boundary_per_volume_1/um': {},
+           'coordination_numbers': {},
+           'contiguity': {}}
+    for p1, p2 in zip(*np.nonzero(pair_faces)):
+        if 0 in (p1, p2) and not include_phase_0:
+            continue
+        area = float(pair_faces[p1, p2] * face_area)
+        res['grain_boundary_area_um2'][(int(p1), int(p2))] = area
+        res['grain_boundary_per_volume_1/um'][(int(p1), int(p2))] = area / volume
+    
+    symmetric = pair_faces + pair_faces.T - np.diag(np.diag(pair_faces))
+    coordination = graph.coordination_numbers
+    for phase in np.unique(phases):
+        if phase == 0 and not include_phase_0:
+            continue
+        grains = phases == phase
+        info = {}
+        info['mean'], info['variance'] = _weighted_mean_std(coordination[grains], graph.volumes[grains])
+        info['min'] = int(coordination[grains].min())
+        info['max'] = int(coordination[grains].max())
+        res['coordination_numbers'][int(phase)] = info
+        
+        same = 2.0 * symmetric[phase, phase]
+        other = symmetric[phase].sum() - symmetric[phase, phase]
+        res['contiguity'][int(phase)] = float(same / (same + other)) if same + other > 0 else 0.0
+    return res
@@ -0,0 +1,728 @@
+# -*- coding: utf-8 -*-
+"""
+Reading and writing of GeoVal voxel files (``.val``).
+
+The voxel data is parsed into a single numpy array in one pass so that all
+consumers (visualization, analysis, meshing preparation) can share the same
+data instead of parsing the text file again. Parsed voxel files can be cached
+in a binary sidecar file which is memory-mapped on subsequent loads.
+
+The analysis modules accept an RVE either as :class:`VoxelGrid` or as a plain
+numpy array (see :func:`as_voxel_grid`). A plain array always contains GeoVal
+voxel codes, like the voxel files, also for analyses working on the phases
+only. Arrays of phase labels are passed as :meth:`VoxelGrid.from_labels`.
+"""
+import os
+import json
+import warnings
+import numpy as np
+from pathlib import Path
+
+# width of a single entry in GeoVal's voxel file format
+VAL_FIELD_WIDTH = 15
+
+# GeoVal voxel codes are ``PHASE_FACTOR * phase_number + object_number``
+PHASE_FACTOR = 100000
+
+# version of the binary sidecar cache, increase when the layout changes
+CACHE_VERSION = 1
+
+
+class VoxelGrid:
+    """Voxel data of an RVE as stored in GeoVal's voxel file format.
+
+    The voxels are stored as a single numpy integer array ``voxels`` of shape
+    ``(dim_x, dim_y, dim_z)`` containing the raw GeoVal voxel codes, i.e.
+    ``value = 100000 * phase_number + object_number``.
+
+    For a description of the file format see the ``GeoVal output format``
+    section of the documentation.
+    """
+
+    def __init__(self, voxels, voxel_size=1.0):
+        """Create a voxel grid from an array of GeoVal voxel codes.
+
+        Parameters
+        ----------
+        voxels : numpy.ndarray
+            Three-dimensional integer array with the GeoVal voxel codes.
+        voxel_size : float, optional
+            Edge length of a voxel (scale factor in um). The default is ``1.0``.
+
+        """
+        voxels = np.asanyarray(voxels)
+        if voxels.ndim != 3:
+            raise ValueError(f"Voxel data must be three-dimensional. Got array with shape {voxels.shape}.")
+        self.voxels = voxels
+        self.voxel_size = float(voxel_size)
+        # voxels, phases and objects of the last decoding
+        self._decoded = None
+
+    @property
+    def dims(self):
+        """Number of voxels in x, y and z direction."""
+        return self.voxels.shape
+
+    @property
+    def codes(self):
+        """Raw GeoVal voxel codes (alias for ``voxels``)."""
+        return self.voxels
+
+    @classmethod
+    def from_val_file(cls, file, dtype=np.int32):
+        """Load a GeoVal voxel file (.val).
+
+        The complete voxel data is parsed in a single pass without holding
+        the text of the file in memory.
+
+        Parameters
+        ----------
+        file : str or pathlib.Path
+            Path of the voxel file.
+        dtype : numpy.dtype, optional
+            Integer type used for the voxel codes. The default is ``numpy.int32``.
+
+        Returns
+        -------
+        grid : VoxelGrid
+            The voxel data contained in the file.
+
+        """
+        with open(file, 'rb') as f:
+            dims, voxel_size = _parse_header(f.readline(), file)
+            voxels = np.fromfile(f, dtype=dtype, sep=' ')
+
+        if voxels.size != np.prod(dims):
+            raise ValueError(f"Invalid voxel file {file}: expected {np.prod(dims)} voxels for dimensions {dims}, found {voxels.size}.")
+
+        return cls(voxels.reshape(dims), voxel_size)
+
+    def to_val_file(self, file):
+        """Store the voxel data in GeoVal's voxel file format (.val).
+
+        Files read with :func:`~MPaut.voxels.VoxelGrid.from_val_file` are
+        written back bit-identically.
+
+        Parameters
+        ----------
+        file : str or pathlib.Path
+            Path of the voxel file.
+
+        """
+        path = Path(file)
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+
+        with open(path, 'w', newline='\n') as f:
+            f.write(_format_header(self.dims, self.voxel_size))
+            for block in self.voxels:
+                f.write(_format_block(block))
+
+    def decode(self):
+        """Split the voxel codes into phase numbers and object numbers.
+
+        See :func:`~MPaut.voxels.decode_voxels`. The voxels are only decoded 
+        once, the read-only result is reused until ``voxels`` is replaced by
+        another array. Voxels which are modified in place must be assigned 
+        again (``grid.voxels = grid.voxels.copy()``) to decode them again.
+
+        Returns
+        -------
+        phases : numpy.ndarray
+            Phase number of every voxel (``uint8`` or ``uint16``).
+        objects : numpy.ndarray
+            Object number of every voxel (``uint32``).
+
+        """
+        if self._decoded is None or self._decoded[0] is not self.voxels:
+            phases, objects = decode_voxels(self.voxels)
+            phases.flags.writeable = False
+            objects.flags.writeable = False
+            self._decoded = (self.voxels, phases, objects)
+        return self._decoded[1:]
+
+    @property
+    def phases(self):
+        """Phase number of every voxel (read-only, see :func:`~MPaut.voxels.VoxelGrid.decode`)."""
+        return self.decode()[0]
+
+    @property
+    def objects(self):
+        """Object number of every voxel (read-only, see :func:`~MPaut.voxels.VoxelGrid.decode`)."""
+        return self.decode()[1]
+
+    @classmethod
+    def from_labels(cls, phases, objects=None, voxel_size=1.0):
+        """Create a voxel grid from phase and object label arrays.
+
+        Parameters
+        ----------
+        phases : numpy.ndarray
+            Phase number of every voxel.
+        objects : numpy.ndarray, optional
+            Object number of every voxel. The default is ``None``, which 
+            assigns object number ``0`` to all voxels.
+        voxel_size : float, optional
+            Edge length of a voxel (scale factor in um). The default is ``1.0``.
+
+        Returns
+        -------
+        grid : VoxelGrid
+            Voxel grid with the encoded GeoVal voxel codes.
+
+        """
+        return cls(encode_voxels(phases, objects), voxel_size)
+
+    def subvolume(self, origin, size):
+        """Get a sub-volume of the RVE without copying the voxel data.
+
+        Parameters
+        ----------
+        origin : tuple of int
+            Index of the first voxel of the sub-volume along x, y and z.
+        size : int or tuple of int
+            Number of voxels of the sub-volume along x, y and z.
+
+        Returns
+        -------
+        grid : VoxelGrid
+            Voxel grid sharing its voxel data with this grid (a view, also
+            for memory-mapped grids).
+
+        """
+        size = _subvolume_size(size, self.dims)
+        if len(origin) != 3 or any(o < 0 or o + s > n for o, s, n in zip(origin, size, self.dims)):
+            raise ValueError(f"Sub-volume at {tuple(origin)} with size {size} exceeds the RVE dimensions {self.dims}.")
+        index = tuple(slice(int(o), int(o) + s) for o, s in zip(origin, size))
+        return VoxelGrid(self.voxels[index], self.voxel_size)
+
+    def window_view(self, size, step=None):
+        """Get all sub-volumes on a regular grid as a single strided view.
+
+        Parameters
+        ----------
+        size : int or tuple of int
+            Number of voxels of the sub-volumes along x, y and z.
+        step : int or tuple of int, optional
+            Distance of the origins of neighboring sub-volumes. Steps smaller
+            than the size give overlapping (sliding) windows. The default is
+            ``None``, which uses the size, i.e. a regular tiling of the RVE.
+
+        Returns
+        -------
+        windows : numpy.ndarray
+            Read-only view of shape ``(nx, ny, nz, sx, sy, sz)``, where
+            ``windows[i, j, k]`` are the voxel codes of the sub-volume at
+            origin ``(i * step_x, j * step_y, k * step_z)``.
+
+        """
+        size = _subvolume_size(size, self.dims)
+        step = size if step is None else _subvolume_size(step, self.dims)
+        voxels = self.voxels
+        counts = tuple((n - s) // t + 1 for n, s, t in zip(self.dims, size, step))
+        strides = tuple(st * t for st, t in zip(voxels.strides, step)) + voxels.strides
+        return np.lib.stride_tricks.as_strided(voxels, counts + size, strides, writeable=False)
+
+    def iter_subvolumes(self, size, step=None):
+        """Iterate over sub-volumes on a regular grid without copying.
+
+        Parameters
+        ----------
+        size : int or tuple of int
+            Number of voxels of the sub-volumes along x, y and z.
+        step : int or tuple of int, optional
+            Distance of the origins of neighboring sub-volumes, see
+            :func:`~MPaut.voxels.VoxelGrid.window_view`. The default is
+            ``None``, which tiles the RVE.
+
+        Yields
+        ------
+        origin : tuple of int
+            Index of the first voxel of the sub-volume.
+        grid : VoxelGrid
+            Sub-volume sharing its voxel data with this grid.
+
+        """
+        size = _subvolume_size(size, self.dims)
+        step = size if step is None else _subvolume_size(step, self.dims)
+        windows = self.window_view(size, step)
+        for index in np.ndindex(*windows.shape[:3]):
+            origin = tuple(i * t for i, t in zip(index, step))
+            yield origin, VoxelGrid(windows[index], self.voxel_size)
+
+    def random_subvolumes(self, size, count, seed=None):
+        """Sample sub-volumes at random positions without copying.
+
+        Parameters
+        ----------
+        size : int or tuple of int
+            Number of voxels of the sub-volumes along x, y and z.
+        count : int
+            Number of sub-volumes.
+        seed : int, optional
+            Seed for the random number generator. The default is ``None``.
+
+        Yields
+        ------
+        origin : tuple of int
+            Index of the first voxel of the sub-volume.
+        grid : VoxelGrid
+            Sub-volume sharing its voxel data with this grid.
+
+        """
+        size = _subvolume_size(size, self.dims)
+        rng = np.random.default_rng(seed)
+        origins = rng.integers(0, np.subtract(self.dims, size) + 1, size=(count, 3))
+        for origin in origins:
+            origin = tuple(int(o) for o in origin)
+            yield origin, self.subvolume(origin, size)
+
+    def coarsen(self, factor, priority=None):
+        """Coarsen the voxel grid by an integer factor with a majority vote.
+
+        Every block of ``factor`` voxels along each axis becomes one voxel.
+        The phase of the coarse voxel is the phase with the most voxels in the
+        block, ties are broken by ``priority``. Its voxel code is the most
+        frequent code of this phase in the block (the smallest code for ties),
+        so objects are preserved as far as possible.
+
+        Parameters
+        ----------
+        factor : int
+            Coarsening factor. The dimensions of the grid must be divisible 
+            by the factor.
+        priority : list of int, optional
+            Phase numbers in order of precedence for breaking ties. Phases
+            which are not listed have lower precedence than all listed phases
+            and are ordered by their phase number. The default is ``None``,
+            which prefers lower phase numbers.
+
+        Returns
+        -------
+        grid : VoxelGrid
+            Coarse voxel grid with ``factor`` times the voxel size.
+
+        """
+        factor = _resampling_factor(factor)
+        if any(n % f for n, f in zip(self.dims, factor)):
+            raise ValueError(f"The dimensions {self.dims} are not divisible by the coarsening factor {factor}.")
+        coarse_dims = tuple(n // f for n, f in zip(self.dims, factor))
+
+        # collect the voxels of every block in the last axis
+        blocks = np.asarray(self.voxels).reshape(coarse_dims[0], factor[0], coarse_dims[1], factor[1],
+                                                 coarse_dims[2], factor[2])
+        blocks = blocks.transpose(0, 2, 4, 1, 3, 5).reshape(-1, int(np.prod(factor)))
+        block_phases = blocks // PHASE_FACTOR
+
+        phases = np.unique(block_phases).tolist()
+        priority = [] if priority is None else [p for p in priority if p in phases]
+        phases = priority + [p for p in phases if p not in priority]
+        counts = np.stack([np.count_nonzero(block_phases == p, axis=1) for p in phases], axis=1)
+        # argmax returns the first maximum, i.e. the phase with highest precedence
+        majority_phase = np.asarray(phases)[np.argmax(counts, axis=1)]
+
+        # most frequent code of the majority phase in every block
+        codes = np.where(block_phases == majority_phase[:, None], blocks, np.iinfo(blocks.dtype).max)
+        codes.sort(axis=1)
+        run_starts = np.ones(codes.shape, dtype=bool)
+        run_starts[:, 1:] = codes[:, 1:] != codes[:, :-1]
+        positions = np.arange(codes.shape[1])
+        run_lengths = positions - np.maximum.accumulate(np.where(run_starts, positions, 0), axis=1)
+        run_lengths[codes == np.iinfo(blocks.dtype).max] = -1
+        majority = np.take_along_axis(codes, np.argmax(run_lengths, axis=1)[:, None], axis=1)
+
+        return VoxelGrid(majority.reshape(coarse_dims), self.voxel_size * factor[0])
+
+    def refine(self, factor):
+        """Refine the voxel grid by an integer factor.
+
+        Every voxel is split into ``factor`` voxels along each axis with the
+        same voxel code (nearest-neighbor upsampling), i.e. phases and
+        objects are preserved exactly.
+
+        Parameters
+        ----------
+        factor : int
+            Refinement factor.
+
+        Returns
+        -------
+        grid : VoxelGrid
+            Fine voxel grid with the voxel size divided by ``factor``.
+
+        """
+        factor = _resampling_factor(factor)
+        nx, ny, nz = self.dims
+        fine = np.broadcast_to(np.asarray(self.voxels)[:, None, :, None, :, None],
+                               (nx, factor[0], ny, factor[1], nz, factor[2]))
+        fine = fine.reshape(nx * factor[0], ny * factor[1], nz * factor[2])
+        return VoxelGrid(fine, self.voxel_size / factor[0])
+
+    def __repr__(self):
+        return f"VoxelGrid(dims={self.dims}, voxel_size={self.voxel_size})"
+
+
+class VoxelStreamReader:
+    """Read a GeoVal voxel file (.val) slab by slab with bounded memory.
+
+    The voxel file stores the RVE as ``dim_x`` blocks of ``dim_y`` lines 
+    with ``dim_z`` entries each. The reader parses the file block by block, 
+    so only the slabs requested at a time are held in memory. This makes it
+    possible to process RVEs which do not fit into memory.
+
+    Examples
+    --------
+    Process a large RVE using a sliding window of three slices::
+
+        reader = VoxelStreamReader('voxels.val')
+        for start, slab in reader.iter_slabs(slab_size=3, step=1):
+            ...
+    """
+
+    def __init__(self, file, dtype=np.int32):
+        """Open a GeoVal voxel file for streaming.
+
+        Parameters
+        ----------
+        file : str or pathlib.Path
+            Path of the voxel file.
+        dtype : numpy.dtype, optional
+            Integer type used for the voxel codes. The default is ``numpy.int32``.
+
+        """
+        self.file = Path(file)
+        self.dtype = dtype
+        with open(self.file, 'rb') as f:
+            self.dims, self.voxel_size = _parse_header(f.readline(), file)
+
+    def iter_slabs(self, slab_size=1, step=None):
+        """Iterate over slabs of consecutive blocks (slices along x).
+
+        Parameters
+        ----------
+        slab_size : int, optional
+            Number of slices per slab. The default is ``1``.
+        step : int, optional
+            Number of slices the slab is advanced in each iteration. 
+            Values smaller than ``slab_size`` result in a sliding window over 
+            overlapping slabs. The default is ``None``, which uses 
+            ``slab_size`` (non-overlapping slabs).
+
+        Yields
+        ------
+        start : int
+            Index of the first slice of the slab.
+        slab : numpy.ndarray
+            Voxel codes of the slab with shape ``(n, dim_y, dim_z)``. The last 
+            slab can contain fewer than ``slab_size`` slices.
+
+        """
+        if step is None:
+            step = slab_size
+        if not 0 < step <= slab_size:
+            raise ValueError(f"Invalid slab step {step}. The step must be between 1 and the slab size {slab_size}.")
+            
+        nx, ny, nz = self.dims
+        block_size = ny * nz
+        with open(self.file, 'rb') as f:
+            f.readline()    # skip header
+            start = 0
+            slab = np.empty((0, ny, nz), dtype=self.dtype)
+            while start < nx:
+                stop = min(start + slab_size, nx)
+                n_blocks = stop - start - len(slab)
+                # only the slices not contained in the previous slab are read
+                new_blocks = np.fromfile(f, dtype=self.dtype, 
+                                         count=n_blocks * block_size, sep=' ')
+                if new_blocks.size != n_blocks * block_size:
+                    raise ValueError(f"Invalid voxel file {self.file}: unexpected end of file in slice {start + len(slab) + new_blocks.size // block_size}.")
+                slab = np.concatenate((slab, new_blocks.reshape(n_blocks, ny, nz)))
+                yield start, slab
+                
+                if stop == nx:
+                    break
+                slab = slab[step:]
+                start += step
+
+    def __iter__(self):
+        """Iterate over the single slices (arrays of shape ``(dim_y, dim_z)``)."""
+        for _, slab in self.iter_slabs(slab_size=1):
+            yield slab[0]
+
+
+def as_voxel_grid(voxels):
+    """Get the voxel grid of an RVE given as voxel grid or array.
+
+    Parameters
+    ----------
+    voxels : VoxelGrid or numpy.ndarray
+        Voxel grid or three-dimensional array of GeoVal voxel codes
+        (``100000 * phase_number + object_number``). Arrays are never
+        interpreted as phase labels, wrap those with
+        :meth:`VoxelGrid.from_labels`.
+
+    Returns
+    -------
+    grid : VoxelGrid
+        The given voxel grid, or a voxel grid with voxel size ``1.0``
+        sharing its data with the array.
+
+    """
+    if isinstance(voxels, VoxelGrid):
+        return voxels
+    return VoxelGrid(voxels)
+
+
+def decode_voxels(codes, chunk_size=64):
+    """Split GeoVal voxel codes into compact phase and object label arrays.
+
+    The codes are decoded slice by slice into preallocated output arrays, so 
+    no temporary arrays of the full size of the RVE are created.
+
+    Parameters
+    ----------
+    codes : numpy.ndarray
+        Array of GeoVal voxel codes (``100000 * phase_number + object_number``).
+    chunk_size : int, optional
+        Number of slices along the first axis decoded at once. 
+        The default is ``64``.
+
+    Returns
+    -------
+    phases : numpy.ndarray
+        Phase number of every voxel. The dtype is ``uint8`` if all phase 
+        numbers are smaller than 256, otherwise ``uint16``.
+    objects : numpy.ndarray
+        Object number of every voxel as ``uint32``.
+
+    """
+    codes = np.asanyarray(codes)
+    if codes.size > 0 and codes.min() < 0:
+        raise ValueError("GeoVal voxel codes must not be negative.")
+    max_phase = int(codes.max()) // PHASE_FACTOR if codes.size > 0 else 0
+    phase_dtype = np.uint8 if max_phase < 2**8 else np.uint16
+
+    if codes.ndim == 0:
+        return phase_dtype(codes // PHASE_FACTOR), np.uint32(codes % PHASE_FACTOR)
+
+    phases = np.empty(codes.shape, dtype=phase_dtype)
+    objects = np.empty(codes.shape, dtype=np.uint32)
+    for start in range(0, len(codes), chunk_size):
+        phase_chunk, object_chunk = np.divmod(codes[start:start + chunk_size], PHASE_FACTOR)
+        phases[start:start + chunk_size] = phase_chunk
+        objects[start:start + chunk_size] = object_chunk
+    return phases, objects
+
+
+def encode_voxels(phases, objects=None, dtype=np.int32):
+    """Combine phase and object label arrays into GeoVal voxel codes.
+
+    This is the inverse of :func:`~MPaut.voxels.decode_voxels`.
+
+    Parameters
+    ----------
+    phases : numpy.ndarray
+        Phase number of every voxel.
+    objects : numpy.ndarray, optional
+        Object number of every voxel. The default is ``None``, which assigns 
+        object number ``0`` to all voxels.
+    dtype : numpy.dtype, optional
+        Integer type of the voxel codes. The default is ``numpy.int32``.
+
+    Returns
+    -------
+    codes : numpy.ndarray
+        GeoVal voxel codes (``100000 * phase_number + object_number``).
+
+    """
+    codes = np.multiply(phases, PHASE_FACTOR, dtype=dtype)
+    if objects is not None:
+        if np.any(np.asanyarray(objects) >= PHASE_FACTOR):
+            raise ValueError(f"Object numbers must be smaller than {PHASE_FACTOR}.")
+        codes += np.asanyarray(objects).astype(dtype, copy=False)
+    return codes
+
+
+def _parse_header(line, file=None):
+    if isinstance(line, bytes):
+        line = line.decode()
+    values = line.split()
+    if len(values) != 4:
+        raise ValueError(f"Invalid voxel file {file}: expected header '<dim_x> <dim_y> <dim_z> <scale_factor>', got '{line.strip()}'.")
+    dims = tuple(int(v) for v in values[:3])
+    voxel_size = float(values[3])
+    return dims, voxel_size
+
+
+def _format_header_value(value):
+    # GeoVal writes integral values without decimal places (e.g. ``1``)
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_header(dims, voxel_size):
+    values = [str(d) for d in dims] + [_format_header_value(voxel_size)]
+    return "".join(v.ljust(VAL_FIELD_WIDTH) for v in values) + "\n"
+
+
+def _format_block(block):
+    # a block contains dim_y lines with dim_z entries each and is followed by
+    # an empty line
+    ny, nz = block.shape
+    line_fmt = f"%-{VAL_FIELD_WIDTH}d" * nz + "\n"
+    return (line_fmt * ny + "\n") % tuple(block.ravel().tolist())
+
+
+def _subvolume_size(size, dims):
+    if np.isscalar(size):
+        size = (size,) * 3
+    size = tuple(int(s) for s in size)
+    if len(size) != 3 or any(s < 1 or s > n for s, n in zip(size, dims)):
+        raise ValueError(f"Invalid sub-volume size {size} for RVE dimensions {tuple(dims)}.")
+    return size
+
+
+def _resampling_factor(factor):
+    # voxels are cubes, so grids are resampled with the same factor along all axes
+    if int(factor) != factor or factor < 1:
+        raise ValueError(f"Invalid resampling factor {factor}. The factor must be a positive integer.")
+    return (int(factor),) * 3
+
+
+def _cache_paths(file):
+    path = Path(file)
+    return (path.with_name(path.name + '.npy'), 
+            path.with_name(path.name + '.json'))
+
+
+def _source_stamp(file):
+    # the modification time and size identify the version of the source file
+    # without having to read (and hash) the complete text
+    stat = os.stat(file)
+    return {'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size}
+
+
+def _read_cache(file, dtype, mmap_mode):
+    data_path, header_path = _cache_paths(file)
+    if not (data_path.exists() and header_path.exists()):
+        return None
+    try:
+        header = json.loads(header_path.read_text())
+    except ValueError:
+        return None
+    
+    valid = (header.get('version') == CACHE_VERSION 
+             and header.get('dtype') == np.dtype(dtype).str
+             and all(header.get(k) == v for k, v in _source_stamp(file).items()))
+    if not valid:
+        return None
+    
+    try:
+        voxels = np.load(data_path, mmap_mode=mmap_mode)
+    except (ValueError, OSError):
+        # truncated or foreign sidecar, the voxel file is parsed again
+        return None
+    if voxels.shape != tuple(header.get('dims', ())):
+        return None
+    return VoxelGrid(voxels, header['voxel_size'])
+
+
+def _write_cache(file, grid):
+    data_path, header_path = _cache_paths(file)
+    header = {'version': CACHE_VERSION,
+              'dims': list(grid.dims),
+              'voxel_size': grid.voxel_size,
+              'dtype': grid.voxels.dtype.str}
+    header.update(_source_stamp(file))
+    
+    # write to temporary files first so that concurrent readers never see 
+    # an incomplete cache
+    tmp_data_path = data_path.with_name(data_path.name + f'.{os.getpid()}.tmp')
+    with open(tmp_data_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(grid.voxels))
+    os.replace(tmp_data_path, data_path)
+    tmp_header_path = header_path.with_name(header_path.name + f'.{os.getpid()}.tmp')
+    tmp_header_path.write_text(json.dumps(header))
+    os.replace(tmp_header_path, header_path)
+
+
+def load_voxels(file, cache=True, mmap_mode='r', dtype=np.int32):
+    """Load a GeoVal voxel file (.val), using a binary sidecar cache.
+
+    When ``cache`` is enabled, the parsed voxel codes are stored next to the 
+    voxel file in a binary sidecar (``<file>.npy`` plus a small ``<file>.json``
+    header with dimensions, voxel size and modification time/size of the 
+    source file). Subsequent loads memory-map the sidecar instead of parsing 
+    the text file. The sidecar is rebuilt automatically when the ``.val``
+    file changes.
+
+    Parameters
+    ----------
+    file : str or pathlib.Path
+        Path of the voxel file.
+    cache : bool, optional
+        Use (and create) the binary sidecar cache. The default is ``True``.
+    mmap_mode : str, optional
+        Memory-map mode used for loading the cache, see :func:`numpy.load`. 
+        Use ``None`` to load the voxels into memory. The default is ``'r'``
+        (read-only).
+    dtype : numpy.dtype, optional
+        Integer type used for the voxel codes. The default is ``numpy.int32``.
+
+    Returns
+    -------
+    grid : VoxelGrid
+        The voxel data contained in the file.
+
+    """
+    if not cache:
+        return VoxelGrid.from_val_file(file, dtype=dtype)
+    
+    grid = _read_cache(file, dtype, mmap_mode)
+    if grid is not None:
+        return grid
+    
+    grid = VoxelGrid.from_val_file(file, dtype=dtype)
+    try:
+        _write_cache(file, grid)
+    except OSError as e:
+        warnings.warn(f"Could not write the voxel cache for {file}: {e}", RuntimeWarning)
+        return grid
+    
+    if mmap_mode is None:
+        return grid
+    cached_grid = _read_cache(file, dtype, mmap_mode)
+    return grid if cached_grid is None else cached_grid
+
+
+def write_subvolumes(subvolumes, folder, name='subvolume_{0}_{1}_{2}.val'):
+    """Write sub-volumes of an RVE as standalone GeoVal voxel files (.val).
+
+    The files can be used like RVEs generated by GeoVal, e.g. for meshing
+    with VoxSM and the ANSYS simulations.
+
+    Parameters
+    ----------
+    subvolumes : iterable
+        Pairs ``(origin, grid)`` as yielded by 
+        :func:`~MPaut.voxels.VoxelGrid.iter_subvolumes` or 
+        :func:`~MPaut.voxels.VoxelGrid.random_subvolumes`.
+    folder : str or pathlib.Path
+        Output folder.
+    name : str, optional
+        Format string for the file names, formatted with the origin of the
+        sub-volume. The default is ``'subvolume_{0}_{1}_{2}.val'``.
+
+    Returns
+    -------
+    files : list of pathlib.Path
+        Paths of the written voxel files.
+
+    """
+    files = []
+    for origin, grid in subvolumes:
+        file = Path(folder, name.format(*origin))
+        grid.to_val_file(file)
+        files.append(file)
+    return files
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scripted stand-in for ``geo_val.exe --cmdline`` used by the communicator tests.
+
+The commands are read from stdin in the same format as they are sent to
+GeoVal. The communicators send every batch of commands in a single write, 
+so once all commands received so far are processed and no further input is 
+pending, the batch is complete and ``done`` is written to stdout. Only the 
+commands needed by the tests are simulated:
+
+- ``set_nnm``/``set_sc`` set the RVE dimensions and voxel size
+- ``do_set_randseed`` seeds the random number generator
+- ``do_intro_objects`` introduces spheres with the phase of the object type
+- ``do_intro_inter`` introduces voxels of a phase at the phase interfaces
+- ``do_voxel_analysis`` prints the volume fractions (without phase 0)
+- ``do_store_voxels`` writes the voxels to a .val file
+- ``do_distribute_objects`` waits for the other instances if 
+  ``FAKE_GEOVAL_BARRIER`` is set (see :meth:`FakeGeoVal.barrier`)
+- ``quit`` ends the program
+
+All other commands are accepted and ignored.
+"""
+import os
+import sys
+import time
+import select
+import pathlib
+
+import numpy as np
+
+sys.path.append(str(pathlib.Path(__file__).parents[2] / 'src'))
+from MPaut.voxels import VoxelGrid, PHASE_FACTOR
+
+class FakeGeoVal:
+    def __init__(self):
+        self.dims = [64, 64, 64]
+        self.voxel_size = 1.0
+        self.params = {}
+        self.rng = np.random.default_rng(0)
+        self.voxels = np.zeros(self.dims, dtype=np.int32)
+        self.object_count = 0
+
+    def process(self, line):
+        cmd, _, args = line.partition(':')
+        args = args.split()
+        if cmd == 'set_nnm':
+            self.dims[int(args[0]) - 1] = int(args[1])
+            self.voxels = np.zeros(self.dims, dtype=np.int32)
+        elif cmd == 'set_sc':
+            self.voxel_size = float(args[0])
+        elif cmd == 'set_pobjec':
+            self.params[int(args[0])] = float(args[1])
+        elif cmd == 'do_set_randseed':
+            self.rng = np.random.default_rng(int(args[0]))
+        elif cmd == 'do_intro_objects':
+            self.intro_objects()
+        elif cmd == 'do_intro_inter':
+            self.intro_at_interfaces()
+        elif cmd == 'do_voxel_analysis':
+            phases = self.voxels // PHASE_FACTOR
+            for phase in np.unique(phases):
+                if phase != 0:
+                    print(f"Volume fraction {phase}   {np.mean(phases == phase):.6f}")
+        elif cmd == 'do_store_voxels':
+            VoxelGrid(self.voxels, self.voxel_size).to_val_file(line.partition(':')[2].strip())
+        elif cmd == 'do_distribute_objects':
+            self.barrier()
+
+    def barrier(self):
+        """Wait until ``FAKE_GEOVAL_PARTIES`` instances are distributing.
+
+        Every instance creates a file in the folder ``FAKE_GEOVAL_BARRIER``
+        and waits for the files of the others. Instances which met all 
+        others leave a ``.passed`` file, so the commands of the instances 
+        overlapped if there is one for every instance.
+        """
+        folder = os.environ.get('FAKE_GEOVAL_BARRIER')
+        if folder is None:
+            return
+        folder = pathlib.Path(folder)
+        parties = int(os.environ['FAKE_GEOVAL_PARTIES'])
+        (folder / f'{os.getpid()}.waiting').touch()
+        deadline = time.monotonic() + 30.0
+        while len(list(folder.glob('*.waiting'))) < parties:
+            if time.monotonic() > deadline:
+                return
+            time.sleep(0.01)
+        (folder / f'{os.getpid()}.passed').touch()
+
+    def intro_objects(self):
+        number = int(self.params[1])
+        phase = int(self.params[2])
+        radius = self.params[6] * 1e6 / self.voxel_size
+        index = np.indices(self.dims)
+        for center in self.rng.uniform(0, self.dims, size=(number, 3)):
+            # periodic distance to the center of the sphere
+            delta = np.abs(index - center.reshape(3, 1, 1, 1))
+            delta = np.minimum(delta, np.reshape(self.dims, (3, 1, 1, 1)) - delta)
+            self.object_count += 1
+            self.voxels[(delta**2).sum(axis=0) <= radius**2] = phase * PHASE_FACTOR + self.object_count
+
+    def intro_at_interfaces(self):
+        mode = int(self.params[16])
+        phase = int(self.params[17])
+        fraction = self.params[18]
+        # number of neighbors with a different code
+        neighbors = sum((np.roll(self.voxels, shift, axis) != self.voxels).astype(int)
+                        for axis in range(3) for shift in (-1, 1))
+        # corners have more differing neighbors than edges and faces
+        sites = np.flatnonzero((neighbors >= 4 - mode) & (self.voxels // PHASE_FACTOR != phase))
+        chosen = self.rng.choice(sites, int(round(fraction * sites.size)), replace=False)
+        self.voxels.ravel()[chosen] = phase * PHASE_FACTOR
+
+def main():
+    geoval = FakeGeoVal()
+    pending = b''
+    while True:
+        data = os.read(sys.stdin.fileno(), 65536)
+        if not data:
+            break
+        pending += data
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            line = line.decode().strip()
+            if line == 'quit':
+                return
+            if line:
+                geoval.process(line)
+        # the batch is complete once no further commands are pending
+        if not pending and not select.select([sys.stdin], [], [], 0)[0]:
+            print("done", flush=True)
+
+if __name__ == '__main__':
+    main()
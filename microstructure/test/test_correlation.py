@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the two-point correlations
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import voxels
+from MPaut import correlation
+
+
+VOXEL_FILE = pathlib.Path('resources', 'voxels.val')
+
+
+def brute_force_correlation(labels, i, j, displacement, periodic):
+    if periodic:
+        shifted = np.roll(labels, [-d for d in displacement], axis=(0, 1, 2))
+        return np.mean((labels == i) & (shifted == j))
+    first = tuple(slice(max(0, -d), n - max(0, d)) for d, n in zip(displacement, labels.shape))
+    second = tuple(slice(max(0, d), n + min(0, d)) for d, n in zip(displacement, labels.shape))
+    return np.mean((labels[first] == i) & (labels[second] == j))
+
+@pytest.mark.parametrize('periodic', [True, False])
+def test_two_point_correlations(periodic):
+    rng = np.random.default_rng(1)
+    labels = rng.integers(0, 3, (5, 6, 7))
+    
+    res = correlation.two_point_correlations(voxels.VoxelGrid.from_labels(labels), periodic=periodic)
+    assert set(res.keys()) == {(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)}
+    
+    calculator = correlation.CorrelationCalculator(labels.shape, [0, 1, 2], periodic)
+    corr = res[(1, 2)]
+    assert corr.shape == calculator.shape
+    for index in [(0, 0, 0), (1, -2, 3), (-2, 2, -3), (2, 0, 1)]:
+        center_index = tuple(c + d for c, d in zip(calculator.center, index))
+        expected = brute_force_correlation(labels, 1, 2, index, periodic)
+        assert corr[center_index] == pytest.approx(expected)
+    
+    # the auto-correlation at zero displacement is the volume fraction
+    assert res[(1, 1)][calculator.center] == pytest.approx(np.mean(labels == 1))
+    
+def test_radial_average():
+    rng = np.random.default_rng(2)
+    labels = rng.integers(0, 2, (8, 8, 8))
+    grid = voxels.VoxelGrid(labels * 100000, voxel_size=0.5)
+    
+    corr = correlation.two_point_correlations(grid)[(1, 1)]
+    radii, radial = correlation.radial_average(corr, voxel_size=0.5)
+    assert np.array_equal(radii, [0.0, 0.5, 1.0, 1.5])
+    assert radial[0] == pytest.approx(np.mean(labels == 1))
+    # displacements with a rounded length of one voxel
+    shell = [d for d in np.ndindex(3, 3, 3) 
+             if np.rint(np.linalg.norm(np.subtract(d, 1))) == 1]
+    expected = np.mean([brute_force_correlation(labels, 1, 1, np.subtract(d, 1), True) 
+                        for d in shell])
+    assert radial[1] == pytest.approx(expected)
+    
+@pytest.mark.parametrize('periodic', [True, False])
+def test_batch(periodic):
+    rng = np.random.default_rng(3)
+    # stacks are arrays of GeoVal voxel codes
+    stack = rng.integers(0, 2, (5, 6, 6, 6)) * voxels.PHASE_FACTOR + rng.integers(0, 3, (5, 6, 6, 6))
+    calculator = correlation.CorrelationCalculator((6, 6, 6), [0, 1], periodic, 
+                                                   pairs=[(0, 1), (1, 1)])
+    res = calculator.batch(stack, batch_size=2)
+    radial = calculator.batch(iter(stack), radial=True, batch_size=3)
+    assert set(res.keys()) == {(0, 1), (1, 1)}
+    assert res[(1, 1)].shape == (5,) + calculator.shape
+    assert radial[(1, 1)].shape == (5, len(calculator.radii))
+    for k, codes in enumerate(stack):
+        single = calculator.correlations(voxels.VoxelGrid.from_labels(codes // voxels.PHASE_FACTOR))
+        for pair in res:
+            assert np.allclose(res[pair][k], single[pair])
+            assert np.allclose(radial[pair][k], calculator.radial_average(single[pair]))
+            
+    with pytest.raises(ValueError):
+        calculator.batch(stack[:, :5])
+        
+def test_correlations_rve():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    res = correlation.two_point_correlations(grid)
+    center = tuple(n // 2 for n in grid.dims)
+    phases = np.unique(grid.phases)
+    # the correlations with all phases sum up to the volume fraction 
+    first, last = phases[0], phases[-1]
+    assert np.allclose(sum(res[(first, j)] for j in phases), np.mean(grid.phases == first))
+    assert np.allclose(sum(res[(i, last)] for i in phases), np.mean(grid.phases == last))
+    for i in phases:
+        assert res[(i, i)][center] == pytest.approx(np.mean(grid.phases == i))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the native cylinders, tubes and fibres
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import fibres, voxels, voxel_analysis
+
+
+def brute_force(center, direction, length, radius, inner_radius, shell, dims):
+    # evaluates the distance of every voxel of a non-periodic RVE
+    x = np.stack(np.meshgrid(*[np.arange(n) + 0.5 for n in dims], indexing='ij'), axis=-1) - center
+    t = x @ direction
+    radial = np.sqrt(np.maximum(np.sum(x**2, axis=-1) - t**2, 0.0))
+    solid = (radial < radius) & (np.abs(t) < length / 2)
+    outside = np.maximum(radial - radius, 0.0)**2 + np.maximum(np.abs(t) - length / 2, 0.0)**2
+    bore = radial < inner_radius
+    return np.flatnonzero(solid & ~bore), np.flatnonzero(~solid & ~bore & (outside < shell**2))
+
+@pytest.mark.parametrize("trial", range(20))
+def test_voxels_brute_force(trial):
+    rng = np.random.default_rng(trial)
+    dims = (20, 24, 18)
+    center = rng.random(3) * dims
+    direction = rng.standard_normal(3)
+    direction /= np.linalg.norm(direction)
+    length, radius = rng.uniform(2, 30), rng.uniform(0.5, 5)
+    inner_radius = radius * rng.uniform(0, 0.9) if trial % 2 else 0.0
+    shell = rng.uniform(0, 2) if trial % 3 else 0.0
+    
+    objects = fibres.CylinderSet([center], [direction], length, radius, dims, inner_radius, shell, periodic=False)
+    core, coating = objects.voxels(0)
+    expected_core, expected_coating = brute_force(center, direction, length, radius, inner_radius, shell, dims)
+    assert sorted(core) == expected_core.tolist()
+    assert sorted(coating) == expected_coating.tolist()
+    
+def test_sample_orientations():
+    rng = np.random.default_rng(0)
+    directions = fibres.sample_orientations(20000, 'uniform', rng=rng)
+    assert np.allclose(np.linalg.norm(directions, axis=1), 1.0)
+    assert np.allclose(fibres.orientation_tensor(directions), np.eye(3) / 3, atol=0.01)
+    
+    directions = fibres.sample_orientations(10, 'aligned', axis=(1, 0, 0), rng=rng)
+    assert np.allclose(directions, [1, 0, 0])
+    directions = fibres.sample_orientations(20000, 'aligned', axis=(1, 0, 0), spread_deg=5.0, rng=rng)
+    tilt = np.degrees(np.arccos(directions[:, 0]))
+    # the misalignment angle follows a Rayleigh distribution
+    assert np.mean(tilt) == pytest.approx(5.0 * np.sqrt(np.pi / 2), rel=0.02)
+    
+    directions = fibres.sample_orientations(20000, 'transversely_isotropic', axis=(0, 0, 1), rng=rng)
+    assert np.allclose(directions[:, 2], 0.0)
+    assert np.allclose(fibres.orientation_tensor(directions), np.diag([0.5, 0.5, 0.0]), atol=0.01)
+    
+    tensor = np.array([[0.6, 0.1, 0.0], [0.1, 0.3, 0.0], [0.0, 0.0, 0.1]])
+    directions = fibres.sample_orientations(5000, 'tensor', tensor=tensor, rng=rng)
+    assert np.allclose(fibres.orientation_tensor(directions), tensor, atol=0.01)
+    
+    with pytest.raises(ValueError):
+        fibres.sample_orientations(10, 'tensor', tensor=np.eye(3), rng=rng)
+    with pytest.raises(ValueError):
+        fibres.sample_orientations(10, 'random', rng=rng)
+
+def test_to_voxel_grid():
+    # a fibre along z through the periodic RVE and a tube across its boundary
+    objects = fibres.CylinderSet([[5, 5, 8], [15, 0, 10]], [[0, 0, 1], [1, 0, 0]], [16, 12], [3, 4], 
+                                 (20, 20, 16), inner_radii=[0, 2], shells=[1, 0], 
+                                 phases=[fibres.FIBRE_PHASE, fibres.TUBE_PHASE])
+    grid = objects.to_voxel_grid()
+    assert isinstance(grid, voxels.VoxelGrid)
+    codes = grid.voxels
+    fibre_code = fibres.FIBRE_PHASE * voxels.PHASE_FACTOR + 1
+    tube_code = fibres.TUBE_PHASE * voxels.PHASE_FACTOR + 1
+    shell_code = fibres.SHELL_PHASE * voxels.PHASE_FACTOR + 1
+    
+    # the fibre fills all layers, the shell surrounds it
+    assert np.all(np.count_nonzero(codes == fibre_code, axis=(0, 1)) == np.count_nonzero(codes[..., 0] == fibre_code))
+    assert codes[5, 5, 0] == fibre_code and codes[5, 8, 3] == shell_code
+    # the tube wraps around y = 0 and is hollow
+    assert codes[15, 17, 10] == tube_code and codes[15, 2, 10] == tube_code
+    assert codes[15, 0, 10] == 0
+    assert np.count_nonzero(codes == tube_code) == pytest.approx(np.pi * (16 - 4) * 12, rel=0.1)
+    
+def test_random_fibres():
+    rve = fibres.random_fibres(rve_dims=48, radius_um=2.0, length_um=16.0, shell_um=0.5, 
+                               volume_fraction=0.1, orientation='transversely_isotropic', seed=1)
+    assert rve.volume_fraction == pytest.approx(0.1, abs=np.max(rve.volumes) / 48**3)
+    assert np.allclose(rve.directions[:, 2], 0.0)
+    
+    # the objects and their shells do not overlap
+    grid = rve.to_voxel_grid()
+    codes, counts = np.unique(grid.voxels, return_counts=True)
+    cores = [len(rve.voxels(i)[0]) for i in range(len(rve))]
+    assert counts[codes // voxels.PHASE_FACTOR == fibres.FIBRE_PHASE].tolist() == cores
+    assert voxel_analysis.volume_fractions(grid)[fibres.FIBRE_PHASE] == pytest.approx(0.1, abs=0.01)
+    
+    again = fibres.random_fibres(rve_dims=48, radius_um=2.0, length_um=16.0, shell_um=0.5, 
+                                 volume_fraction=0.1, orientation='transversely_isotropic', seed=1)
+    assert np.array_equal(rve.centers, again.centers)
+    
+    tubes = fibres.random_fibres(rve_dims=32, radius_um=3.0, inner_radius_um=1.5, length_um=10.0, 
+                                 number_of_fibres=10, phase=fibres.TUBE_PHASE, periodic=False, seed=2)
+    assert len(tubes) == 10
+    assert np.all(tubes.inner_radii == 1.5)
+    
+    with pytest.raises(ValueError):
+        fibres.random_fibres(rve_dims=32)
+    with pytest.raises(ValueError):
+        fibres.random_fibres(rve_dims=32, radius_um=2.0, inner_radius_um=3.0, number_of_fibres=1)
+    
+def test_random_fibres_non_periodic():
+    rve = fibres.random_fibres(rve_dims=48, radius_um=2.0, length_um=30.0, volume_fraction=0.15,
+                               periodic=False, seed=3)
+    # only the parts of the fibres inside of the RVE count
+    assert rve.volume_fraction == pytest.approx(0.15, abs=np.max(rve.volumes) / 48**3)
+    vol_frac = voxel_analysis.volume_fractions(rve.to_voxel_grid())
+    assert vol_frac[fibres.FIBRE_PHASE] == pytest.approx(0.15, abs=0.01)
+    
+def test_random_fibres_jammed():
+    with pytest.warns(RuntimeWarning, match="below the target"):
+        rve = fibres.random_fibres(rve_dims=24, radius_um=2.0, length_um=20.0, volume_fraction=0.5,
+                                   max_attempts=100, seed=4)
+    assert rve.volume_fraction < 0.5
@@ -465,6 +465,35 @@ def test_dilation(geo_comm):
             vol_frac_new = geo_comm.get_volume_fractions()  # volume fraction after dilation operation
             assert vol_frac[phase] < vol_frac_new[phase]    # make sure that dilation increases the volume
             
+def test_control_volume_fractions(geo_comm):
+    geo_comm.initialize_rve(rve_dims=32)
+    geo_comm.introduce_objects(N=20, object_type='voronoi_polyeder')
+    
+    vol_frac = geo_comm.control_volume_fractions({0: 0.2}, tolerance=0.01)
+    assert 1.0 - sum(vol_frac.values()) == pytest.approx(0.2, abs=0.02)
+    
+    with pytest.raises(ValueError):
+        geo_comm.control_volume_fractions({0: 1.5})
+    with pytest.raises(ValueError):
+        geo_comm.control_volume_fractions({0: 0.2}, modes=['vertices'])
+        
+def test_select_interface_step():
+    select = geoval_subprocess.GeoVal_Communicator._select_interface_step
+    probes = {'corners': 0.01, 'edges': 0.01}
+    # unknown modes are probed first
+    assert select(0.1, {}, probes, 0, 0.01) == ('corners', 0.01)
+    # a gain from the current step closes the deficit up to half the tolerance
+    mode, fraction = select(0.1, {'corners': (1.0, 0.05, 1)}, probes, 1, 0.01)
+    assert mode == 'corners' and fraction == pytest.approx(0.095)
+    # gains from earlier steps only close half of the deficit
+    mode, fraction = select(0.1, {'corners': (1.0, 0.05, 1)}, probes, 2, 0.01)
+    assert mode == 'corners' and fraction == pytest.approx(0.05)
+    # the extrapolation is limited to four times the measured fraction
+    assert select(0.1, {'corners': (1.0, 0.01, 1), 'edges': (2.0, 0.01, 1)}, 
+                  probes, 1, 0.01) == ('edges', pytest.approx(0.04))
+    # exhausted modes are not used anymore
+    assert select(0.1, {}, {}, 1, 0.01) == (None, None)
+            
 def test_screenshot(geo_comm_tmpdir):
     # create a single RVE, mesh it and run Ansys simulation of elasticity
     geo_comm, tmpdir = geo_comm_tmpdir
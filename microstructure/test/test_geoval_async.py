@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the asynchronous GeoVal communicator
+"""
+import sys
+import asyncio
+import threading
+import pathlib
+import pytest
+
+sys.path.append("../src")   # this adds the mother folder
+                         # "my_python_scripts_folder/" to the python path
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+from MPaut import geoval_async, geoval_subprocess
+
+# scripted executable speaking GeoVal's --cmdline protocol
+FAKE_GEOVAL_EXECUTABLE = pathlib.Path('resources', 'fake_geoval.py')
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="the fake GeoVal executable only runs on POSIX systems")
+
+def create_rve(geo_comm):
+    geo_comm.initialize_rve(rve_dims=24)
+    geo_comm.set_randseed(3)
+    geo_comm.introduce_objects(N=8, object_type='sphere', shape_description={'radius': 4e-6})
+
+async def create_rve_async(geo_comm):
+    await geo_comm.initialize_rve(rve_dims=24)
+    await geo_comm.set_randseed(3)
+    await geo_comm.introduce_objects(N=8, object_type='sphere', shape_description={'radius': 4e-6})
+
+def test_communicator_creation_fail():
+    with pytest.raises(FileNotFoundError):
+        geoval_async.AsyncGeoValCommunicator(executable='no_such_file.exe')
+
+def test_debug_output(tmpdir):
+    async def run():
+        geo_comm = await geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                              output_folder=tmpdir).start()
+        await geo_comm.set_randseed(42)
+        await geo_comm.end_communication()
+        await geo_comm.close()
+    asyncio.run(run())
+
+    debug_output = pathlib.Path(tmpdir, 'debug.pro').read_text()
+    assert "do_set_randseed: 42" in debug_output
+    assert "quit" in debug_output
+
+def test_same_results_as_blocking_communicator(tmpdir):
+    geo_comm = geoval_subprocess.GeoVal_Communicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                     output_folder=pathlib.Path(tmpdir, 'blocking'))
+    create_rve(geo_comm)
+    vol_frac = geo_comm.get_volume_fractions()
+    voxels = geo_comm.get_voxels().voxels
+    geo_comm.close()
+
+    async def run():
+        async with geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                        output_folder=pathlib.Path(tmpdir, 'async')) as geo_comm:
+            await create_rve_async(geo_comm)
+            return await geo_comm.get_volume_fractions(), (await geo_comm.get_voxels()).voxels
+    vol_frac_async, voxels_async = asyncio.run(run())
+
+    assert set(vol_frac) == {1}
+    assert vol_frac_async == vol_frac
+    assert (voxels_async == voxels).all()
+
+def test_voxels_parsed_outside_of_event_loop(tmpdir, monkeypatch):
+    threads = []
+    from_val_file = geoval_subprocess.VoxelGrid.from_val_file
+    def parse(path):
+        threads.append(threading.get_ident())
+        return from_val_file(path)
+    monkeypatch.setattr(geoval_subprocess.VoxelGrid, 'from_val_file', parse)
+
+    async def run():
+        async with geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                        output_folder=tmpdir) as geo_comm:
+            await create_rve_async(geo_comm)
+            return (await geo_comm.get_voxels()).voxels
+    voxels = asyncio.run(run())
+
+    assert voxels.shape == (24, 24, 24)
+    assert threads and threading.get_ident() not in threads
+
+def test_native_analysis(tmpdir):
+    async def run():
+        async with geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                        output_folder=tmpdir) as geo_comm:
+            await create_rve_async(geo_comm)
+            return (await geo_comm.get_volume_fractions(native=False),
+                    await geo_comm.get_volume_fractions(native=True))
+    vol_frac, vol_frac_native = asyncio.run(run())
+
+    assert vol_frac_native[1] == pytest.approx(vol_frac[1], abs=1e-6)
+
+def test_control_volume_fractions(tmpdir):
+    async def run():
+        async with geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                        output_folder=tmpdir) as geo_comm:
+            await create_rve_async(geo_comm)
+            return await geo_comm.control_volume_fractions({2: 0.1}, tolerance=0.01)
+    vol_frac = asyncio.run(run())
+
+    assert vol_frac[2] == pytest.approx(0.1, abs=0.02)
+
+def test_concurrent_communicators(tmpdir, monkeypatch):
+    # the fake GeoVal instances only finish distribute once all of them are 
+    # distributing, which requires the commands to overlap
+    barrier = pathlib.Path(tmpdir, 'barrier')
+    barrier.mkdir()
+    monkeypatch.setenv('FAKE_GEOVAL_BARRIER', str(barrier))
+    monkeypatch.setenv('FAKE_GEOVAL_PARTIES', '4')
+
+    async def run():
+        geo_comms = [geoval_async.AsyncGeoValCommunicator(executable=FAKE_GEOVAL_EXECUTABLE,
+                                                          output_folder=pathlib.Path(tmpdir, f'rve_{i}'))
+                     for i in range(4)]
+        await asyncio.gather(*(geo_comm.start() for geo_comm in geo_comms))
+        await asyncio.gather(*(create_rve_async(geo_comm) for geo_comm in geo_comms))
+        await asyncio.gather(*(geo_comm.distribute() for geo_comm in geo_comms))
+        results = await asyncio.gather(*(geo_comm.get_volume_fractions() for geo_comm in geo_comms))
+        await asyncio.gather(*(geo_comm.close() for geo_comm in geo_comms))
+        return results
+    results = asyncio.run(run())
+
+    assert all(vol_frac == results[0] for vol_frac in results)
+    assert len(list(barrier.glob('*.passed'))) == 4
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the native morphology functions
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import voxels
+from MPaut import morphology
+from MPaut import voxel_analysis
+
+
+VOXEL_FILE = pathlib.Path('resources', 'voxels.val')
+
+
+def test_minkowski_functionals_cube():
+    labels = np.zeros((5, 5, 5), dtype=np.uint8)
+    labels[1:3, 1:4, 1:4] = 1
+    grid = voxels.VoxelGrid(labels.astype(np.int32) * 100000, voxel_size=0.5)
+    
+    res = morphology.minkowski_functionals(grid)
+    assert set(res.keys()) == {1}
+    info = res[1]
+    # box of 2x3x3 voxels
+    assert info['volume'] == pytest.approx(18 * 0.125)
+    assert info['surface_area'] == pytest.approx(2 * (6 + 6 + 9) * 0.25)
+    assert info['mean_curvature'] == pytest.approx(np.pi * (2 + 3 + 3) * 0.5)
+    assert info['euler_characteristic'] == 1
+    assert info['volume_fraction'] == pytest.approx(18 / 125)
+    
+    res = morphology.minkowski_functionals(grid, include_phase_0=True)
+    # the matrix has a cavity
+    assert res[0]['euler_characteristic'] == 2
+    
+@pytest.mark.parametrize('labels, euler', [
+    # single voxel
+    (np.pad(np.ones((1, 1, 1)), 1), 1),
+    # hollow cube
+    (np.pad(np.pad(np.zeros((1, 1, 1)), 1, constant_values=1), 1), 2),
+    # ring
+    (np.pad(np.pad(np.zeros((1, 1, 1)), ((1, 1), (1, 1), (0, 0)), constant_values=1), 1), 0),
+    # voxels touching at a corner are connected
+    (np.pad(np.eye(2)[:, :, np.newaxis] * np.eye(2)[np.newaxis], 1), 1),
+    ])
+def test_euler_characteristic(labels, euler):
+    assert morphology.euler_characteristic(voxels.VoxelGrid.from_labels(labels.astype(int)), 1) == euler
+    
+def test_minkowski_functionals_periodic():
+    # rod through the periodic RVE is a closed loop
+    labels = np.zeros((4, 4, 4), dtype=int)
+    labels[:, 1, 1] = 1
+    grid = voxels.VoxelGrid.from_labels(labels)
+    res = morphology.minkowski_functionals(grid, periodic=True)
+    assert res[1]['euler_characteristic'] == 0
+    assert res[1]['surface_area'] == pytest.approx(16)
+    assert res[1]['mean_curvature'] == pytest.approx(4 * np.pi)
+    res = morphology.minkowski_functionals(grid, periodic=False)
+    assert res[1]['euler_characteristic'] == 1
+    assert res[1]['surface_area'] == pytest.approx(18)
+    
+def test_minkowski_functionals_rve():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    res = morphology.minkowski_functionals(grid, include_phase_0=True)
+    assert set(res.keys()) == {0, 1, 7}
+    assert sum(info['volume_fraction'] for info in res.values()) == pytest.approx(1.0)
+    for phase, info in res.items():
+        histogram = morphology.configuration_histogram(grid.phases == phase)
+        assert histogram.sum() == np.prod(np.add(grid.dims, 1))
+        assert info['euler_characteristic'] == morphology.euler_characteristic(grid, phase)
+    
+def test_dilation_erosion():
+    codes = np.full((5, 5, 5), 100001, dtype=np.int32)
+    codes[2, 2, 2] = 200001
+    
+    grid = morphology.dilation(codes, 2)
+    assert np.count_nonzero(grid.phases == 2) == 7
+    assert set(np.unique(grid.voxels)) == {100001, 200001}
+    assert np.count_nonzero(morphology.dilation(codes, 2, number_of_neighbors=2).phases == 2) == 1
+    assert np.count_nonzero(morphology.dilation(codes, 2, connectivity=26).phases == 2) == 27
+    assert np.count_nonzero(morphology.dilation(codes, 2, target_phases=[0]).phases == 2) == 1
+    assert np.count_nonzero(morphology.dilation(codes, 2, repetitions=2).phases == 2) == 25
+    
+    # the arms of the cross have five neighbors of phase 1
+    eroded = morphology.erosion(grid, 2, number_of_neighbors=2)
+    assert np.count_nonzero(eroded.phases == 2) == 1
+    eroded = morphology.erosion(grid, 2, number_of_neighbors=6, fill_code=0)
+    assert np.count_nonzero(eroded.phases == 2) == 7
+    eroded = morphology.erosion(grid, 2, fill_code=0)
+    assert np.count_nonzero(eroded.phases == 0) == 6
+    
+    with pytest.raises(ValueError):
+        morphology.dilation(codes, 2, number_of_neighbors=7)
+    with pytest.raises(ValueError):
+        morphology.dilation(codes, 2, repetitions=0)
+        
+def test_delete_small_regions(tmp_path):
+    codes = np.full((6, 6, 6), 100001, dtype=np.int32)
+    codes[0:3, 0:3, 0:3] = 200001
+    codes[5, 5, 5] = 200002
+    codes[5, 0, 5] = 300001
+    
+    grid = morphology.delete_small_regions(voxels.VoxelGrid(codes, voxel_size=0.5), voxel_margin=2)
+    assert set(np.unique(grid.voxels)) == {100001, 200001}
+    assert grid.voxel_size == 0.5
+    assert np.count_nonzero(grid.voxels == 200001) == 27
+    
+    grid = morphology.delete_small_regions(codes, voxel_margin=2, phase=3)
+    assert set(np.unique(grid.voxels)) == {100001, 200001, 200002}
+    
+    # deleted regions are filled from their neighbors
+    codes[4:, 4:, 4:] = 200002
+    grid = morphology.delete_small_regions(codes, voxel_margin=9, phase=2)
+    assert np.count_nonzero(grid.voxels == 100001) == 216 - 27 - 1
+    
+    # the result can be written as voxel file
+    grid.to_val_file(tmp_path / 'voxels.val')
+    assert np.array_equal(voxels.VoxelGrid.from_val_file(tmp_path / 'voxels.val').voxels, grid.voxels)
+    
+def test_delete_small_regions_by_mean():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    fraction = 0.2
+    res = voxel_analysis.region_analysis(grid)
+    cleaned = morphology.delete_small_regions_by_mean(grid, fraction)
+    assert cleaned.dims == grid.dims
+    for phase, info in voxel_analysis.region_analysis(cleaned).items():
+        assert info['region_volume_min'] >= fraction * res[phase]['region_volume']
+    
+def brute_force_distance(mask, periodic):
+    background = np.argwhere(~mask)
+    diff = np.abs(np.argwhere(np.ones_like(mask))[:, np.newaxis, :] - background[np.newaxis])
+    if periodic:
+        diff = np.minimum(diff, np.array(mask.shape) - diff)
+    return np.sqrt((diff**2).sum(axis=2).min(axis=1)).reshape(mask.shape)
+
+@pytest.mark.parametrize('max_shifts', [0, 8])
+@pytest.mark.parametrize('periodic', [True, False])
+def test_euclidean_distance_transform(periodic, max_shifts, monkeypatch):
+    # without shifts all lines are resolved by the lower envelope
+    monkeypatch.setattr(morphology, '_MAX_SHIFTS', max_shifts)
+    rng = np.random.default_rng(6)
+    mask = rng.random((7, 8, 9)) < 0.9
+    distance = morphology.euclidean_distance_transform(mask, periodic)
+    assert np.allclose(distance, brute_force_distance(mask, periodic))
+    assert np.all(distance[~mask] == 0)
+    assert np.all(np.isinf(morphology.euclidean_distance_transform(np.ones((3, 3, 3), dtype=bool))))
+    
+def test_distance_transform_file(tmp_path):
+    rng = np.random.default_rng(7)
+    codes = (rng.random((9, 6, 7)) < 0.8).astype(np.int32) * 100001
+    voxels.VoxelGrid(codes).to_val_file(tmp_path / 'voxels.val')
+    
+    distance = morphology.distance_transform_file(tmp_path / 'voxels.val', 1, 
+                                                  tmp_path / 'distance.npy', slab_size=2)
+    assert np.allclose(distance, brute_force_distance(codes > 0, False))
+    assert np.array_equal(np.load(tmp_path / 'distance.npy'), distance)
+    
+@pytest.mark.parametrize('periodic', [True, False])
+def test_local_thickness(periodic):
+    # plate of 3 voxels and a bar of 1x2 voxels
+    mask = np.zeros((12, 10, 10), dtype=bool)
+    mask[1:4, 1:9, 1:9] = True
+    mask[6:8, 4, 2:8] = True
+    distance = morphology.euclidean_distance_transform(mask, periodic)
+    
+    thickness = morphology.local_thickness(distance, periodic=periodic)
+    assert np.all(thickness[~mask] == 0)
+    assert np.all(thickness[1:4, 3:7, 3:7] == 3)
+    assert np.all(thickness[6:8, 4, 2:8] == 1)
+    
+    chunked = morphology.local_thickness(distance, periodic=periodic, chunk_size=2)
+    assert np.array_equal(chunked, thickness)
+    
+    with pytest.raises(ValueError):
+        morphology.local_thickness(np.full((3, 3, 3), np.inf))
+        
+@pytest.mark.parametrize('periodic', [True, False])
+def test_local_thickness_spheres(periodic):
+    # overlapping spheres spread over several tiles of the dilations
+    rng = np.random.default_rng(5)
+    coords = np.indices((40, 36, 34))
+    mask = np.zeros((40, 36, 34), dtype=bool)
+    for center, radius in zip(rng.integers(0, 34, (8, 3)), rng.uniform(2, 7, 8)):
+        mask |= ((coords - center[:, None, None, None])**2).sum(axis=0) < radius**2
+    distance = morphology.euclidean_distance_transform(mask, periodic)
+    
+    # openings with brute force dilations of the centers, which stay 
+    # within the phase
+    expected = np.zeros(mask.shape)
+    points = np.argwhere(mask).astype(np.int16)
+    for radius in range(1, int(distance.max()) + 1):
+        opening = np.zeros(len(points), dtype=bool)
+        centers = np.argwhere(distance >= radius).astype(np.int16)
+        for start in range(0, len(centers), 32):
+            diff = np.abs(points[:, None, :] - centers[None, start:start + 32])
+            if periodic:
+                diff = np.minimum(diff, np.array(mask.shape, dtype=np.int16) - diff)
+            opening |= np.any((diff.astype(np.int32)**2).sum(axis=2) < radius**2, axis=1)
+        expected[tuple(points[opening].T)] = 2 * radius - 1
+    
+    thickness = morphology.local_thickness(distance, periodic=periodic)
+    assert np.array_equal(thickness, expected)
+    assert np.array_equal(morphology.local_thickness(distance, periodic=periodic, chunk_size=7), expected)
+    
+def test_pore_size_distribution():
+    # two spherical pores with radius 2 and 4 voxels
+    coords = np.indices((20, 20, 20))
+    labels = np.ones((20, 20, 20), dtype=int)
+    labels[((coords - 5)**2).sum(axis=0) < 4] = 0
+    labels[((coords - 13)**2).sum(axis=0) < 16] = 0
+    grid = voxels.VoxelGrid(labels * 100000, voxel_size=0.5)
+    
+    res = morphology.pore_size_distribution(grid)
+    assert res['diameters_um'] == [1.5, 3.5]
+    small = np.count_nonzero(((coords - 5)**2).sum(axis=0) < 4)
+    large = np.count_nonzero(((coords - 13)**2).sum(axis=0) < 16)
+    assert res['volume_fraction'] == pytest.approx([small / (small + large), large / (small + large)])
+    assert res['cumulative_volume_fraction'][0] == pytest.approx(1.0)
+    assert res['mean_diameter_um'] == pytest.approx((1.5 * small + 3.5 * large) / (small + large))
+    
+    res = morphology.pore_size_distribution(grid, phase=1)
+    assert sum(res['volume_fraction']) == pytest.approx(1.0)
+
+def test_mean_intercept_lengths():
+    # layers of thickness 4 along z, lines along z cross one layer per 8 voxels,
+    # lines along x are either completely inside or outside of the layers
+    labels = np.zeros((16, 16, 16), dtype=int)
+    labels[:, :, :4] = 1
+    labels[:, :, 8:12] = 1
+    
+    grid = voxels.VoxelGrid.from_labels(labels)
+    
+    directions, mil = morphology.mean_intercept_lengths(grid, [[0, 0, 1], [1, 0, 0], [0, 1, 1]])
+    assert set(mil.keys()) == {1}
+    assert mil[1][0] == pytest.approx(4.0)
+    assert mil[1][1] == pytest.approx(16.0)
+    # diagonal lines starting inside a layer (6 of 16) cut it into two intercepts
+    assert mil[1][2] == pytest.approx(16 * 8 * np.sqrt(2) / (10 * 2 + 6 * 3))
+    
+    directions, mil = morphology.mean_intercept_lengths(grid, 16, include_phase_0=True)
+    assert directions.shape == (16, 3)
+    assert np.allclose(np.linalg.norm(directions, axis=1), 1.0)
+    assert set(mil.keys()) == {0, 1}
+    
+def test_anisotropy_analysis():
+    x, y, z = np.meshgrid(*[np.arange(40) - 19.5] * 3, indexing='ij')
+    ball = voxels.VoxelGrid.from_labels((x**2 + y**2 + z**2 < 12**2).astype(int))
+    ellipsoid = voxels.VoxelGrid.from_labels(((x / 16)**2 + (y / 6)**2 + (z / 6)**2 < 1).astype(int))
+    
+    res = morphology.anisotropy_analysis(ball, periodic=False)
+    assert res[1]['mil_degree_of_anisotropy'] == pytest.approx(1.0, abs=0.05)
+    assert res[1]['fabric_eigenvalues'] == pytest.approx([1 / 3] * 3, abs=0.01)
+    
+    res = morphology.anisotropy_analysis(ellipsoid, periodic=False)
+    assert res[1]['mil_degree_of_anisotropy'] > 1.5
+    assert abs(res[1]['mil_eigenvectors'][0][0]) == pytest.approx(1.0, abs=0.01)
+    assert abs(res[1]['fabric_eigenvectors'][2][0]) == pytest.approx(1.0, abs=0.01)
+    assert sum(res[1]['fabric_eigenvalues']) == pytest.approx(1.0)
+    
+def test_anisotropy_analysis_rve():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    res = morphology.anisotropy_analysis(grid, directions=64)
+    assert set(res.keys()) == {1, 7}
+    for phase, info in res.items():
+        assert len(info['mil_eigenvalues_um']) == 3
+        assert info['mil_eigenvalues_um'] == sorted(info['mil_eigenvalues_um'], reverse=True)
+        assert info['mil_degree_of_anisotropy'] >= 1.0
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the native sphere packings
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import packing, voxels, voxel_analysis
+
+
+def test_sample_radii():
+    rng = np.random.default_rng(0)
+    radii = packing.sample_radii(20000, 3.0, 1.0, 'gauss', rng)
+    assert np.all(radii > 0)
+    assert np.mean(radii) == pytest.approx(3.0, abs=0.05)
+    
+    radii = packing.sample_radii(20000, 3.0, 1.0, 'log_normal', rng)
+    assert np.mean(radii) == pytest.approx(3.0, abs=0.05)
+    assert np.std(radii) == pytest.approx(1.0, abs=0.05)
+    
+    assert np.all(packing.sample_radii(5, 3.0, rng=rng) == 3.0)
+    with pytest.raises(ValueError):
+        packing.sample_radii(5, 3.0, 1.0, 'uniform', rng)
+    with pytest.raises(ValueError):
+        packing.sample_radii(5, -3.0, rng=rng)
+        
+def test_overlaps():
+    spheres = packing.SpherePacking([[1, 5, 5], [9, 5, 5], [5, 5, 5]], [1.5, 1.5, 1.0], 10)
+    assert spheres.overlaps().tolist() == [[0, 1]]
+    
+    spheres.periodic = False
+    assert len(spheres.overlaps()) == 0
+    
+def test_rsa_number_of_spheres():
+    spheres = packing.random_sequential_addition(rve_dims=32, radius_um=2.0, number_of_spheres=300, seed=1)
+    
+    assert len(spheres) == 300
+    assert np.all(spheres.radii == 2.0)
+    assert len(spheres.overlaps()) == 0
+    assert np.all((spheres.centers >= 0) & (spheres.centers < 32))
+    
+    # the seed makes the packing reproducible
+    again = packing.random_sequential_addition(rve_dims=32, radius_um=2.0, number_of_spheres=300, seed=1)
+    assert np.array_equal(spheres.centers, again.centers)
+    
+@pytest.mark.parametrize('periodic', [True, False])
+def test_rsa_volume_fraction(periodic):
+    spheres = packing.random_sequential_addition(rve_dims=(40, 30, 20), radius_um=3.0, radius_std_um=1.0, 
+                                                 distribution='log_normal', volume_fraction=0.25, 
+                                                 periodic=periodic, seed=2)
+    
+    # the last sphere may exceed the target
+    largest = 4.0 / 3.0 * np.pi * spheres.radii.max()**3 / (40 * 30 * 20)
+    assert 0.25 <= spheres.volume_fraction < 0.25 + largest
+    assert len(spheres.overlaps()) == 0
+    # only the volume inside of the RVE counts
+    vol_frac = voxel_analysis.volume_fractions(spheres.to_voxel_grid())
+    assert vol_frac[1] == pytest.approx(spheres.volume_fraction, abs=0.01)
+    if periodic:
+        # the largest spheres are inserted first
+        assert np.all(np.diff(spheres.radii) <= 0)
+    
+    with pytest.raises(ValueError):
+        packing.random_sequential_addition(rve_dims=32)
+    
+def test_rsa_jammed():
+    spheres = packing.random_sequential_addition(rve_dims=24, radius_um=1.5, volume_fraction=1.0, seed=3)
+    
+    # saturated RSA of monodisperse spheres jams at 38 %
+    assert 0.36 < spheres.volume_fraction < 0.40
+    assert len(spheres.overlaps()) == 0
+    
+def test_rsa_jammed_polydisperse(monkeypatch):
+    radii = []
+    build = packing._FreeSpace.build
+    def counting_build(self, radius, centers, all_radii):
+        radii.append(radius)
+        build(self, radius, centers, all_radii)
+    monkeypatch.setattr(packing._FreeSpace, 'build', counting_build)
+    spheres = packing.random_sequential_addition(rve_dims=32, radius_um=1.5, radius_std_um=0.3,
+                                                 volume_fraction=1.0, seed=0)
+    
+    # polydisperse spheres pack denser than monodisperse ones
+    assert 0.39 < spheres.volume_fraction < 0.46
+    assert len(spheres.overlaps()) == 0
+    # the free space is not rebuilt for every new radius close to jamming
+    assert len(radii) < 20 < len(spheres)
+    
+def test_to_voxel_grid(tmpdir):
+    first = packing.random_sequential_addition(rve_dims=32, radius_um=4.0, number_of_spheres=10, seed=4)
+    both = packing.random_sequential_addition(radius_um=2.0, number_of_spheres=20, phase=2, 
+                                              packing=first, seed=5)
+    assert len(both) == 30
+    assert len(both.overlaps()) == 0
+    
+    grid = both.to_voxel_grid()
+    assert grid.dims == (32, 32, 32)
+    assert set(np.unique(grid.voxels)) == {0} | set(both.codes.tolist())
+    assert both.codes[0] == 100001 and both.codes[10] == 200001
+    # the voxelized volume fraction matches the spheres
+    assert np.mean(grid.voxels > 0) == pytest.approx(both.volume_fraction, abs=0.01)
+    
+    # a sphere crossing the boundary continues on the opposite face
+    spheres = packing.SpherePacking([[0.5, 16, 16]], [3.0], 32)
+    grid = spheres.to_voxel_grid()
+    assert grid.voxels[0, 16, 16] == grid.voxels[31, 16, 16] == 100001
+    spheres.periodic = False
+    assert spheres.to_voxel_grid().voxels[31, 16, 16] == 0
+    
+    out_file = pathlib.Path(tmpdir, 'spheres.val')
+    both.to_voxel_grid().to_val_file(out_file)
+    assert np.array_equal(voxels.load_voxels(out_file).voxels, both.to_voxel_grid().voxels)
+    
+def test_lubachevsky_stillinger():
+    spheres = packing.lubachevsky_stillinger(rve_dims=16, radius_um=2.0, volume_fraction=0.55, seed=6)
+    
+    # denser than random sequential addition can get
+    assert spheres.volume_fraction == pytest.approx(0.55)
+    assert len(spheres.overlaps()) == 0
+    assert np.all((spheres.centers >= 0) & (spheres.centers < 16))
+    assert spheres.periodic
+    
+    grid = spheres.to_voxel_grid()
+    assert np.mean(grid.voxels > 0) == pytest.approx(0.55, abs=0.03)
+    
+def test_lubachevsky_stillinger_options():
+    with pytest.warns(RuntimeWarning, match="stopped after 100 collisions"):
+        spheres = packing.lubachevsky_stillinger(rve_dims=(24, 16, 16), radius_um=2.0, radius_std_um=0.5, 
+                                                 number_of_spheres=40, volume_fraction=0.6, 
+                                                 max_collisions=100, seed=7)
+    # stopped before reaching the volume fraction
+    assert len(spheres) == 40
+    assert spheres.volume_fraction < 0.6
+    assert len(spheres.overlaps()) == 0
+    
+    with pytest.raises(ValueError):
+        packing.lubachevsky_stillinger(rve_dims=16, radius_um=5.0, number_of_spheres=2)
+        
+def test_lubachevsky_stillinger_jammed():
+    # monodisperse spheres jam below 64 %
+    with pytest.warns(RuntimeWarning, match="jammed"):
+        spheres = packing.lubachevsky_stillinger(rve_dims=12, radius_um=1.5, volume_fraction=0.77, seed=6)
+    assert 0.58 < spheres.volume_fraction < 0.65
+    assert len(spheres.overlaps()) == 0
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the statistical reconstruction of RVEs
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import reconstruction, packing, voxels, voxel_analysis
+
+
+def test_directional_correlations():
+    rng = np.random.default_rng(0)
+    labels = rng.choice([0, 1, 3], size=(10, 12, 8), p=[0.5, 0.3, 0.2])
+    correlations = reconstruction.directional_correlations(voxels.VoxelGrid.from_labels(labels), max_distance=4)
+    assert sorted(correlations) == [0, 1, 3]
+    
+    for phase, correlation in correlations.items():
+        indicator = labels == phase
+        expected = [[np.mean(indicator & np.roll(indicator, -r, axis)) for r in range(5)] for axis in range(3)]
+        assert np.allclose(correlation, expected)
+        
+    with pytest.raises(ValueError):
+        reconstruction.directional_correlations(labels * voxels.PHASE_FACTOR, max_distance=5)
+        
+def test_incremental_correlations():
+    rng = np.random.default_rng(1)
+    labels = rng.choice([0, 1, 3], size=(10, 12, 8), p=[0.5, 0.3, 0.2])
+    # plain arrays are GeoVal voxel codes
+    target = reconstruction.directional_correlations(labels * voxels.PHASE_FACTOR, [1, 3], 4)
+    rec = reconstruction.AnnealingReconstruction(target, (10, 12, 8), seed=2)
+    assert rec.phases == [1, 3, 0]
+    
+    rec.anneal(max_steps=20000, steps_per_temperature=2000)
+    assert rec.history[-1]['step'] == 20000
+    # the correlations updated along the lines through the swapped voxels
+    # match the correlations of the whole RVE
+    correlations = reconstruction.directional_correlations(rec.to_voxel_grid(), rec.phases, 4)
+    for phase in rec.phases:
+        assert np.allclose(rec.correlations[phase], correlations[phase])
+    energy = sum(np.sum((correlations[p][:, 1:] - target[p][:, 1:])**2) for p in (1, 3))
+    assert rec.energy == pytest.approx(energy)
+    # swaps do not change the volume fractions
+    assert np.count_nonzero(rec.labels == 1) == np.count_nonzero(labels == 1)
+    
+def test_reconstruct(tmpdir):
+    measured = packing.random_sequential_addition(rve_dims=16, radius_um=2.0, volume_fraction=0.25, 
+                                                  seed=1).to_voxel_grid()
+    target = reconstruction.directional_correlations(measured, [1])
+    start = reconstruction.AnnealingReconstruction(target, (16, 16, 16), seed=3).energy
+    
+    grid = reconstruction.reconstruct(measured, rve_dims=16, seed=3)
+    correlations = reconstruction.directional_correlations(grid, [1])
+    assert np.sum((correlations[1][:, 1:] - target[1][:, 1:])**2) < 1e-3 * start
+    assert voxel_analysis.volume_fractions(grid)[1] == pytest.approx(measured.phases.astype(bool).mean())
+    
+    grid.to_val_file(pathlib.Path(tmpdir) / 'reconstructed.val')
+    assert np.array_equal(voxels.VoxelGrid.from_val_file(pathlib.Path(tmpdir) / 'reconstructed.val').phases, 
+                          grid.phases)
+    
+def test_invalid_targets():
+    with pytest.raises(ValueError):
+        # the volume fractions exceed 1
+        reconstruction.AnnealingReconstruction({1: [0.6, 0.4], 2: [0.6, 0.4]}, (8, 8, 8))
+    with pytest.raises(ValueError):
+        reconstruction.AnnealingReconstruction({1: np.full(8, 0.3)}, (8, 8, 8))
+    with pytest.raises(ValueError):
+        reconstruction.AnnealingReconstruction({1: [0.3, 0.1]}, (8, 8, 8), initial=np.full((8, 8, 8), 200000))
+    rec = reconstruction.AnnealingReconstruction({1: [0.3, 0.1]}, (8, 8, 8))
+    with pytest.raises(ValueError):
+        rec.anneal(cooling=1.5)
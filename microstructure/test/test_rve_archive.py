@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the chunked RVE archive format
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+from pprint import pformat
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import voxels
+from MPaut.rve_archive import RVEArchive
+
+
+VOXEL_FILE = pathlib.Path('resources', 'voxels.val')
+
+
+def test_archive_store_and_load(tmpdir):
+    archive_file = pathlib.Path(tmpdir, 'rves.rvez')
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    metadata = {'seed': 42, 
+                'volume_fractions': {0: 0.6, 7: 0.4},
+                'interface_fractions': {(0, 7): 0.5}}
+    
+    with RVEArchive(archive_file, mode='w') as archive:
+        archive.add('rve_0', grid, metadata=metadata, chunk_shape=(10, 16, 32))
+        archive.add('rve_1', voxels.VoxelGrid(grid.voxels[::-1], voxel_size=2.0))
+        with pytest.raises(ValueError):
+            archive.add('rve_0', grid)
+            
+    with RVEArchive(archive_file) as archive:
+        assert archive.names() == ['rve_0', 'rve_1']
+        assert archive.metadata('rve_0') == metadata
+        assert archive.metadata('rve_1') == {}
+        
+        loaded = archive.load('rve_0')
+        assert loaded.voxel_size == 1.0
+        assert np.array_equal(loaded.voxels, grid.voxels)
+        loaded = archive.load('rve_1')
+        assert loaded.voxel_size == 2.0
+        assert np.array_equal(loaded.voxels, grid.voxels[::-1])
+        
+        with pytest.raises(KeyError):
+            archive.load('rve_2')
+        with pytest.raises(ValueError):
+            archive.add('rve_2', grid)
+            
+def test_archive_numpy_metadata(tmpdir):
+    archive_file = pathlib.Path(tmpdir, 'rves.rvez')
+    grid = voxels.VoxelGrid(np.zeros((4, 4, 4), dtype=np.int32))
+    metadata = {'seed': np.int64(3), 
+                'volume_fractions': {np.int64(1): np.float64(0.25)},
+                'radii': np.array([1.5, 2.0])}
+    
+    with RVEArchive(archive_file, mode='w') as archive:
+        archive.add('rve_0', grid, metadata=metadata)
+        # metadata which cannot be read back is rejected when it is added
+        with pytest.raises(ValueError):
+            archive.add('rve_1', grid, metadata={'grid': grid})
+            
+    with RVEArchive(archive_file) as archive:
+        assert archive.names() == ['rve_0']
+        assert archive.metadata('rve_0') == {'seed': 3, 'volume_fractions': {1: 0.25}, 'radii': [1.5, 2.0]}
+        
+def test_archive_load_block(tmpdir):
+    archive_file = pathlib.Path(tmpdir, 'rves.rvez')
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    with RVEArchive(archive_file, mode='w') as archive:
+        archive.add('rve', grid, chunk_shape=(7, 8, 9))
+        
+    with RVEArchive(archive_file) as archive:
+        for index in [(slice(3, 17), slice(0, 8), slice(5, 32)),
+                      (slice(None), slice(31, None), slice(-4, None)),
+                      (slice(8, 8), slice(None), slice(None))]:
+            assert np.array_equal(archive.load_block('rve', index), grid.voxels[index])
+            
+        with pytest.raises(ValueError):
+            archive.load_block('rve', (slice(None, None, 2), slice(None), slice(None)))
+            
+def test_archive_append(tmpdir):
+    archive_file = pathlib.Path(tmpdir, 'rves.rvez')
+    for j in range(3):
+        # create RVE folder like the RVE generation examples
+        folder = pathlib.Path(tmpdir, f'rve_{j}')
+        folder.mkdir()
+        (folder / 'voxels.val').write_bytes(VOXEL_FILE.read_bytes())
+        (folder / 'info.txt').write_text(pformat({'seed': j, 'porosity': 0.1 * j}))
+        
+        with RVEArchive(archive_file, mode='a') as archive:
+            archive.add_rve_folder(folder)
+            
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    with RVEArchive(archive_file) as archive:
+        assert len(archive) == 3
+        assert 'rve_2' in archive
+        for j, name in enumerate(archive):
+            assert archive.metadata(name) == {'seed': j, 'porosity': 0.1 * j}
+            assert archive.header(name)['dims'] == (32, 32, 32)
+            assert np.array_equal(archive.load(name).voxels, grid.voxels)
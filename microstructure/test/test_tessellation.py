@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the native Voronoi and power tessellations
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import tessellation, packing, voxels
+
+
+def brute_force(seeds, dims, weights, periodic):
+    points = np.stack(np.unravel_index(np.arange(np.prod(dims)), dims), axis=-1) + 0.5
+    d = points[:, None, :] - seeds
+    if periodic:
+        d -= np.array(dims) * np.round(d / np.array(dims))
+    return np.argmin(np.sum(d**2, axis=-1) - weights, axis=-1).reshape(dims)
+
+@pytest.mark.parametrize('dims, number, periodic, weighted', 
+                         [((24, 24, 24), 40, True, False), 
+                          ((20, 14, 17), 25, False, True),
+                          ((16, 16, 16), 2, True, True)])
+def test_nearest_seeds(dims, number, periodic, weighted):
+    rng = np.random.default_rng(0)
+    seeds = rng.random((number, 3)) * dims
+    weights = rng.random(number) * 9.0 if weighted else np.zeros(number)
+    
+    labels = tessellation.nearest_seeds(seeds, dims, weights=weights, periodic=periodic, chunk_size=2**16)
+    assert labels.shape == dims
+    assert np.array_equal(labels, brute_force(seeds, dims, weights, periodic))
+    
+def test_assign_phases():
+    rng = np.random.default_rng(1)
+    volumes = rng.random(500)
+    phases = tessellation.assign_phases(volumes, {4: 0.16, 10: 0.84}, rng)
+    
+    assert set(phases.tolist()) == {4, 10}
+    assert np.sum(volumes[phases == 4]) / np.sum(volumes) == pytest.approx(0.16, abs=volumes.max() / np.sum(volumes))
+    
+    with pytest.raises(ValueError):
+        tessellation.assign_phases(volumes, {4: 0.0})
+    
+def test_voronoi_tessellation(tmpdir):
+    grid = tessellation.voronoi_tessellation(rve_dims=32, number_of_grains=60, 
+                                             phase_fractions={4: 0.3, 10: 0.7}, seed=2)
+    codes = np.unique(grid.voxels)
+    phases = codes // voxels.PHASE_FACTOR
+    
+    assert grid.dims == (32, 32, 32)
+    assert len(codes) == 60
+    assert set(phases.tolist()) == {4, 10}
+    # the grains of every phase are numbered from 1
+    for phase in (4, 10):
+        numbers = np.sort(codes[phases == phase] % voxels.PHASE_FACTOR)
+        assert np.array_equal(numbers, np.arange(1, len(numbers) + 1))
+    assert np.mean(grid.voxels // voxels.PHASE_FACTOR == 4) == pytest.approx(0.3, abs=0.05)
+    
+    # the same seed gives the same RVE
+    again = tessellation.voronoi_tessellation(rve_dims=32, number_of_grains=60, 
+                                              phase_fractions={4: 0.3, 10: 0.7}, seed=2)
+    assert np.array_equal(grid.voxels, again.voxels)
+    
+    out_file = pathlib.Path(tmpdir, 'voronoi.val')
+    grid.to_val_file(out_file)
+    assert np.array_equal(voxels.load_voxels(out_file).voxels, grid.voxels)
+    
+def test_periodic_tessellation():
+    # a single seed at the corner covers the whole periodic RVE
+    seeds = [[0.5, 0.5, 0.5], [8.0, 8.0, 8.0]]
+    grid = tessellation.voronoi_tessellation(rve_dims=16, seeds=seeds, seed=3)
+    assert grid.voxels[0, 0, 0] == grid.voxels[15, 15, 15] == grid.voxels[0, 15, 0]
+    
+    grid = tessellation.voronoi_tessellation(rve_dims=16, seeds=seeds, periodic=False, seed=3)
+    assert grid.voxels[0, 0, 0] != grid.voxels[15, 15, 15]
+    
+def test_laguerre_tessellation_of_packing():
+    spheres = packing.random_sequential_addition(rve_dims=32, radius_um=3.0, radius_std_um=1.0, 
+                                                 volume_fraction=0.3, seed=4)
+    grid = tessellation.voronoi_tessellation(rve_dims=32, seeds=spheres.centers, 
+                                             weights=spheres.radii**2, seed=4)
+    
+    # every sphere lies inside of its power cell
+    labels = tessellation.nearest_seeds(spheres.centers, (32, 32, 32), weights=spheres.radii**2)
+    inside = spheres.to_voxel_grid().voxels
+    for i, code in enumerate(spheres.codes):
+        assert np.all(labels[inside == code] == i)
+    assert len(np.unique(grid.voxels)) == len(spheres)
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for the native voxel analysis
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import voxels
+from MPaut import voxel_analysis
+
+
+VOXEL_FILE = pathlib.Path('resources', 'voxels.val')
+
+
+@pytest.fixture()
+def grid():
+    return voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+
+
+def test_volume_fractions(grid):
+    phases = grid.voxels // 100000
+    
+    vol_fracs = voxel_analysis.volume_fractions(grid)
+    assert set(vol_fracs.keys()) == {1, 7}
+    for phase, frac in vol_fracs.items():
+        assert frac == pytest.approx(np.mean(phases == phase))
+        
+    vol_fracs = voxel_analysis.volume_fractions(grid.voxels, include_phase_0=True)
+    assert set(vol_fracs.keys()) == {0, 1, 7}
+    assert sum(vol_fracs.values()) == pytest.approx(1.0)
+    
+def test_phase_counts(grid):
+    counts = voxel_analysis.phase_counts(grid, chunk_size=3)
+    assert counts.sum() == grid.voxels.size
+    assert np.array_equal(counts, np.bincount((grid.voxels // 100000).ravel()))
+    
+def test_chord_length_analysis_line():
+    # single line along z: object 1 (length 2), object 2 (length 3), 
+    # phase 2 (length 1)
+    codes = np.array([100001, 100001, 100002, 100002, 100002, 200000]).reshape(1, 1, 6)
+    res = voxel_analysis.chord_length_analysis(codes)
+    
+    chords = res['phase_chord_lengths']
+    # chords along x and y have length 1 for every voxel
+    assert chords[1]['particle_count'] == 2 + 5 + 5
+    assert chords[2]['particle_count'] == 3
+    assert chords[1]['volume_fraction'] == pytest.approx(5 / 6)
+    assert chords[1]['mean_chord_length'] == pytest.approx(15 / 12 * 1e-6)
+    assert res['chord_length_histograms'][1] == [0, 10, 1, 1]
+    assert res['chord_length_histograms'][2] == [0, 3]
+    assert res['directional_mean_chord_lengths'][1] == pytest.approx((1e-6, 1e-6, 2.5e-6))
+    
+    # two interfaces: 1-1 (between objects) and 1-2
+    assert res['interface_fractions'] == {(1, 1): 0.5, (1, 2): 0.5}
+    assert res['interface_per_volume_1/um'] == pytest.approx(2 * 2 / 18)
+    
+def test_chord_length_analysis_periodic():
+    codes = np.array([100001, 100001, 200000, 200000, 100001]).reshape(1, 1, 5)
+    res = voxel_analysis.chord_length_analysis(codes, periodic=True)
+    # chords along x and y have length 1 for every voxel
+    assert res['chord_length_histograms'][1] == [0, 6, 0, 1]
+    assert res['chord_length_histograms'][2] == [0, 4, 1]
+    assert res['interface_fractions'] == {(1, 2): 1.0}
+    
+    res = voxel_analysis.chord_length_analysis(codes, periodic=False)
+    assert res['chord_length_histograms'][1] == [0, 7, 1]
+    
+def test_chord_length_analysis_rve(grid):
+    res = voxel_analysis.chord_length_analysis(grid)
+    vol_fracs = voxel_analysis.volume_fractions(grid)
+    assert set(res['phase_chord_lengths'].keys()) == set(vol_fracs.keys())
+    for phase, info in res['phase_chord_lengths'].items():
+        assert info['volume_fraction'] == pytest.approx(vol_fracs[phase])
+        hist = np.array(res['chord_length_histograms'][phase])
+        assert hist.sum() == info['particle_count']
+        
+    res_0 = voxel_analysis.chord_length_analysis(grid, include_phase_0=True)
+    assert sum(res_0['interface_fractions'].values()) == pytest.approx(1.0)
+    
+def test_label_regions():
+    # two objects of phase 1 touching each other and a diagonal pair of 
+    # voxels of phase 2
+    codes = np.zeros((3, 3, 3), dtype=np.int32)
+    codes[0, 0, :] = 100001
+    codes[1, 0, :] = 100002
+    codes[2, 2, 0] = 200001
+    codes[1, 1, 1] = 200001
+    
+    labels, region_phases = voxel_analysis.label_regions(codes)
+    assert labels.shape == codes.shape
+    # phase 0 is a single region, the voxels of phase 2 are not connected
+    assert sorted(region_phases.tolist()) == [0, 1, 1, 2, 2]
+    assert len(np.unique(labels[codes == 100001])) == 1
+    assert labels[0, 0, 0] != labels[1, 0, 0]
+    
+    labels, region_phases = voxel_analysis.label_regions(codes, by='phase')
+    assert sorted(region_phases.tolist()) == [0, 1, 2, 2]
+    
+    # corners are connected with 26-connectivity
+    labels, region_phases = voxel_analysis.label_regions(codes, connectivity=26)
+    assert sorted(region_phases.tolist()) == [0, 1, 1, 2]
+    labels, region_phases = voxel_analysis.label_regions(codes, connectivity=18)
+    assert sorted(region_phases.tolist()) == [0, 1, 1, 2, 2]
+    
+    with pytest.raises(ValueError):
+        voxel_analysis.label_regions(codes, connectivity=8)
+    with pytest.raises(ValueError):
+        voxel_analysis.label_regions(codes, by='grain')
+        
+def test_label_regions_periodic():
+    codes = np.zeros((4, 4, 4), dtype=np.int32)
+    codes[0, 1, 1] = 100001
+    codes[3, 1, 1] = 100001
+    
+    labels, region_phases = voxel_analysis.label_regions(codes)
+    assert sorted(region_phases.tolist()) == [0, 1, 1]
+    labels, region_phases = voxel_analysis.label_regions(codes, periodic=True)
+    assert sorted(region_phases.tolist()) == [0, 1]
+    
+def test_region_analysis():
+    # cube of 2x2x2 voxels and a single voxel of phase 1 in a matrix of phase 2
+    codes = np.full((6, 6, 6), 200001, dtype=np.int32)
+    codes[1:3, 1:3, 1:3] = 100001
+    codes[4, 4, 4] = 100002
+    
+    res = voxel_analysis.region_analysis(voxels.VoxelGrid(codes, voxel_size=0.5))
+    assert set(res.keys()) == {1, 2}
+    info = res[1]
+    assert info['region_count'] == 2
+    assert info['region_volume_min'] == 1
+    assert info['region_volume_max'] == 8
+    # volume weighted statistics
+    assert info['region_volume'] == pytest.approx((8 * 8 + 1 * 1) / 9)
+    assert info['region_volume_um'] == pytest.approx((8 * 8 + 1 * 1) / 9 * 0.125)
+    assert info['neighbor_count'] == 1
+    assert info['surf_volume_ratio'] == pytest.approx(2 / 3 * 24 * 0.25 / 1.0 * 8 / 9 
+                                                      + 2 / 3 * 6 * 0.25 / 0.125 / 9)
+    assert res[2]['region_count'] == 1
+    assert res[2]['neighbor_count'] == 2
+    
+def test_region_analysis_rve(grid):
+    res = voxel_analysis.region_analysis(grid, include_phase_0=True)
+    vol_fracs = voxel_analysis.volume_fractions(grid, include_phase_0=True)
+    assert set(res.keys()) == set(vol_fracs.keys())
+    for phase, info in res.items():
+        assert info['region_volume_min'] <= info['region_volume'] <= info['region_volume_max']
+    
+@pytest.mark.parametrize('periodic', [True, False])
+def test_local_volume_statistics(periodic):
+    rng = np.random.default_rng(4)
+    phases = rng.integers(0, 3, (7, 8, 9))
+    
+    res = voxel_analysis.local_volume_statistics(phases * 100000, window_sizes=(1, 3), 
+                                                 periodic=periodic)
+    assert res['window_sizes_um'] == [1.0, 3.0]
+    assert set(res['variance'].keys()) == {0, 1, 2}
+    # windows of a single voxel
+    fraction = np.mean(phases == 1)
+    assert res['mean'][1][0] == pytest.approx(fraction)
+    assert res['variance'][1][0] == pytest.approx(fraction * (1 - fraction))
+    
+    # brute force local volume fractions
+    if periodic:
+        windows = [np.roll(phases, (-i, -j, -k), axis=(0, 1, 2))[:3, :3, :3] 
+                   for i in range(7) for j in range(8) for k in range(9)]
+    else:
+        windows = [phases[i:i + 3, j:j + 3, k:k + 3] 
+                   for i in range(5) for j in range(6) for k in range(7)]
+    local = [np.mean(window == 1) for window in windows]
+    assert res['mean'][1][1] == pytest.approx(np.mean(local))
+    assert res['variance'][1][1] == pytest.approx(np.var(local))
+    assert res['min'][1][1] == pytest.approx(np.min(local))
+    assert res['max'][1][1] == pytest.approx(np.max(local))
+    
+    with pytest.raises(ValueError):
+        voxel_analysis.local_volume_statistics(phases, window_sizes=(8,))
+        
+def test_local_volume_statistics_large_periodic_windows():
+    rng = np.random.default_rng(5)
+    phases = rng.integers(0, 2, (4, 5, 6))
+    
+    # periodic windows may be larger than the RVE
+    res = voxel_analysis.local_volume_statistics(phases * 100000, window_sizes=(7,), periodic=True)
+    extended = np.pad(phases, [(0, 6)] * 3, mode='wrap')
+    local = [np.mean(extended[i:i + 7, j:j + 7, k:k + 7] == 1) 
+             for i in range(4) for j in range(5) for k in range(6)]
+    assert res['mean'][1][0] == pytest.approx(np.mean(local))
+    assert res['variance'][1][0] == pytest.approx(np.var(local))
+    assert res['min'][1][0] == pytest.approx(np.min(local))
+    assert res['max'][1][0] == pytest.approx(np.max(local))
+        
+def test_variance_analysis(grid):
+    for mode in ['unscaled', 'area_scaled', 'fully_scaled']:
+        res = voxel_analysis.variance_analysis(grid, mode, window_sizes=(2, 4))
+        assert set(res.keys()) == {f'variance_{mode}_2', f'variance_{mode}_4', 'porosity'}
+        assert set(res[f'variance_{mode}_2'].keys()) == {0, 1, 7}
+        assert 0.0 <= res['porosity']['min'] <= res['porosity']['max'] <= 1.0
+        
+    unscaled = voxel_analysis.variance_analysis(grid, window_sizes=(2,))
+    scaled = voxel_analysis.variance_analysis(grid, 'fully_scaled', window_sizes=(2,))
+    assert scaled['variance_fully_scaled_2'][1] == pytest.approx(8 * unscaled['variance_unscaled_2'][1])
+    
+    with pytest.raises(ValueError):
+        voxel_analysis.variance_analysis(grid, mode='no_such_mode')
+        
+def test_representative_volume_size():
+    # independent voxels: D^2(V) = p (1 - p) / V
+    rng = np.random.default_rng(5)
+    codes = (rng.random((48, 48, 48)) < 0.3) * 100000
+    size = voxel_analysis.representative_volume_size(codes, 1, relative_error=0.05)
+    expected = np.cbrt(4 * 0.3 * 0.7 / (0.05**2 * 0.3**2))
+    assert size == pytest.approx(expected, rel=0.1)
+
+def test_geodesic_distance():
+    mask = np.ones((11, 11, 11), dtype=bool)
+    sources = np.zeros_like(mask)
+    sources[5, 5, 5] = True
+    
+    distance = voxel_analysis.geodesic_distance(mask, sources, connectivity=6)
+    assert distance[10, 10, 10] == 15
+    distance = voxel_analysis.geodesic_distance(mask, sources, connectivity=26)
+    assert distance[10, 5, 5] == pytest.approx(5)
+    assert distance[10, 10, 10] == pytest.approx(np.sqrt(3) * 5, rel=0.05)
+    
+    # wall separating the source
+    mask[7] = False
+    distance = voxel_analysis.geodesic_distance(mask, sources)
+    assert np.all(np.isinf(distance[8:]))
+    assert np.all(np.isfinite(distance[:7]))
+    
+def test_percolation_analysis():
+    codes = np.full((10, 12, 8), 100001)
+    # straight channel along x and blocked channel along y
+    codes[:, 3, 3] = 200001
+    codes[4, 6:, 5] = 300001
+    codes[4, :5, 5] = 300001
+    # staircase channel along x
+    for i in range(10):
+        codes[i, 8 + i // 5, 1] = 400001
+    codes[4, 9, 1] = 400001
+        
+    result = voxel_analysis.percolation_analysis(codes)
+    assert set(result.keys()) == {1, 2, 3, 4}
+    assert result[1]['x']['percolates'] and result[1]['x']['percolating_fraction'] == 1.0
+    assert result[1]['x']['tortuosity'] > 1.0
+    assert result[2]['x']['tortuosity'] == 1.0
+    assert not result[2]['y']['percolates'] and not result[2]['z']['percolates']
+    assert result[2]['y']['tortuosity'] is None
+    assert not any(result[3][axis]['percolates'] for axis in 'xyz')
+    assert result[3]['y']['percolating_fraction'] == 0.0
+    assert result[4]['x']['tortuosity'] == pytest.approx(10 / 9)
+    
+    result = voxel_analysis.percolation_analysis(codes, phases=[4], connectivity=26, tortuosity=False)
+    assert list(result.keys()) == [4]
+    assert result[4]['x']['percolates'] and result[4]['x']['tortuosity'] is None
+    
+def test_percolation_analysis_rve(grid):
+    result = voxel_analysis.percolation_analysis(grid)
+    for phase, axes in result.items():
+        for axis in 'xyz':
+            info = axes[axis]
+            assert info['percolates'] == (info['percolating_fraction'] > 0)
+            if info['percolates']:
+                assert info['tortuosity'] >= 1.0
+
+def test_grain_adjacency_graph():
+    codes = np.full((4, 4, 4), 100001)
+    codes[2:] = 100002
+    codes[2:, 2:] = 200001
+    codes[:2, :, 3] = 5
+    
+    graph = voxel_analysis.grain_adjacency_graph(codes)
+    assert len(graph) == 4
+    assert graph.codes.tolist() == [5, 100001, 100002, 200001]
+    assert graph.phases.tolist() == [0, 1, 1, 2]
+    assert graph.volumes.tolist() == [8, 24, 16, 16]
+    assert graph.coordination_numbers.tolist() == [3, 3, 3, 3]
+    neighbors, faces = graph.neighbors(graph.index(100001))
+    assert neighbors.tolist() == [0, 2, 3]
+    assert faces.tolist() == [8, 6, 6]
+    edges, faces = graph.edges()
+    assert edges.tolist() == [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]]
+    assert faces.tolist() == [8, 2, 2, 6, 6, 8]
+    with pytest.raises(KeyError):
+        graph.index(300001)
+    
+    # periodic boundaries add the faces across the RVE
+    graph = voxel_analysis.grain_adjacency_graph(codes, periodic=True)
+    edges, faces = graph.edges()
+    assert faces.tolist() == [16, 4, 4, 12, 12, 16]
+    
+def test_grain_boundary_analysis():
+    codes = np.full((4, 4, 4), 100001)
+    codes[2:] = 100002
+    codes[2:, 2:] = 200001
+    codes[:2, :, 3] = 5
+    codes[3, 3] = 200002
+    grid = voxels.VoxelGrid(codes, voxel_size=2.0)
+    
+    res = voxel_analysis.grain_boundary_analysis(grid)
+    assert res['grain_boundary_area_um2'] == {(1, 1): 24.0, (1, 2): 56.0, (2, 2): 32.0}
+    assert res['grain_boundary_per_volume_1/um'][(1, 1)] == pytest.approx(24.0 / 512.0)
+    assert res['coordination_numbers'][1] == {'mean': 3.0, 'variance': 0.0, 'min': 3, 'max': 3}
+    assert res['coordination_numbers'][2]['min'] == 1
+    assert res['coordination_numbers'][2]['max'] == 4
+    # 6 faces between grains of phase 1, 14 faces with phase 2 and 10 with pores
+    assert res['contiguity'][1] == pytest.approx(12 / 36)
+    
+    res = voxel_analysis.grain_boundary_analysis(grid, include_phase_0=True)
+    assert res['grain_boundary_area_um2'][(0, 1)] == 40.0
+    assert set(res['contiguity'].keys()) == {0, 1, 2}
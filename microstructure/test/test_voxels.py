@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+ Unittests for reading and writing GeoVal voxel files
+"""
+import sys
+import pathlib
+import pytest
+import numpy as np
+
+sys.path.append("../src")   # this adds the mother folder  
+                         # "my_python_scripts_folder/" to the python path 
+                         # It will allow you to import your modules.
+                         # Adjust depending where your tests scripts location
+
+from MPaut import voxels
+
+
+VOXEL_FILE = pathlib.Path('resources', 'voxels.val')
+
+
+def test_load_voxel_file():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    
+    assert grid.dims == (32, 32, 32)
+    assert grid.voxel_size == 1.0
+    assert grid.codes is grid.voxels
+    
+    # compare with a straightforward parse of the text file
+    lines = VOXEL_FILE.read_text().splitlines()
+    assert grid.voxels[0, 0].tolist() == list(map(int, lines[1].split()))
+    assert grid.voxels[1, 2].tolist() == list(map(int, lines[1 + 33 + 2].split()))
+    
+def test_store_voxel_file_identical(tmpdir):
+    grid = voxels.load_voxels(VOXEL_FILE)
+    out_file = pathlib.Path(tmpdir, 'voxels.val')
+    grid.to_val_file(out_file)
+    
+    assert out_file.read_bytes() == VOXEL_FILE.read_bytes()
+    
+def test_store_voxel_file_non_cubic(tmpdir):
+    codes = np.arange(2 * 3 * 4).reshape(2, 3, 4) + 100000
+    grid = voxels.VoxelGrid(codes, voxel_size=0.5)
+    out_file = pathlib.Path(tmpdir, 'voxels.val')
+    grid.to_val_file(out_file)
+    
+    loaded = voxels.VoxelGrid.from_val_file(out_file)
+    assert loaded.dims == (2, 3, 4)
+    assert loaded.voxel_size == 0.5
+    assert np.array_equal(loaded.voxels, codes)
+    
+def test_load_invalid_voxel_file(tmpdir):
+    out_file = pathlib.Path(tmpdir, 'voxels.val')
+    out_file.write_text("2              2              2              1              \n0 0 0\n")
+    with pytest.raises(ValueError):
+        voxels.VoxelGrid.from_val_file(out_file)
+        
+    with pytest.raises(ValueError):
+        voxels.VoxelGrid(np.zeros((4, 4)))
+    
+def test_load_voxels_cache(tmpdir):
+    voxel_file = pathlib.Path(tmpdir, 'voxels.val')
+    voxel_file.write_bytes(VOXEL_FILE.read_bytes())
+    reference = voxels.VoxelGrid.from_val_file(voxel_file)
+    
+    # first load creates the sidecar cache
+    grid = voxels.load_voxels(voxel_file)
+    assert pathlib.Path(tmpdir, 'voxels.val.npy').exists()
+    assert pathlib.Path(tmpdir, 'voxels.val.json').exists()
+    assert isinstance(grid.voxels, np.memmap)
+    assert np.array_equal(grid.voxels, reference.voxels)
+    
+    # second load uses the cache
+    grid = voxels.load_voxels(voxel_file)
+    assert isinstance(grid.voxels, np.memmap)
+    assert grid.dims == reference.dims
+    assert grid.voxel_size == reference.voxel_size
+    assert np.array_equal(grid.voxels, reference.voxels)
+    
+def test_load_voxels_cache_invalidation(tmpdir):
+    voxel_file = pathlib.Path(tmpdir, 'voxels.val')
+    voxel_file.write_bytes(VOXEL_FILE.read_bytes())
+    voxels.load_voxels(voxel_file)
+    
+    # change the voxel file, the cache must not be used anymore
+    grid = voxels.VoxelGrid.from_val_file(voxel_file)
+    modified = voxels.VoxelGrid(grid.voxels + 100000, grid.voxel_size)
+    modified.to_val_file(voxel_file)
+    
+    grid = voxels.load_voxels(voxel_file)
+    assert np.array_equal(grid.voxels, modified.voxels)
+    
+    grid = voxels.load_voxels(voxel_file, cache=False)
+    assert not isinstance(grid.voxels, np.memmap)
+    
+def test_load_voxels_broken_cache(tmpdir, monkeypatch):
+    voxel_file = pathlib.Path(tmpdir, 'voxels.val')
+    voxel_file.write_bytes(VOXEL_FILE.read_bytes())
+    reference = voxels.load_voxels(voxel_file, mmap_mode=None)
+    
+    # a truncated sidecar is replaced by parsing the voxel file again
+    data_file = pathlib.Path(tmpdir, 'voxels.val.npy')
+    data_file.write_bytes(data_file.read_bytes()[:100])
+    grid = voxels.load_voxels(voxel_file)
+    assert np.array_equal(grid.voxels, reference.voxels)
+    
+    def fail(file, grid):
+        raise OSError("read-only file system")
+    monkeypatch.setattr(voxels, '_write_cache', fail)
+    data_file.unlink()
+    with pytest.warns(RuntimeWarning, match="read-only file system"):
+        grid = voxels.load_voxels(voxel_file)
+    assert np.array_equal(grid.voxels, reference.voxels)
+    
+def test_stream_slices():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    reader = voxels.VoxelStreamReader(VOXEL_FILE)
+    assert reader.dims == grid.dims
+    assert reader.voxel_size == grid.voxel_size
+    
+    slices = list(reader)
+    assert len(slices) == 32
+    assert np.array_equal(np.stack(slices), grid.voxels)
+    
+@pytest.mark.parametrize("slab_size, step", [(5, None), (4, 1), (6, 4), (32, None), (40, 7)])
+def test_stream_slabs(slab_size, step):
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    reader = voxels.VoxelStreamReader(VOXEL_FILE)
+    
+    covered = np.zeros(grid.dims[0], dtype=bool)
+    for start, slab in reader.iter_slabs(slab_size=slab_size, step=step):
+        assert len(slab) <= slab_size
+        assert np.array_equal(slab, grid.voxels[start:start + len(slab)])
+        covered[start:start + len(slab)] = True
+    assert covered.all()
+    
+    with pytest.raises(ValueError):
+        list(reader.iter_slabs(slab_size=2, step=3))
+    
+def test_decode_voxels():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    phases, objects = grid.decode()
+    
+    assert phases.dtype == np.uint8
+    assert objects.dtype == np.uint32
+    assert np.array_equal(phases, grid.voxels // 100000)
+    assert np.array_equal(objects, grid.voxels % 100000)
+    assert np.unique(phases).tolist() == [0, 1, 7]
+    
+    # decoding with chunks smaller than the grid gives the same result
+    phases_chunked, objects_chunked = voxels.decode_voxels(grid.voxels, chunk_size=5)
+    assert np.array_equal(phases, phases_chunked)
+    assert np.array_equal(objects, objects_chunked)
+    
+    # the voxels are decoded once until they are replaced
+    assert grid.phases is phases and grid.objects is objects
+    with pytest.raises(ValueError):
+        phases[0, 0, 0] = 3
+    grid.voxels = grid.voxels + 100000
+    assert np.array_equal(grid.phases, phases + 1)
+    
+def test_encode_voxels():
+    codes = np.array([[[0, 100001], [700017, 30000012]]])
+    phases, objects = voxels.decode_voxels(codes)
+    assert phases.dtype == np.uint16
+    assert phases.tolist() == [[[0, 1], [7, 300]]]
+    assert objects.tolist() == [[[0, 1], [17, 12]]]
+    assert np.array_equal(voxels.encode_voxels(phases, objects), codes)
+    
+    grid = voxels.VoxelGrid.from_labels(phases, objects, voxel_size=2.0)
+    assert np.array_equal(grid.voxels, codes)
+    assert voxels.encode_voxels(phases).tolist() == [[[0, 100000], [700000, 30000000]]]
+    
+    with pytest.raises(ValueError):
+        voxels.encode_voxels(phases, objects + 100000)
+    with pytest.raises(ValueError):
+        voxels.decode_voxels(-codes - 1)
+
+def test_as_voxel_grid():
+    grid = voxels.VoxelGrid(np.full((2, 2, 2), 100003), voxel_size=0.5)
+    assert voxels.as_voxel_grid(grid) is grid
+    # plain arrays are always GeoVal voxel codes, never phase labels
+    assert not np.any(voxels.as_voxel_grid(np.ones((2, 2, 2), dtype=int)).phases)
+    assert voxels.as_voxel_grid(grid.voxels).phases.tolist() == grid.phases.tolist()
+    assert voxels.as_voxel_grid(grid.voxels).voxel_size == 1.0
+    with pytest.raises(ValueError):
+        voxels.as_voxel_grid(np.ones((2, 2)))
+    
+def test_subvolume():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    sub = grid.subvolume((4, 8, 0), (8, 16, 32))
+    assert sub.dims == (8, 16, 32)
+    assert sub.voxel_size == grid.voxel_size
+    assert np.shares_memory(sub.voxels, grid.voxels)
+    assert np.array_equal(sub.voxels, grid.voxels[4:12, 8:24])
+    
+    with pytest.raises(ValueError):
+        grid.subvolume((30, 0, 0), 8)
+    with pytest.raises(ValueError):
+        grid.subvolume((0, 0, 0), 40)
+    
+@pytest.mark.parametrize("size, step, count", [(16, None, 8), (8, None, 64), (16, 8, 27), ((32, 16, 8), (1, 16, 12), 6)])
+def test_iter_subvolumes(size, step, count):
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    windows = grid.window_view(size, step)
+    assert np.shares_memory(windows, grid.voxels)
+    assert not windows.flags.writeable
+    
+    subvolumes = list(grid.iter_subvolumes(size, step))
+    assert len(subvolumes) == count == np.prod(windows.shape[:3])
+    for origin, sub in subvolumes:
+        assert np.shares_memory(sub.voxels, grid.voxels)
+        assert np.array_equal(sub.voxels, grid.subvolume(origin, size).voxels)
+    
+def test_random_subvolumes(tmpdir):
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    subvolumes = list(grid.random_subvolumes(12, 5, seed=3))
+    assert len(subvolumes) == 5
+    assert [origin for origin, sub in grid.random_subvolumes(12, 5, seed=3)] == [origin for origin, sub in subvolumes]
+    for origin, sub in subvolumes:
+        assert sub.dims == (12, 12, 12)
+        assert max(origin) <= 20
+    
+    files = voxels.write_subvolumes(subvolumes[:2], pathlib.Path(tmpdir, 'sub'))
+    assert len(files) == 2
+    for file, (origin, sub) in zip(files, subvolumes):
+        assert file.name == f'subvolume_{origin[0]}_{origin[1]}_{origin[2]}.val'
+        loaded = voxels.VoxelGrid.from_val_file(file)
+        assert np.array_equal(loaded.voxels, sub.voxels)
+        assert loaded.voxel_size == grid.voxel_size
+
+def test_refine_coarsen():
+    grid = voxels.VoxelGrid.from_val_file(VOXEL_FILE)
+    fine = grid.refine(2)
+    assert fine.dims == (64, 64, 64)
+    assert fine.voxel_size == grid.voxel_size / 2
+    assert np.array_equal(fine.voxels[::2, 1::2, ::2], grid.voxels)
+    
+    coarse = fine.coarsen(2)
+    assert coarse.voxel_size == grid.voxel_size
+    assert np.array_equal(coarse.voxels, grid.voxels)
+    
+    with pytest.raises(ValueError):
+        grid.coarsen(3)
+    with pytest.raises(ValueError):
+        grid.refine(0)
+    
+def test_coarsen_majority():
+    codes = np.full((4, 2, 2), 5)
+    # majority phase 1 with two objects, the more frequent object wins
+    codes[:2] = 100001
+    codes[:2, 0, 0] = 100002
+    codes[0, 1, 1] = 200001
+    # tie between phases 1 and 2
+    codes[2:, 0] = 100003
+    codes[2:, 1] = 200003
+    grid = voxels.VoxelGrid(codes, voxel_size=0.5)
+    
+    coarse = grid.coarsen(2)
+    assert coarse.dims == (2, 1, 1)
+    assert coarse.voxel_size == 1.0
+    assert coarse.voxels.ravel().tolist() == [100001, 100003]
+    
+    coarse = grid.coarsen(2, priority=[2])
+    assert coarse.voxels.ravel().tolist() == [100001, 200003]
+    
+    # tie between objects of the same phase chooses the smaller code
+    codes[2:, 1] = 100002
+    assert voxels.VoxelGrid(codes).coarsen(2).voxels.ravel().tolist() == [100001, 100002]